@@ -1,8 +1,244 @@
-from django.contrib import admin
-from .models import Quiz, Question, Answer, Marks_Of_User, Discipline
-
-admin.site.register(Quiz)
-admin.site.register(Question)
-admin.site.register(Answer)
-admin.site.register(Marks_Of_User)
-admin.site.register(Discipline)
\ No newline at end of file
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+
+from .cohorts import rebuild_cohort_rollups
+from .models import (
+    Quiz, Question, Answer, Marks_Of_User, Discipline, GradingJob, Cohort, CohortMembership, DailyActivity,
+    ActiveUserCount, OutboxEvent, OutboxCursor, ArchivedQuizAttempt,
+)
+from .profiling import list_profiles, load_profile, make_token, profile_path
+from .regrading import regrade_quiz
+from .signals import catalogue_changed
+
+
+class MoveQuestionsForm(forms.Form):
+    # Autocomplete renders only the chosen quiz, not a <select> of the whole catalogue
+    target_quiz = forms.ModelChoiceField(
+        queryset=Quiz.objects.all(),
+        label="Quiz destinație",
+        widget=AutocompleteSelect(Question._meta.get_field('quiz'), admin.site),
+    )
+
+
+class AnswerInline(admin.TabularInline):
+    model = Answer
+    fields = ['content', 'correct']
+
+    def get_extra(self, request, obj=None, **kwargs):
+        # Blank rows for a new question's answers; none when editing
+        return 0 if obj else 4
+
+
+@admin.register(Discipline)
+class DisciplineAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name']
+
+
+@admin.register(Quiz)
+class QuizAdmin(admin.ModelAdmin):
+    list_display = ['title', 'discipline', 'time_limit_minutes']
+    list_select_related = ['discipline']
+    list_filter = ['discipline']
+    search_fields = ['title']
+    autocomplete_fields = ['discipline']
+    actions = ['regrade']
+
+    @admin.action(description="Recalculează scorurile după corectarea răspunsurilor")
+    def regrade(self, request, queryset):
+        changed = sum(regrade_quiz(quiz_id)['changed'] for quiz_id in queryset.values_list('id', flat=True))
+        self.message_user(request, f"Scoruri recalculate: {changed} modificate.", messages.SUCCESS)
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    list_display = ['content', 'quiz']
+    list_select_related = ['quiz']
+    list_filter = ['quiz__discipline']
+    search_fields = ['content', 'quiz__title']
+    autocomplete_fields = ['quiz']
+    inlines = [AnswerInline]
+    actions = ['move_to_quiz']
+
+    @admin.action(description="Mută întrebările selectate în alt quiz")
+    def move_to_quiz(self, request, queryset):
+        """Ask for the target quiz on an intermediate page, then move the selection there"""
+        form = MoveQuestionsForm(request.POST if 'apply' in request.POST else None)
+        if not form.is_valid():
+            context = {
+                **self.admin_site.each_context(request),
+                'title': "Mută întrebările în alt quiz",
+                'opts': self.model._meta,
+                'media': self.media + form.media,
+                'form': form,
+                'questions': queryset.select_related('quiz').order_by('id')[:50],
+                'question_count': queryset.count(),
+                'selected_ids': queryset.values_list('pk', flat=True),
+                'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            }
+            return TemplateResponse(request, 'admin/home/question/move_to_quiz.html', context)
+
+        target = form.cleaned_data['target_quiz']
+        question_ids = list(queryset.exclude(quiz=target).values_list('id', flat=True))
+        with transaction.atomic():
+            # update() skips post_save, so log the moves for sync/caches explicitly
+            moved = Question.objects.filter(id__in=question_ids).update(quiz=target)
+            catalogue_changed(Question, question_ids)
+        self.message_user(request, f"{moved} întrebări mutate în „{target.title}”.", messages.SUCCESS)
+
+
+@admin.register(Answer)
+class AnswerAdmin(admin.ModelAdmin):
+    list_display = ['content', 'question', 'correct']
+    list_select_related = ['question']
+    list_filter = ['correct']
+    search_fields = ['content', 'question__content']
+    raw_id_fields = ['question']
+
+
+@admin.register(Marks_Of_User)
+class MarksOfUserAdmin(admin.ModelAdmin):
+    list_display = ['user', 'quiz', 'score', 'completed', 'completed_at']
+    list_select_related = ['user', 'quiz']
+    list_filter = ['completed', 'quiz__discipline']
+    search_fields = ['user__username', 'quiz__title']
+    raw_id_fields = ['user', 'quiz']
+    ordering = ['-completed_at']
+    # Skip the unfiltered COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
+
+
+@admin.register(GradingJob)
+class GradingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'quiz', 'status', 'error', 'submitted_at', 'finished_at']
+    list_select_related = ['user', 'quiz']
+    list_filter = ['status']
+    raw_id_fields = ['user', 'quiz', 'attempt']
+    readonly_fields = ['claimed_by', 'result', 'started_at', 'finished_at']
+    show_full_result_count = False
+
+
+@admin.register(ArchivedQuizAttempt)
+class ArchivedQuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'quiz', 'status', 'score', 'started_at', 'archived_at']
+    list_select_related = ['user', 'quiz']
+    list_filter = ['status']
+    search_fields = ['user__username']
+    raw_id_fields = ['user', 'quiz']
+    ordering = ['-id']
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        # Filled by `manage.py archive_attempts` only
+        return False
+
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'attempts', 'correct_answers']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+    show_full_result_count = False
+
+
+@admin.register(ActiveUserCount)
+class ActiveUserCountAdmin(admin.ModelAdmin):
+    list_display = ['start', 'period', 'users']
+    list_filter = ['period']
+    ordering = ['-start']
+
+    def has_add_permission(self, request):
+        # Kept by DailyActivity.record() only
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'created_at']
+    list_filter = ['event_type']
+    readonly_fields = ['event_type', 'payload', 'created_at']
+    show_full_result_count = False
+
+
+@admin.register(OutboxCursor)
+class OutboxCursorAdmin(admin.ModelAdmin):
+    list_display = ['endpoint', 'last_event_id', 'failures', 'next_attempt_at', 'last_error', 'updated_at']
+    # Editable so an operator can rewind a consumer or retry now (clear next_attempt_at)
+    fields = ['endpoint', 'last_event_id', 'failures', 'next_attempt_at', 'last_error']
+
+
+class CohortMembershipInline(admin.TabularInline):
+    model = CohortMembership
+    fields = ['user', 'joined_at']
+    readonly_fields = ['joined_at']
+    raw_id_fields = ['user']
+    extra = 0
+
+
+@admin.register(Cohort)
+class CohortAdmin(admin.ModelAdmin):
+    list_display = ['name', 'member_count', 'created_at']
+    search_fields = ['name']
+    filter_horizontal = ['instructors']
+    inlines = [CohortMembershipInline]
+    actions = ['rebuild_rollups']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(member_count=Count('memberships'))
+
+    @admin.display(description="Membri", ordering='member_count')
+    def member_count(self, obj):
+        return obj.member_count
+
+    def save_related(self, request, form, formsets, change):
+        # Inline membership edits skip the incremental path: rebuild once for the whole form
+        super().save_related(request, form, formsets, change)
+        rebuild_cohort_rollups(form.instance.id)
+
+    @admin.action(description="Recalculează statisticile grupelor selectate")
+    def rebuild_rollups(self, request, queryset):
+        cohort_ids = list(queryset.values_list('id', flat=True))
+        for cohort_id in cohort_ids:
+            rebuild_cohort_rollups(cohort_id)
+        self.message_user(request, f"Statistici recalculate pentru {len(cohort_ids)} grupe.", messages.SUCCESS)
+
+
+# Request profiles (home.middleware.ProfilingMiddleware), wired under /admin/profiles/ in lawquiz/urls.py
+def profile_list(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'token': make_token(request.user),
+        'token_max_age': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600),
+        'profiles': [profile for profile in map(load_profile, list_profiles()) if profile],
+    }
+    return TemplateResponse(request, 'admin/profiles/list.html', context)
+
+
+def profile_detail(request, name):
+    profile = load_profile(name)
+    if profile is None:
+        raise Http404
+    context = {
+        **admin.site.each_context(request),
+        'title': f"{profile['method']} {profile['path']}",
+        'profile': profile,
+        'has_dump': profile_path(name, '.prof') is not None,
+    }
+    return TemplateResponse(request, 'admin/profiles/detail.html', context)
+
+
+def profile_download(request, name):
+    """Raw cProfile dump, for snakeviz / pstats"""
+    path = profile_path(name, '.prof')
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{name}.prof')
@@ -1,20 +1,29 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
-)
+from rest_framework_simplejwt.views import TokenVerifyView
 from .api_views import (
     DisciplineViewSet,
     QuizViewSet,
     QuestionViewSet,
     AnswerViewSet,
     UserProgressViewSet,
+    CohortViewSet,
     user_profile,
     discipline_roadmap,
     user_streak,
     update_streak,
+    user_activity,
+    active_users,
+    user_history,
+    user_history_export,
+    cache_metrics,
+    catalogue_sync,
+    bundle_manifest,
+    author_questions,
+    grading_job_status,
+    outbox_events,
+    ThrottledTokenObtainPairView,
+    ThrottledTokenRefreshView,
 )
 
 # Create DRF router
@@ -24,11 +33,12 @@ router.register(r'quizzes', QuizViewSet, basename='quiz')
 router.register(r'questions', QuestionViewSet, basename='question')
 router.register(r'answers', AnswerViewSet, basename='answer')
 router.register(r'user-progress', UserProgressViewSet, basename='user-progress')
+router.register(r'cohorts', CohortViewSet, basename='cohort')
 
 urlpatterns = [
     # JWT Authentication endpoints
-    path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/token/refresh/', ThrottledTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     
     # User endpoints
@@ -41,6 +51,30 @@ urlpatterns = [
     path('streak/', user_streak, name='user_streak'),
     path('streak/update/', update_streak, name='update_streak'),
     
+    # Activity calendar and active-user rollups (admin only)
+    path('activity/', user_activity, name='user_activity'),
+    path('metrics/active-users/', active_users, name='active_users'),
+    
+    # Attempt history across live and archived attempts
+    path('history/', user_history, name='user_history'),
+    path('history/export/', user_history_export, name='user_history_export'),
+    
+    # Catalogue delta sync
+    path('sync/', catalogue_sync, name='catalogue_sync'),
+    path('bundles/manifest/', bundle_manifest, name='bundle_manifest'),
+    
+    # Queued grading results (GRADING_MODE = 'queued')
+    path('grading-jobs/<int:job_id>/', grading_job_status, name='grading_job_status'),
+    
+    # Outbox events for downstream services (admin only)
+    path('events/', outbox_events, name='outbox_events'),
+    
+    # Batched question authoring (admin only)
+    path('authoring/questions/', author_questions, name='author_questions'),
+    
+    # Cache metrics (admin only)
+    path('metrics/cache/', cache_metrics, name='cache_metrics'),
+    
     # API endpoints
     path('', include(router.urls)),
 ]
\ No newline at end of file
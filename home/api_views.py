@@ -1,58 +1,199 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.shortcuts import get_object_or_404
-from django.db import transaction, models
+from django.db import transaction, models, IntegrityError
+from django.db.models import Count, Avg, Prefetch
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, timedelta
+import csv
+import time
+from types import SimpleNamespace
 
-from .models import Discipline, Quiz, Question, Answer, Marks_Of_User, UserStreak, UserProfile
+from .models import (
+    Discipline, Quiz, Question, Answer, Marks_Of_User, UserStreak, UserProfile, QuizAttempt, GradingJob, Cohort,
+    DailyActivity, ActiveUserCount,
+)
 from .serializers import (
     DisciplineSerializer, DisciplineListSerializer, DisciplineRoadmapSerializer,
     QuizSerializer, QuizListSerializer, QuizTakeSerializer,
     QuestionSerializer, AnswerSerializer,
     QuizSubmissionSerializer, UserScoreSerializer,
     UserDetailSerializer, UserStreakSerializer, UserProfileSerializer,
-    UserProgressSerializer, UserProgressCreateSerializer
+    UserProgressSerializer, UserProgressCreateSerializer, QuizAttemptSerializer,
+    QuestionAuthoringSerializer, GradingJobSerializer, CohortSerializer
+)
+from .authentication import ClaimsJWTAuthentication, ClaimsTokenUser
+from .caching import (
+    cache_anonymous_api, stale_while_revalidate, swr_metrics,
+    get_catalogue_version, get_progress_version
 )
+from .authoring import create_questions
+from .cohorts import cohort_dashboard
+from .history import HISTORY_FIELDS, attempt_history
+from .outbox import read_events
+from .bundles import read_manifest, get_bundle_url
+from .grading import AttemptAlreadyFinalized, grade_submission, record_submission, submission_response
+from .timezones import get_timezone
+from .sync import build_sync_payload
+from .throttling import (
+    ThrottleFirstMixin, SubmitUserThrottle, SubmitIPThrottle,
+    StreakUserThrottle, StreakIPThrottle, TokenIPThrottle
+)
+
+
+class ThrottledTokenObtainPairView(ThrottleFirstMixin, TokenObtainPairView):
+    throttle_classes = [TokenIPThrottle]
+
+
+class ThrottledTokenRefreshView(ThrottleFirstMixin, TokenRefreshView):
+    throttle_classes = [TokenIPThrottle]
+
+
+def _quiz_list_queryset():
+    # User scores come from the per-user progress index (home.progress), not a per-list prefetch
+    return Quiz.objects.annotate(question_count=Count('question')).order_by('id')
 
 
 class DisciplineViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Discipline.objects.all()
     permission_classes = [AllowAny]
     
+    def get_queryset(self):
+        queryset = Discipline.objects.order_by('id')
+        if self.action == 'list':
+            return queryset.annotate(quiz_count=Count('quiz'))
+        if self.action == 'retrieve':
+            return queryset.prefetch_related(Prefetch('quiz_set', queryset=_quiz_list_queryset()))
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return DisciplineListSerializer
         return DisciplineSerializer
+
+    @cache_anonymous_api
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_anonymous_api
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @cache_anonymous_api
     def quizzes(self, request, pk=None):
         """Get all quizzes for a specific discipline"""
         discipline = self.get_object()
-        quizzes = Quiz.objects.filter(discipline=discipline)
+        quizzes = _quiz_list_queryset().filter(discipline=discipline)
         serializer = QuizListSerializer(quizzes, many=True, context={'request': request})
         return Response(serializer.data)
 
 
-class QuizViewSet(viewsets.ReadOnlyModelViewSet):
+class QuizViewSet(ThrottleFirstMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Quiz.objects.all()
     permission_classes = [AllowAny]
     
+    def get_queryset(self):
+        if self.action == 'list':
+            return _quiz_list_queryset()
+        if self.action in ('retrieve', 'take'):
+            questions = Question.objects.order_by('id').prefetch_related('answer_set')
+            return Quiz.objects.prefetch_related(Prefetch('question_set', queryset=questions))
+        return Quiz.objects.all()
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return QuizListSerializer
         elif self.action == 'take':
             return QuizTakeSerializer
         return QuizSerializer
+
+    @cache_anonymous_api
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_anonymous_api
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
-    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        authentication_classes=[ClaimsJWTAuthentication, SessionAuthentication]
+    )
     def take(self, request, pk=None):
-        """Get quiz questions without revealing correct answers"""
+        """Get quiz questions without revealing correct answers (timed quizzes only once started)"""
         quiz = self.get_object()
+        if quiz.time_limit_minutes:
+            grace = timedelta(seconds=getattr(settings, 'EXAM_SUBMISSION_GRACE_SECONDS', 30))
+            started = QuizAttempt.objects.filter(
+                quiz=quiz, user_id=request.user.id, status=QuizAttempt.STATUS_IN_PROGRESS,
+                deadline__gte=timezone.now() - grace,
+            ).exists()
+            if not started:
+                return Response(
+                    {'error': 'This quiz is timed, start an attempt first'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         serializer = QuizTakeSerializer(quiz)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def start(self, request, pk=None):
+        """Start a (timed) attempt; the deadline is fixed server-side"""
+        quiz = self.get_object()
+        now = timezone.now()
+
+        attempt = (
+            QuizAttempt.objects
+            .filter(quiz=quiz, user=request.user, status=QuizAttempt.STATUS_IN_PROGRESS)
+            .first()
+        )
+        grace_seconds = getattr(settings, 'EXAM_SUBMISSION_GRACE_SECONDS', 30)
+        if attempt and attempt.is_past_deadline(now, grace_seconds):
+            # Finalize the stale attempt so a fresh one can be started; a submit
+            # that got in first keeps its result
+            QuizAttempt.objects.filter(
+                id=attempt.id, status=QuizAttempt.STATUS_IN_PROGRESS
+            ).update(status=QuizAttempt.STATUS_EXPIRED, finished_at=now, score=0.0)
+            attempt = None
+
+        if attempt:
+            # Starting twice is idempotent and keeps the original deadline
+            return Response(QuizAttemptSerializer(attempt).data)
+
+        deadline = None
+        if quiz.time_limit_minutes:
+            deadline = now + timedelta(minutes=quiz.time_limit_minutes)
+
+        try:
+            with transaction.atomic():
+                attempt = QuizAttempt.objects.create(quiz=quiz, user=request.user, deadline=deadline)
+        except IntegrityError:
+            # A concurrent start for the same user and quiz won the race
+            attempt = QuizAttempt.objects.get(
+                quiz=quiz, user=request.user, status=QuizAttempt.STATUS_IN_PROGRESS
+            )
+            return Response(QuizAttemptSerializer(attempt).data)
+
+        return Response(QuizAttemptSerializer(attempt).data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+        throttle_classes=[SubmitUserThrottle, SubmitIPThrottle]
+    )
     def submit(self, request, pk=None):
         """Submit quiz answers and calculate score"""
         quiz = self.get_object()
@@ -65,137 +206,118 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         answers_data = submission_serializer.validated_data['answers']
+        attempt_id = submission_serializer.validated_data.get('attempt_id')
+        now = timezone.now()
+
+        # Timed quizzes must be submitted against an attempt started via the start endpoint
+        attempt = None
+        if attempt_id is not None:
+            attempt = QuizAttempt.objects.filter(id=attempt_id, quiz=quiz, user=request.user).first()
+            if attempt is None:
+                return Response(
+                    {'error': 'Attempt not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        elif quiz.time_limit_minutes:
+            return Response(
+                {'error': 'This quiz is timed, start an attempt first'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        late = False
+        if attempt is not None:
+            if attempt.status != QuizAttempt.STATUS_IN_PROGRESS:
+                return Response(
+                    {'error': f'Attempt is already {attempt.status}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            grace_seconds = getattr(settings, 'EXAM_SUBMISSION_GRACE_SECONDS', 30)
+            if attempt.is_past_deadline(now, grace_seconds):
+                if getattr(settings, 'EXAM_LATE_SUBMISSION_POLICY', 'reject') == 'reject':
+                    QuizAttempt.objects.filter(
+                        id=attempt.id, status=QuizAttempt.STATUS_IN_PROGRESS
+                    ).update(status=QuizAttempt.STATUS_EXPIRED, finished_at=now, score=0.0)
+                    return Response(
+                        {'error': 'Attempt deadline has passed', 'deadline': attempt.deadline},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                late = True
         
+        if getattr(settings, 'GRADING_MODE', 'inline') == 'queued':
+            # Grading workers do the rest; clients poll /api/grading-jobs/<id>/ for the same body
+            job = GradingJob.objects.create(
+                quiz=quiz,
+                user_id=request.user.id,
+                attempt=attempt,
+                answers=answers_data,
+                late=late,
+                user_timezone=request.headers.get('X-User-Timezone', '')[:50],
+            )
+            return Response(
+                {
+                    'job_id': job.id,
+                    'status': job.status,
+                    'attempt_id': attempt.id if attempt is not None else None,
+                    'poll_url': reverse('grading_job_status', args=[job.id]),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+
         # Calculate score
-        total_questions = quiz.question_set.count()
+        correct_answers, total_questions, results = grade_submission(quiz, answers_data)
         if total_questions == 0:
             return Response(
                 {'error': 'Quiz has no questions'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        correct_answers = 0
-        results = []
-        
-        for question in quiz.question_set.all():
-            question_id = str(question.id)
-            user_answer_id = answers_data.get(question_id)
-            
-            if user_answer_id:
-                try:
-                    user_answer = Answer.objects.get(
-                        id=user_answer_id, 
-                        question=question
-                    )
-                    is_correct = user_answer.correct
-                    if is_correct:
-                        correct_answers += 1
-                    
-                    # Get the correct answer for response
-                    correct_answer = Answer.objects.get(
-                        question=question, 
-                        correct=True
-                    )
-                    
-                    results.append({
-                        'question_id': question.id,
-                        'question': question.content,
-                        'user_answer_id': user_answer_id,
-                        'user_answer': user_answer.content,
-                        'correct_answer_id': correct_answer.id,
-                        'correct_answer': correct_answer.content,
-                        'is_correct': is_correct
-                    })
-                    
-                except Answer.DoesNotExist:
-                    results.append({
-                        'question_id': question.id,
-                        'question': question.content,
-                        'user_answer_id': user_answer_id,
-                        'user_answer': 'Invalid answer',
-                        'is_correct': False,
-                        'error': 'Invalid answer selected'
-                    })
-            else:
-                # Question not answered
-                correct_answer = Answer.objects.get(
-                    question=question, 
-                    correct=True
-                )
-                results.append({
-                    'question_id': question.id,
-                    'question': question.content,
-                    'user_answer_id': None,
-                    'user_answer': 'Not answered',
-                    'correct_answer_id': correct_answer.id,
-                    'correct_answer': correct_answer.content,
-                    'is_correct': False
-                })
-        
-        # Calculate percentage score
-        score_percentage = (correct_answers / total_questions) * 100
-        
         # Save or update user score and update streak
-        with transaction.atomic():
-            marks, created = Marks_Of_User.objects.update_or_create(
-                quiz=quiz,
-                user=request.user,
-                defaults={'score': score_percentage}
+        try:
+            streak, streak_updated = record_submission(
+                quiz,
+                request.user,
+                (correct_answers / total_questions) * 100,
+                now,
+                results,
+                attempt=attempt,
+                late=late,
+                user_timezone_str=request.headers.get('X-User-Timezone'),
             )
-            
-            # Update user streak with timezone awareness
-            # Get user's timezone from request headers or profile
-            user_timezone_str = request.headers.get('X-User-Timezone')
-            user_timezone = None
-            
-            if user_timezone_str:
-                try:
-                    import pytz
-                    user_timezone = pytz.timezone(user_timezone_str)
-                    # Also update user profile if different
-                    profile = UserProfile.get_or_create_for_user(request.user)
-                    if profile.timezone != user_timezone_str:
-                        profile.timezone = user_timezone_str
-                        profile.save()
-                except Exception:
-                    user_timezone = None
-            
-            # Update streak using the class method
-            streak, streak_updated = UserStreak.update_streak_for_user(
-                request.user, 
-                user_timezone
+        except AttemptAlreadyFinalized:
+            return Response(
+                {'error': 'Attempt is already finalized'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        return Response({
-            'score': score_percentage,
-            'correct_answers': correct_answers,
-            'total_questions': total_questions,
-            'results': results,
-            'passed': score_percentage >= 70,  # You can adjust the passing score
-            'streak_info': {
-                'current_streak': streak.current_streak,
-                'longest_streak': streak.longest_streak,
-                'streak_updated': streak_updated,
-                'last_active_date': streak.last_active_date.isoformat() if streak.last_active_date else None
-            }
-        })
+        return Response(submission_response(
+            correct_answers, total_questions, results,
+            attempt.id if attempt is not None else None, late, streak, streak_updated,
+        ))
     
-    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        authentication_classes=[ClaimsJWTAuthentication, SessionAuthentication]
+    )
     def my_scores(self, request):
         """Get current user's quiz scores"""
-        scores = Marks_Of_User.objects.filter(user=request.user)
+        scores = (
+            Marks_Of_User.objects.filter(user_id=request.user.id)
+            .select_related('quiz__discipline').order_by('-completed_at')
+        )
         serializer = UserScoreSerializer(scores, many=True)
         return Response(serializer.data)
 
 
 class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Question.objects.all()
+    queryset = Question.objects.prefetch_related('answer_set').order_by('id')
     serializer_class = QuestionSerializer
     permission_classes = [IsAdminUser]  # Only admins can access full questions with answers
 
 
 class AnswerViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Answer.objects.all()
+    queryset = Answer.objects.order_by('id')
     serializer_class = AnswerSerializer
     permission_classes = [IsAdminUser]  # Only admins can access full answers
 
@@ -207,10 +329,15 @@ class UserProgressViewSet(viewsets.ModelViewSet):
     """
     serializer_class = UserProgressSerializer
     permission_classes = [IsAuthenticated]
+    # Reads use token claims; writes still load the full User
+    authentication_classes = [ClaimsJWTAuthentication, SessionAuthentication]
     
     def get_queryset(self):
         """Only return progress for the authenticated user"""
-        return Marks_Of_User.objects.filter(user=self.request.user)
+        return (
+            Marks_Of_User.objects.filter(user_id=self.request.user.id)
+            .select_related('quiz__discipline').order_by('-completed_at')
+        )
     
     def get_serializer_class(self):
         """Use different serializers for different actions"""
@@ -224,42 +351,55 @@ class UserProgressViewSet(viewsets.ModelViewSet):
     
     def perform_update(self, serializer):
         """Ensure user can only update their own progress"""
-        if serializer.instance.user != self.request.user:
-            from rest_framework.exceptions import PermissionDenied
+        if serializer.instance.user_id != self.request.user.id:
             raise PermissionDenied("You can only update your own progress.")
         serializer.save()
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get user's progress summary"""
-        progress_records = self.get_queryset()
-        total_completed = progress_records.filter(completed=True).count()
-        total_attempted = progress_records.count()
-        
-        # Calculate overall average score
-        scores = progress_records.values_list('score', flat=True)
-        average_score = round(sum(scores) / len(scores), 2) if scores else 0
-        
-        # Get discipline breakdown
-        from django.db.models import Count, Avg
-        discipline_stats = (
-            progress_records
-            .values('quiz__discipline__name', 'quiz__discipline__id')
-            .annotate(
-                total_quizzes=Count('id'),
-                completed_quizzes=Count('id', filter=models.Q(completed=True)),
-                avg_score=Avg('score')
+        user_id = request.user.id
+
+        # May run on the refresh pool, so it must not touch the request or this view
+        def compute():
+            progress_records = Marks_Of_User.objects.filter(user_id=user_id)
+            total_completed = progress_records.filter(completed=True).count()
+            total_attempted = progress_records.count()
+            
+            # Calculate overall average score
+            scores = progress_records.values_list('score', flat=True)
+            average_score = round(sum(scores) / len(scores), 2) if scores else 0
+            
+            # Get discipline breakdown
+            discipline_stats = (
+                progress_records
+                .values('quiz__discipline__name', 'quiz__discipline__id')
+                .annotate(
+                    total_quizzes=Count('id'),
+                    completed_quizzes=Count('id', filter=models.Q(completed=True)),
+                    avg_score=Avg('score')
+                )
+                .order_by('quiz__discipline__name')
             )
-            .order_by('quiz__discipline__name')
+            
+            return {
+                'total_quizzes_attempted': total_attempted,
+                'total_quizzes_completed': total_completed,
+                'overall_average_score': average_score,
+                'completion_percentage': round((total_completed / total_attempted * 100), 2) if total_attempted > 0 else 0,
+                'discipline_breakdown': list(discipline_stats)
+            }
+
+        # The user's own writes change the key (fresh result); catalogue edits are revalidated in the background
+        data = stale_while_revalidate(
+            f'swr:summary:{user_id}:{get_progress_version(user_id)}',
+            compute,
+            get_catalogue_version(),
+            name='progress-summary',
+            timeout=getattr(settings, 'SWR_TIMEOUT', 3600),
+            max_stale=getattr(settings, 'SWR_MAX_STALE', 300),
         )
-        
-        return Response({
-            'total_quizzes_attempted': total_attempted,
-            'total_quizzes_completed': total_completed,
-            'overall_average_score': average_score,
-            'completion_percentage': round((total_completed / total_attempted * 100), 2) if total_attempted > 0 else 0,
-            'discipline_breakdown': list(discipline_stats)
-        })
+        return Response(data)
     
     @action(detail=False, methods=['get'])
     def by_discipline(self, request, discipline_id=None):
@@ -284,6 +424,30 @@ class UserProgressViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class CohortViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Cohorts for their instructors (staff see every cohort).
+
+    The dashboard reads only the rollup tables kept by home.cohorts, so its
+    cost doesn't depend on cohort size. Access depends on is_staff, so the
+    user is loaded from the database rather than trusted from token claims.
+    """
+    serializer_class = CohortSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        cohorts = Cohort.objects.annotate(member_count=Count('memberships', distinct=True)).order_by('name', 'id')
+        if not self.request.user.is_staff:
+            cohorts = cohorts.filter(instructors__id=self.request.user.id)
+        return cohorts
+
+    @action(detail=True, methods=['get'])
+    def dashboard(self, request, pk=None):
+        """Per-quiz completion rates and score distributions, and streak health, for one cohort"""
+        cohort = self.get_object()
+        return Response(cohort_dashboard(cohort, cohort.member_count))
+
+
 # User Profile endpoint
 @api_view(['GET', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
@@ -296,6 +460,8 @@ def user_profile(request):
         return Response(serializer.data)
     
     elif request.method in ['PUT', 'PATCH']:
+        import pytz
+
         # Update user timezone or other profile info
         profile = UserProfile.get_or_create_for_user(request.user)
         
@@ -303,9 +469,8 @@ def user_profile(request):
         timezone_data = request.data.get('timezone')
         if timezone_data:
             try:
-                import pytz
                 # Validate timezone
-                pytz.timezone(timezone_data)
+                get_timezone(timezone_data)
                 profile.timezone = timezone_data
                 profile.save()
             except pytz.UnknownTimeZoneError:
@@ -321,31 +486,205 @@ def user_profile(request):
 
 # Roadmap endpoint
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
 def discipline_roadmap(request, discipline_id):
     """Get user's progress roadmap for a specific discipline"""
-    try:
-        discipline = Discipline.objects.get(id=discipline_id)
-    except Discipline.DoesNotExist:
+    user = request.user
+
+    def compute():
+        quizzes = Quiz.objects.order_by('id')
+        discipline = (
+            Discipline.objects.filter(id=discipline_id)
+            .prefetch_related(Prefetch('quiz_set', queryset=quizzes))
+            .first()
+        )
+        if discipline is None:
+            return None
+        # May run on the refresh pool: the serializer gets a stand-in holding only the user, since
+        # it caches the progress index on the request it is given
+        return DisciplineRoadmapSerializer(discipline, context={'request': SimpleNamespace(user=user)}).data
+
+    user_id = request.user.id
+    data = stale_while_revalidate(
+        f'swr:roadmap:{user_id}:{discipline_id}:{get_progress_version(user_id)}',
+        compute,
+        get_catalogue_version(),
+        name='roadmap',
+        timeout=getattr(settings, 'SWR_TIMEOUT', 3600),
+        max_stale=getattr(settings, 'SWR_MAX_STALE', 300),
+    )
+    if data is None:
         return Response(
             {'error': 'Discipline not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    serializer = DisciplineRoadmapSerializer(discipline, context={'request': request})
-    return Response(serializer.data)
+    return Response(data)
+
+
+# Catalogue delta sync endpoint
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def catalogue_sync(request):
+    """Catalogue changes since the client's last sync token (full snapshot without one)"""
+    try:
+        since = int(request.query_params.get('since') or 0)
+        limit = int(request.query_params.get('limit') or getattr(settings, 'CATALOGUE_SYNC_PAGE_SIZE', 500))
+    except ValueError:
+        return Response(
+            {'error': 'since and limit must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if since < 0 or limit < 1:
+        return Response(
+            {'error': 'since must be >= 0 and limit >= 1'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    limit = min(limit, getattr(settings, 'CATALOGUE_SYNC_MAX_PAGE_SIZE', 1000))
+    payload = build_sync_payload(since, limit, getattr(settings, 'CATALOGUE_SYNC_SAFETY_LAG', 5))
+    return Response(payload)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bundle_manifest(request):
+    """Hashes and URLs of the pre-generated offline quiz bundles"""
+    manifest = read_manifest()
+    if manifest is None:
+        return Response(
+            {'error': 'Quiz bundles have not been built'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    base_url = get_bundle_url()
+    for bundle in manifest['bundles']:
+        bundle['url'] = request.build_absolute_uri(f"{base_url}{bundle['file']}")
+    return Response(manifest)
+
+
+# Outbox pull API (admin / service accounts)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def outbox_events(request):
+    """Outbox events after the client's cursor; pass the returned cursor back as ?after="""
+    try:
+        after = int(request.query_params.get('after') or 0)
+        limit = int(request.query_params.get('limit') or getattr(settings, 'OUTBOX_PAGE_SIZE', 100))
+    except ValueError:
+        return Response(
+            {'error': 'after and limit must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if after < 0 or limit < 1:
+        return Response(
+            {'error': 'after must be >= 0 and limit >= 1'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    event_types = [name for name in request.query_params.get('types', '').split(',') if name]
+    events, cursor, has_more = read_events(
+        after,
+        min(limit, getattr(settings, 'OUTBOX_MAX_PAGE_SIZE', 1000)),
+        getattr(settings, 'OUTBOX_SAFETY_LAG', 2),
+        event_types,
+    )
+    return Response({'events': events, 'cursor': cursor, 'has_more': has_more})
+
+
+# Batched authoring endpoint (admin only)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def author_questions(request):
+    """Create one question (object body) or many (list body) with their answers in one transaction"""
+    many = isinstance(request.data, list)
+    serializer = QuestionAuthoringSerializer(data=request.data, many=many)
+    serializer.is_valid(raise_exception=True)
+    items = serializer.validated_data if many else [serializer.validated_data]
+
+    max_questions = getattr(settings, 'AUTHORING_MAX_QUESTIONS', 500)
+    if len(items) > max_questions:
+        return Response(
+            {'error': f'At most {max_questions} questions per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    quiz_ids = {item['quiz_id'] for item in items}
+    missing = quiz_ids - set(Quiz.objects.filter(id__in=quiz_ids).values_list('id', flat=True))
+    if missing:
+        return Response(
+            {'error': f'Quiz not found: {sorted(missing)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    questions = create_questions(items)
+    return Response({
+        'created': len(questions),
+        'question_ids': [question.id for question in questions],
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def grading_job_status(request, job_id):
+    """
+    Result of a queued submission; `?wait=<seconds>` long-polls until grading finishes.
+
+    The wait holds a sync worker, so it is capped at GRADING_LONG_POLL_MAX
+    (a couple of seconds); a job still pending then gets Retry-After.
+    """
+    try:
+        wait = float(request.query_params.get('wait') or 0)
+    except ValueError:
+        return Response(
+            {'error': 'wait must be a number of seconds'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    wait = min(max(wait, 0), getattr(settings, 'GRADING_LONG_POLL_MAX', 2))
+
+    jobs = GradingJob.objects.filter(id=job_id, user_id=request.user.id)
+    pending = (GradingJob.STATUS_QUEUED, GradingJob.STATUS_RUNNING)
+    deadline = time.monotonic() + wait
+    # Cheap status-only reads while waiting; the result is fetched once
+    job_status = jobs.values_list('status', flat=True).first()
+    while job_status in pending and time.monotonic() < deadline:
+        time.sleep(getattr(settings, 'GRADING_POLL_INTERVAL', 0.25))
+        job_status = jobs.values_list('status', flat=True).first()
+
+    if job_status is None:
+        return Response(
+            {'error': 'Grading job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    response = Response(GradingJobSerializer(jobs.first()).data)
+    if job_status in pending:
+        response['Retry-After'] = '1'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """Stale-while-revalidate counters and staleness age for this worker process"""
+    return Response(swr_metrics())
 
 
 # Streak endpoints
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
 def user_streak(request):
     """Get current user's streak information with timezone awareness"""
-    # Get or create user profile for timezone info
-    profile = UserProfile.get_or_create_for_user(request.user)
+    # Token claims already carry the timezone; otherwise get or create the profile
+    if isinstance(request.user, ClaimsTokenUser):
+        profile = request.user
+    else:
+        profile = UserProfile.get_or_create_for_user(request.user)
     
     # Get or create streak
-    streak, created = UserStreak.objects.get_or_create(user=request.user)
+    streak, created = UserStreak.objects.get_or_create(user_id=request.user.id)
     
     # Get today in user's timezone for additional info
     user_today = profile.get_user_today()
@@ -363,31 +702,166 @@ def user_streak(request):
     return Response(data)
 
 
-@api_view(['POST'])
+def _date_range(request, default_end, default_days, max_days):
+    """
+    ?start= and ?end= (ISO dates, inclusive); defaults to default_days ending on default_end.
+
+    Returns:
+        tuple: (start, end, error Response or None)
+    """
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else default_end
+        start = (
+            date.fromisoformat(request.query_params['start']) if request.query_params.get('start')
+            else end - timedelta(days=default_days - 1)
+        )
+    except ValueError:
+        return None, None, Response(
+            {'error': 'start and end must be dates (YYYY-MM-DD)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if start > end or (end - start).days >= max_days:
+        return None, None, Response(
+            {'error': f'start must not be after end, and the range may span at most {max_days} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return start, end, None
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
-def update_streak(request):
-    """Manually update user's streak (for daily check-ins) with timezone support"""
-    # Get user's timezone from request or profile
-    user_timezone_str = request.data.get('timezone') or request.headers.get('X-User-Timezone')
-    user_timezone = None
-    
-    if user_timezone_str:
-        try:
-            import pytz
-            user_timezone = pytz.timezone(user_timezone_str)
-            # Update user profile if different
-            profile = UserProfile.get_or_create_for_user(request.user)
-            if profile.timezone != user_timezone_str:
-                profile.timezone = user_timezone_str
-                profile.save()
-        except Exception:
-            user_timezone = None
-    
-    # Update streak using the enhanced class method
-    streak, streak_updated = UserStreak.update_streak_for_user(request.user, user_timezone)
-    
-    serializer = UserStreakSerializer(streak)
-    data = serializer.data
-    data['streak_updated'] = streak_updated
-    
-    return Response(data)
\ No newline at end of file
+def user_activity(request):
+    """Per-day submissions and correct answers for the activity calendar (a year by default)"""
+    if isinstance(request.user, ClaimsTokenUser):
+        profile = request.user
+    else:
+        profile = UserProfile.get_or_create_for_user(request.user)
+    start, end, error = _date_range(request, profile.get_user_today(), 365, 366)
+    if error:
+        return error
+
+    days = [
+        {'date': day.isoformat(), 'attempts': attempts, 'correct_answers': correct_answers}
+        for day, attempts, correct_answers in (
+            DailyActivity.objects.filter(user_id=request.user.id, date__range=(start, end))
+            .order_by('date').values_list('date', 'attempts', 'correct_answers')
+        )
+    ]
+    return Response({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'timezone': profile.timezone,
+        'active_days': len(days),
+        'total_attempts': sum(day['attempts'] for day in days),
+        'days': days,
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def user_history(request):
+    """The user's attempts, live and archived, newest first; pass next_before back as ?before="""
+    try:
+        before = int(request.query_params['before']) if request.query_params.get('before') else None
+        quiz_id = int(request.query_params['quiz']) if request.query_params.get('quiz') else None
+        limit = int(request.query_params.get('limit') or getattr(settings, 'HISTORY_PAGE_SIZE', 50))
+    except ValueError:
+        return Response(
+            {'error': 'before, quiz and limit must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if limit < 1:
+        return Response(
+            {'error': 'limit must be >= 1'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    limit = min(limit, getattr(settings, 'HISTORY_MAX_PAGE_SIZE', 500))
+    attempts = list(attempt_history(request.user.id, quiz_id, before)[:limit + 1])
+    has_more = len(attempts) > limit
+    attempts = attempts[:limit]
+    return Response({'attempts': attempts, 'next_before': attempts[-1]['id'] if has_more else None})
+
+
+class _Echo:
+    """File-like sink for csv.writer that hands each row back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def user_history_export(request):
+    """The user's whole attempt history (live and archived) as a streamed CSV"""
+    columns = HISTORY_FIELDS + ['quiz_title', 'archived']
+    writer = csv.writer(_Echo())
+
+    def rows():
+        yield writer.writerow(columns)
+        for attempt in attempt_history(request.user.id).iterator(chunk_size=2000):
+            yield writer.writerow([attempt[column] for column in columns])
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="lawquiz-history.csv"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def active_users(request):
+    """Daily and weekly (Monday-start) active users from the ActiveUserCount rollups (90 days by default)"""
+    start, end, error = _date_range(request, timezone.localdate(), 90, 731)
+    if error:
+        return error
+
+    # Weeks overlapping the range, so the first partial week is included
+    rows = (
+        ActiveUserCount.objects.filter(start__range=(start - timedelta(days=start.weekday()), end))
+        .order_by('period', 'start').values_list('period', 'start', 'users')
+    )
+    daily, weekly = [], []
+    for period, period_start, users in rows:
+        if period == ActiveUserCount.PERIOD_WEEK:
+            weekly.append({'week_start': period_start.isoformat(), 'users': users})
+        elif period_start >= start:
+            daily.append({'date': period_start.isoformat(), 'users': users})
+    return Response({'start': start.isoformat(), 'end': end.isoformat(), 'daily': daily, 'weekly': weekly})
+
+
+class UpdateStreakView(ThrottleFirstMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [StreakUserThrottle, StreakIPThrottle]
+
+    def post(self, request):
+        """Manually update user's streak (for daily check-ins) with timezone support"""
+        # Get user's timezone from request or profile
+        user_timezone_str = request.data.get('timezone') or request.headers.get('X-User-Timezone')
+        user_timezone = None
+
+        if user_timezone_str:
+            try:
+                user_timezone = get_timezone(user_timezone_str)
+                # Update user profile if different
+                profile = UserProfile.get_or_create_for_user(request.user)
+                if profile.timezone != user_timezone_str:
+                    profile.timezone = user_timezone_str
+                    profile.save()
+            except Exception:
+                user_timezone = None
+
+        # Update streak using the enhanced class method
+        streak, streak_updated = UserStreak.update_streak_for_user(request.user, user_timezone)
+
+        serializer = UserStreakSerializer(streak)
+        data = serializer.data
+        data['streak_updated'] = streak_updated
+
+        return Response(data)
+
+
+# Class-based so throttles run before authentication; kept under the old name for the URLconf
+update_streak = UpdateStreakView.as_view()
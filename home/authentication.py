@@ -0,0 +1,46 @@
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+from .timezones import get_timezone_or_utc
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    Lightweight user built from access token claims (id, username, is_staff, timezone).
+
+    Mirrors the UserProfile timezone helpers so read-only views can use it in
+    place of a profile without loading any rows.
+    """
+
+    @property
+    def timezone(self):
+        return self.token.get('timezone') or 'UTC'
+
+    def get_user_timezone(self):
+        """Get timezone object for this user"""
+        return get_timezone_or_utc(self.timezone)
+
+    def get_user_today(self):
+        """Get today's date in user's timezone"""
+        return timezone.now().astimezone(self.get_user_timezone()).date()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that skips the User query for safe (read-only) methods.
+
+    GET/HEAD/OPTIONS requests get a ClaimsTokenUser built from the token;
+    writes, and tokens issued before the extra claims existed, fall back to
+    the usual DB-backed lookup.
+    """
+
+    def get_user(self, validated_token):
+        if self._is_safe and 'username' in validated_token:
+            return ClaimsTokenUser(validated_token)
+        return super().get_user(validated_token)
+
+    def authenticate(self, request):
+        self._is_safe = request.method in SAFE_METHODS
+        return super().authenticate(request)
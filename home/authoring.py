@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .caching import get_catalogue_version
+from .models import Quiz, Question, Answer
+from .signals import catalogue_changed
+
+
+def create_questions(items):
+    """
+    Create many questions with their answers in one transaction.
+
+    Uses two bulk INSERTs (questions, then answers) instead of one per row;
+    bulk_create sends no signals, so the new rows are logged for catalogue
+    sync and cache invalidation here.
+
+    Args:
+        items: list of dicts with quiz_id, content and answers (dicts with content and correct)
+
+    Returns:
+        list: created Question instances (with ids), in input order
+    """
+    with transaction.atomic():
+        questions = Question.objects.bulk_create([
+            Question(quiz_id=item['quiz_id'], content=item['content']) for item in items
+        ])
+        answers = Answer.objects.bulk_create([
+            Answer(question=question, content=answer['content'], correct=answer['correct'])
+            for question, item in zip(questions, items)
+            for answer in item['answers']
+        ])
+        catalogue_changed(Question, [question.id for question in questions])
+        catalogue_changed(Answer, [answer.id for answer in answers])
+    return questions
+
+
+def get_quiz_choices(discipline_id):
+    """A discipline's quizzes as [{id, title}] for the authoring quiz picker, cached per catalogue version"""
+    key = f'quiz-picker:{discipline_id}:{get_catalogue_version()}'
+    return cache.get_or_set(
+        key,
+        lambda: [
+            {'id': quiz_id, 'title': title}
+            for quiz_id, title in Quiz.objects.filter(discipline_id=discipline_id)
+            .order_by('id').values_list('id', 'title')
+        ],
+        getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600),
+    )
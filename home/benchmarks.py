@@ -0,0 +1,78 @@
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def scratch_database(alias='default', verbosity=0, dataset=None):
+    """
+    Create a throwaway test database for benchmarks and load tests.
+
+    SQLite gets a temporary file instead of the shared in-memory database so
+    that worker threads can open their own connections to it. With dataset
+    (a home.datagen size), it starts filled from that dataset's template.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    tmpdir = None
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        tmpdir = tempfile.mkdtemp(prefix='lawquiz-bench-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        if dataset:
+            from .datagen import load_dataset
+
+            load_dataset(dataset, alias=alias)
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        if tmpdir:
+            test_settings['NAME'] = None
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def quiet_access_log():
+    """Keep the per-request access log (home.request) out of benchmark output"""
+    logger = logging.getLogger('home.request')
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def summarize(samples):
+    """Summarize a list of durations (seconds) as milliseconds percentiles"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(percentile(0.50), 3),
+        'p95_ms': round(percentile(0.95), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, elapsed seconds)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
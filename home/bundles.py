@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+
+from .models import Discipline, Quiz, Question, Answer, CatalogueChange
+from .serializers import QuizTakeSerializer
+from .sync import untimed
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_bundle_root():
+    return getattr(settings, 'QUIZ_BUNDLE_ROOT', os.path.join(settings.MEDIA_ROOT, 'bundles'))
+
+
+def get_bundle_url():
+    return getattr(settings, 'QUIZ_BUNDLE_URL', f'{settings.MEDIA_URL}bundles/')
+
+
+def render_discipline_bundle(discipline):
+    """
+    Answer-free content of every quiz in a discipline, as canonical JSON bytes.
+
+    Quizzes use the same representation as `GET /api/quizzes/{id}/take/`;
+    everything is ordered by id so unchanged content always hashes the same.
+    Timed quizzes are listed without their questions, which are only served
+    inside a started attempt.
+    """
+    quizzes = (
+        Quiz.objects.filter(discipline=discipline).order_by('id')
+        .annotate(question_count=Count('question'))
+        .prefetch_related(
+            Prefetch('question_set', queryset=Question.objects.filter(untimed('quiz__')).order_by('id')),
+            Prefetch('question_set__answer_set', queryset=Answer.objects.order_by('id')),
+        )
+    )
+    content = {
+        'discipline': {'id': discipline.id, 'name': discipline.name, 'slug': discipline.slug},
+        'quizzes': QuizTakeSerializer(quizzes, many=True).data,
+    }
+    return json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode()
+
+
+def _write_atomic(path, data):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as handle:
+        handle.write(data)
+    os.replace(temp_path, path)
+
+
+def read_manifest(root=None):
+    """The last written bundle manifest, or None if bundles were never built"""
+    try:
+        with open(os.path.join(root or get_bundle_root(), MANIFEST_NAME), 'rb') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def build_bundles(root=None, brotli_quality=11):
+    """
+    Write one content-addressed bundle per discipline, plus .gz/.br siblings, and the manifest.
+
+    File names carry the content hash, so a bundle whose hash is unchanged is
+    not rewritten and published files never change (web servers can cache
+    them indefinitely and serve the precompressed siblings directly). Files
+    referenced by neither the new nor the previous manifest are removed.
+
+    Returns:
+        tuple: (manifest dict, number of bundles written, number unchanged)
+    """
+    root = root or get_bundle_root()
+    os.makedirs(root, exist_ok=True)
+    previous = read_manifest(root) or {'bundles': []}
+    # Taken before reading content: clients delta-sync from here, so changes made during the build are re-sent
+    sync_token = CatalogueChange.objects.aggregate(last=Max('id'))['last'] or 0
+
+    bundles = []
+    written = unchanged = 0
+    for discipline in Discipline.objects.order_by('id'):
+        body = render_discipline_bundle(discipline)
+        digest = hashlib.sha256(body).hexdigest()
+        filename = f'{discipline.slug}.{digest[:16]}.json'
+        path = os.path.join(root, filename)
+
+        if os.path.exists(path):
+            unchanged += 1
+        else:
+            _write_atomic(f'{path}.gz', gzip.compress(body, 9, mtime=0))
+            if brotli is not None:
+                _write_atomic(f'{path}.br', brotli.compress(body, quality=brotli_quality))
+            # The plain file last: its presence marks the bundle as complete
+            _write_atomic(path, body)
+            written += 1
+
+        bundles.append({
+            'discipline_id': discipline.id,
+            'slug': discipline.slug,
+            'sha256': digest,
+            'file': filename,
+            'size': len(body),
+        })
+
+    manifest = {'sync_token': sync_token, 'bundles': bundles}
+    _write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(manifest, indent=2).encode())
+
+    keep = {MANIFEST_NAME}
+    for bundle in bundles + previous['bundles']:
+        keep.update({bundle['file'], f"{bundle['file']}.gz", f"{bundle['file']}.br"})
+    for name in os.listdir(root):
+        if name not in keep and name.endswith(('.json', '.json.gz', '.json.br')):
+            os.remove(os.path.join(root, name))
+
+    return manifest, written, unchanged
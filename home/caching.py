@@ -0,0 +1,369 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import resolve
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, urlencode
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def get_catalogue_version():
+    """
+    Current catalogue content version (a Unix timestamp).
+
+    Doubles as the Last-Modified time of every catalogue response. If the key
+    was evicted a new version is started, which only costs a cache refill.
+    """
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, time.time(), None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version(*args, **kwargs):
+    """Invalidate every cached catalogue response (usable as a signal receiver)"""
+    version = max(time.time(), (cache.get(CATALOGUE_VERSION_KEY) or 0) + 1e-6)
+    cache.set(CATALOGUE_VERSION_KEY, version, None)
+
+
+def get_progress_version(user_id):
+    """Per-user progress version; changes whenever one of the user's marks is written"""
+    key = f'progress:version:{user_id}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_progress_version(user_id):
+    cache.set(f'progress:version:{user_id}', time.time(), None)
+
+
+def bump_progress_versions(user_ids):
+    """bump_progress_version() for many users in one cache round trip (bulk writes skip signals)"""
+    now = time.time()
+    cache.set_many({f'progress:version:{user_id}': now for user_id in user_ids}, None)
+
+
+def get_or_set_single_flight(key, compute, timeout, lock_timeout=10, wait_timeout=5.0, is_valid=None):
+    """
+    Return the cached value for key, computing it at most once across workers.
+
+    The first caller to take the lock computes; the others poll the cache
+    until the value appears and only compute themselves if that takes longer
+    than wait_timeout. compute() may return None to skip caching. Cached
+    values rejected by is_valid(value) are treated as missing.
+    """
+    is_valid = is_valid or (lambda value: True)
+    value = cache.get(key)
+    if value is not None and is_valid(value):
+        return value
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = cache.get(key)
+            if value is not None and is_valid(value):
+                return value
+        return compute()
+
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+_refresh_executor = None
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _get_refresh_executor():
+    global _refresh_executor
+    with _refresh_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SWR_MAX_WORKERS', 2),
+                thread_name_prefix='swr-refresh',
+            )
+    return _refresh_executor
+
+
+def _record(name, outcome, stale_age=None):
+    with _metrics_lock:
+        stats = _metrics.setdefault(name, {
+            'fresh': 0, 'stale': 0, 'miss': 0, 'refreshed': 0, 'refresh_errors': 0,
+            'refresh_skipped': 0, 'stale_age_total': 0.0, 'stale_age_max': 0.0,
+        })
+        stats[outcome] += 1
+        if stale_age is not None:
+            stats['stale_age_total'] += stale_age
+            stats['stale_age_max'] = max(stats['stale_age_max'], stale_age)
+
+
+def swr_metrics():
+    """Snapshot of stale-while-revalidate counters for this worker process"""
+    with _metrics_lock:
+        snapshot = {name: dict(stats) for name, stats in _metrics.items()}
+    for stats in snapshot.values():
+        stale_age_total = stats.pop('stale_age_total')
+        stats['stale_age_avg'] = round(stale_age_total / stats['stale'], 3) if stats['stale'] else 0.0
+        stats['stale_age_max'] = round(stats['stale_age_max'], 3)
+    with _refresh_lock:
+        pending = len(_refreshing)
+    return {'pending_refreshes': pending, 'endpoints': snapshot}
+
+
+def _schedule_refresh(key, compute, version, name, timeout):
+    background = getattr(settings, 'SWR_BACKGROUND', True)
+    with _refresh_lock:
+        if key in _refreshing or len(_refreshing) >= getattr(settings, 'SWR_MAX_PENDING', 100):
+            # Already refreshing here, or the pool is saturated: keep serving stale
+            _record(name, 'refresh_skipped')
+            return
+        _refreshing.add(key)
+
+    refresh_lock_key = f'{key}:refresh'
+    if not cache.add(refresh_lock_key, 1, getattr(settings, 'SWR_REFRESH_LOCK_TIMEOUT', 30)):
+        # Another worker process is refreshing this key
+        with _refresh_lock:
+            _refreshing.discard(key)
+        return
+
+    def refresh():
+        if background:
+            close_old_connections()
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, {'value': value, 'version': version}, timeout)
+            _record(name, 'refreshed')
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+            _record(name, 'refresh_errors')
+        finally:
+            cache.delete(refresh_lock_key)
+            with _refresh_lock:
+                _refreshing.discard(key)
+            if background:
+                # Pool threads outlive requests, so nothing else closes their connections
+                close_old_connections()
+
+    if background:
+        _get_refresh_executor().submit(refresh)
+    else:
+        refresh()
+
+
+def stale_while_revalidate(key, compute, version, name, timeout=None, max_stale=None, refresh=None):
+    """
+    Serve key's cached value, refreshing it in the background once it is stale.
+
+    An entry is fresh while it was computed for the current version. A stale
+    entry is returned immediately and recomputed on a bounded thread pool
+    (one refresh per key at a time); a missing entry, or one stale for longer
+    than max_stale seconds, is computed synchronously (single-flight).
+    compute() may close over the current request; refresh, if given, is
+    called instead on the pool and must not.
+    Versions are Unix timestamps, so `now - version` is how long the served
+    value has been stale; that age is tracked per name in swr_metrics().
+
+    Returns:
+        compute()'s value, or None if compute() returned None (not cached)
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['version'] == version:
+            _record(name, 'fresh')
+            return entry['value']
+        stale_age = max(time.time() - version, 0.0)
+        if max_stale is None or stale_age <= max_stale:
+            _record(name, 'stale', stale_age)
+            _schedule_refresh(key, refresh or compute, version, name, timeout)
+            return entry['value']
+
+    _record(name, 'miss')
+
+    def compute_entry():
+        value = compute()
+        return None if value is None else {'value': value, 'version': version}
+
+    entry = get_or_set_single_flight(
+        key, compute_entry, timeout, is_valid=lambda cached: cached['version'] == version
+    )
+    return entry['value'] if entry is not None else None
+
+
+def _cache_key(prefix, request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.build_absolute_uri(request.path)}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'catalogue:{prefix}:{digest}'
+
+
+def _is_cacheable(request):
+    return request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+
+
+def _etag(version):
+    return f'"catalogue-{version:.6f}"'
+
+
+def _not_modified(request, version):
+    # Last-Modified only has one-second resolution: an edit in the same second as the
+    # client's copy would look unmodified, so the ETag (the full version) decides
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [etag.removeprefix('W/') for etag in parse_etags(if_none_match)]
+        return _etag(version) in etags
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(version) < since
+
+
+def _add_cache_headers(response, version):
+    max_age = getattr(settings, 'CATALOGUE_CACHE_MAX_AGE', 60)
+    response['Last-Modified'] = http_date(version)
+    response['ETag'] = _etag(version)
+    patch_cache_control(response, public=True, max_age=max_age)
+    # Authenticated responses differ (user scores, navbar), so shared caches must key on these
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+# Request META a cached catalogue response may depend on (host for absolute URLs, negotiation)
+_REFRESH_META = ('HTTP_HOST', 'SERVER_NAME', 'SERVER_PORT', 'HTTP_ACCEPT', 'HTTP_ACCEPT_LANGUAGE')
+
+
+def _refresh_view(request):
+    """
+    Render request's URL again for a background refresh.
+
+    The original request (and the view instance handling it) is still in use
+    by its own thread, so the refresh resolves the URL to its view and calls
+    it with a new anonymous GET built from the path, query string and the
+    values in _REFRESH_META only.
+    """
+    path, query, secure = request.path_info, request.META.get('QUERY_STRING', ''), request.is_secure()
+    meta = {key: request.META[key] for key in _REFRESH_META if key in request.META}
+
+    def render():
+        from django.test import RequestFactory
+
+        fresh = RequestFactory().get(path, secure=secure, QUERY_STRING=query, **meta)
+        fresh.user = AnonymousUser()
+        fresh.swr_refresh = True
+        match = resolve(fresh.path_info)
+        return match.func(fresh, *match.args, **match.kwargs)
+
+    return render
+
+
+def cache_anonymous_api(method):
+    """
+    Cache a DRF viewset action's serialized data for anonymous GET requests.
+
+    Keyed on absolute URL and sorted query string, and revalidated against the
+    catalogue version (stale entries are served while a refresh runs). Only
+    200 responses are stored.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if getattr(request, 'swr_refresh', False) or not _is_cacheable(request):
+            return method(self, request, *args, **kwargs)
+
+        version = get_catalogue_version()
+        if _not_modified(request, version):
+            return _add_cache_headers(Response(status=304), version)
+
+        computed = {}
+
+        def compute():
+            response = method(self, request, *args, **kwargs)
+            computed['response'] = response
+            if response.status_code != 200:
+                return None
+            return {'data': response.data, 'version': version}
+
+        render = _refresh_view(request)
+
+        def refresh():
+            response = render()
+            return {'data': response.data, 'version': version} if response.status_code == 200 else None
+
+        entry = stale_while_revalidate(
+            _cache_key('api', request), compute, version, name='catalogue-api',
+            timeout=getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600),
+            max_stale=getattr(settings, 'CATALOGUE_MAX_STALE', 300),
+            refresh=refresh,
+        )
+        if entry is None:
+            return computed['response']
+        return _add_cache_headers(Response(entry['data']), entry['version'])
+
+    return wrapper
+
+
+def cache_anonymous_page(view):
+    """Cache a rendered HTML view for anonymous GET requests (same keying as cache_anonymous_api)"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(request, 'swr_refresh', False) or not _is_cacheable(request):
+            return view(request, *args, **kwargs)
+
+        version = get_catalogue_version()
+        if _not_modified(request, version):
+            return _add_cache_headers(HttpResponseNotModified(), version)
+
+        computed = {}
+
+        def page_entry(response):
+            if response.status_code != 200:
+                return None
+            return {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'version': version,
+            }
+
+        def compute():
+            response = view(request, *args, **kwargs)
+            computed['response'] = response
+            return page_entry(response)
+
+        render = _refresh_view(request)
+        entry = stale_while_revalidate(
+            _cache_key('page', request), compute, version, name='catalogue-page',
+            timeout=getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600),
+            max_stale=getattr(settings, 'CATALOGUE_MAX_STALE', 300),
+            refresh=lambda: page_entry(render()),
+        )
+        if entry is None:
+            return computed['response']
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        return _add_cache_headers(response, entry['version'])
+
+    return wrapper
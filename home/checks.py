@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    With REQUIRE_SHARED_CACHES (set by gunicorn.conf.py for more than one
+    worker), the caches holding versions and counters must be shared.
+
+    A per-process cache multiplies every throttle limit by the worker count
+    and keeps catalogue and progress invalidations inside one worker.
+    """
+    if not getattr(settings, 'REQUIRE_SHARED_CACHES', False):
+        return []
+    aliases = ['default', 'throttle']
+    if settings.QUIZ_STATE_STORE == 'home.quiz_state.CacheQuizStateStore':
+        aliases.append('quiz_state')
+    return [
+        Error(
+            f"The '{alias}' cache uses {settings.CACHES[alias]['BACKEND']}, which is not shared between processes.",
+            hint="Point it at a shared backend such as RedisCache, or set REQUIRE_SHARED_CACHES=False "
+                 "for a single-process deployment.",
+            id='home.E001',
+        )
+        for alias in aliases
+        if settings.CACHES.get(alias, {}).get('BACKEND') in PER_PROCESS_BACKENDS
+    ]
@@ -0,0 +1,244 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import (
+    CohortMembership, CohortQuizStats, CohortScoreBucket, CohortStreakDay, Marks_Of_User, UserStreak,
+    PASS_THRESHOLD,
+)
+
+SCORE_BUCKETS = 10
+
+
+def score_bucket(score):
+    """10-point score band, 0-9 (a perfect score falls in the top band); None for no mark"""
+    if score is None:
+        return None
+    return min(max(int(score // 10), 0), SCORE_BUCKETS - 1)
+
+
+def get_user_cohort_ids(user_id):
+    """Ids of the cohorts a user belongs to, cached: every mark and streak write asks"""
+    key = f'cohorts:user:{user_id}'
+    cohort_ids = cache.get(key)
+    if cohort_ids is None:
+        cohort_ids = list(CohortMembership.objects.filter(user_id=user_id).values_list('cohort_id', flat=True))
+        cache.set(key, cohort_ids, 24 * 60 * 60)
+    return cohort_ids
+
+
+def invalidate_user_cohorts(user_ids):
+    cache.delete_many([f'cohorts:user:{user_id}' for user_id in user_ids])
+
+
+def _ensure_rows(model, cohort_ids, **fields):
+    model.objects.bulk_create(
+        [model(cohort_id=cohort_id, **fields) for cohort_id in cohort_ids], ignore_conflicts=True
+    )
+
+
+def _shift(queryset, field, old, new, **amounts):
+    """
+    Move counts from the row where field == old to the row where field == new, in one UPDATE.
+
+    Either key may be None (nothing to take or add). amounts maps each
+    column to (taken from the old row, added to the new row).
+    """
+    if old == new:
+        updates = {column: F(column) + added - taken for column, (taken, added) in amounts.items()}
+    else:
+        updates = {}
+        for column, (taken, added) in amounts.items():
+            whens = []
+            if old is not None:
+                whens.append(When(**{field: old}, then=Value(-taken)))
+            if new is not None:
+                whens.append(When(**{field: new}, then=Value(added)))
+            updates[column] = F(column) + Case(*whens, default=Value(0))
+    queryset.filter(**{f'{field}__in': [key for key in (old, new) if key is not None]}).update(**updates)
+
+
+def _passed(score):
+    return int(score is not None and score >= PASS_THRESHOLD)
+
+
+def apply_mark_change(user_id, quiz_id, old_score, new_score):
+    """
+    Apply one mark write to the rollups of the user's cohorts.
+
+    old_score is None for a new mark, new_score is None for a deleted one.
+    Users outside any cohort cost one cache read.
+    """
+    if old_score == new_score:
+        return
+    cohort_ids = get_user_cohort_ids(user_id)
+    if not cohort_ids:
+        return
+
+    with transaction.atomic():
+        if new_score is not None:
+            _ensure_rows(CohortQuizStats, cohort_ids, quiz_id=quiz_id)
+        CohortQuizStats.objects.filter(cohort_id__in=cohort_ids, quiz_id=quiz_id).update(
+            attempted=F('attempted') + int(old_score is None) - int(new_score is None),
+            passed=F('passed') + _passed(new_score) - _passed(old_score),
+            score_sum=F('score_sum') + (new_score or 0.0) - (old_score or 0.0),
+        )
+
+        old_bucket, new_bucket = score_bucket(old_score), score_bucket(new_score)
+        if old_bucket != new_bucket:
+            if new_bucket is not None:
+                _ensure_rows(CohortScoreBucket, cohort_ids, quiz_id=quiz_id, bucket=new_bucket)
+            _shift(
+                CohortScoreBucket.objects.filter(cohort_id__in=cohort_ids, quiz_id=quiz_id),
+                'bucket', old_bucket, new_bucket, count=(1, 1),
+            )
+
+
+def apply_streak_change(user_id, old_activity, new_activity):
+    """
+    Apply one streak write to the streak rollups of the user's cohorts.
+
+    Activities are (last active date, current streak); the date is None for
+    a streak that was never extended (or deleted).
+    """
+    if old_activity == new_activity:
+        return
+    cohort_ids = get_user_cohort_ids(user_id)
+    if not cohort_ids:
+        return
+
+    (old_date, old_streak), (new_date, new_streak) = old_activity, new_activity
+    moved = int(old_date != new_date)
+    with transaction.atomic():
+        if new_date is not None:
+            _ensure_rows(CohortStreakDay, cohort_ids, date=new_date)
+        _shift(
+            CohortStreakDay.objects.filter(cohort_id__in=cohort_ids),
+            'date', old_date, new_date,
+            members=(moved, moved),
+            streak_sum=(old_streak or 0, new_streak or 0),
+        )
+
+
+def rebuild_cohort_rollups(cohort_id):
+    """Recompute a cohort's rollups from its members' marks and streaks (after membership changes, or to repair drift)"""
+    stats, buckets = {}, {}
+    with transaction.atomic():
+        for model in (CohortQuizStats, CohortScoreBucket, CohortStreakDay):
+            model.objects.filter(cohort_id=cohort_id).delete()
+
+        marks = (
+            Marks_Of_User.objects.filter(user__cohort_memberships__cohort_id=cohort_id)
+            .order_by().values_list('quiz_id', 'score')
+        )
+        for quiz_id, score in marks.iterator(chunk_size=2000):
+            row = stats.setdefault(quiz_id, {'attempted': 0, 'passed': 0, 'score_sum': 0.0})
+            row['attempted'] += 1
+            row['passed'] += score >= PASS_THRESHOLD
+            row['score_sum'] += score
+            bucket = (quiz_id, score_bucket(score))
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+
+        CohortQuizStats.objects.bulk_create([
+            CohortQuizStats(cohort_id=cohort_id, quiz_id=quiz_id, **row) for quiz_id, row in stats.items()
+        ], batch_size=500)
+        CohortScoreBucket.objects.bulk_create([
+            CohortScoreBucket(cohort_id=cohort_id, quiz_id=quiz_id, bucket=bucket, count=count)
+            for (quiz_id, bucket), count in buckets.items()
+        ], batch_size=500)
+
+        streak_days = (
+            UserStreak.objects.filter(user__cohort_memberships__cohort_id=cohort_id, last_active_date__isnull=False)
+            .order_by().values('last_active_date')
+            .annotate(members=Count('id'), streak_sum=Sum('current_streak'))
+        )
+        CohortStreakDay.objects.bulk_create([
+            CohortStreakDay(
+                cohort_id=cohort_id, date=day['last_active_date'], members=day['members'], streak_sum=day['streak_sum']
+            )
+            for day in streak_days
+        ], batch_size=500)
+
+
+def add_members(cohort, user_ids):
+    """Add users to a cohort (existing members are skipped) and rebuild its rollups"""
+    with transaction.atomic():
+        CohortMembership.objects.bulk_create(
+            [CohortMembership(cohort=cohort, user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+        )
+        rebuild_cohort_rollups(cohort.id)
+    invalidate_user_cohorts(user_ids)
+
+
+def remove_members(cohort, user_ids):
+    with transaction.atomic():
+        CohortMembership.objects.filter(cohort=cohort, user_id__in=user_ids).delete()
+        rebuild_cohort_rollups(cohort.id)
+    invalidate_user_cohorts(user_ids)
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def cohort_dashboard(cohort, member_count, today=None):
+    """
+    Instructor view of a cohort, read from the rollup tables only.
+
+    Per quiz: attempt and completion rates over the whole cohort, average
+    score and the score distribution in 10-point bands. Streaks: members
+    active today, at risk (last active yesterday), lapsed and never active.
+    Streak dates are each member's local date; today defaults to the server date.
+    """
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+
+    distributions = {}
+    for quiz_id, bucket, count in (
+        CohortScoreBucket.objects.filter(cohort=cohort).values_list('quiz_id', 'bucket', 'count')
+    ):
+        distributions.setdefault(quiz_id, [0] * SCORE_BUCKETS)[bucket] = count
+
+    quizzes = []
+    for stats in (
+        CohortQuizStats.objects.filter(cohort=cohort, attempted__gt=0)
+        .select_related('quiz').order_by('quiz__discipline_id', 'quiz_id')
+    ):
+        quizzes.append({
+            'quiz_id': stats.quiz_id,
+            'quiz_title': stats.quiz.title,
+            'discipline_id': stats.quiz.discipline_id,
+            'attempted': stats.attempted,
+            'passed': stats.passed,
+            'attempt_rate': _percent(stats.attempted, member_count),
+            'completion_rate': _percent(stats.passed, member_count),
+            'average_score': round(stats.score_sum / stats.attempted, 2),
+            'score_distribution': distributions.get(stats.quiz_id, [0] * SCORE_BUCKETS),
+        })
+
+    streaks = CohortStreakDay.objects.filter(cohort=cohort).aggregate(
+        tracked=Sum('members'),
+        active_today=Sum('members', filter=Q(date__gte=today)),
+        at_risk=Sum('members', filter=Q(date=yesterday)),
+        active_streak_sum=Sum('streak_sum', filter=Q(date__gte=yesterday)),
+    )
+    tracked, active_today, at_risk = (streaks[key] or 0 for key in ('tracked', 'active_today', 'at_risk'))
+    alive = active_today + at_risk
+
+    return {
+        'id': cohort.id,
+        'name': cohort.name,
+        'member_count': member_count,
+        'date': today.isoformat(),
+        'quizzes': quizzes,
+        'streaks': {
+            'active_today': active_today,
+            'at_risk': at_risk,
+            'lapsed': tracked - alive,
+            'never_active': max(member_count - tracked, 0),
+            'average_active_streak': round((streaks['active_streak_sum'] or 0) / alive, 2) if alive else 0,
+        },
+    }
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+from .caching import bump_catalogue_version
+from .models import Discipline, Quiz, Question, Answer, Marks_Of_User, UserProfile, UserStreak, PASS_THRESHOLD
+
+# Per-parent counts: quizzes per discipline, questions per quiz, answers per question.
+# `attempted` is the share of quizzes an average user has a mark on.
+DATASET_SIZES = {
+    'tiny': {'disciplines': 2, 'quizzes': 3, 'questions': 10, 'answers': 4, 'users': 20, 'attempted': 0.5},
+    'small': {'disciplines': 5, 'quizzes': 5, 'questions': 20, 'answers': 4, 'users': 500, 'attempted': 0.3},
+    'medium': {'disciplines': 10, 'quizzes': 8, 'questions': 30, 'answers': 4, 'users': 5000, 'attempted': 0.25},
+    'large': {'disciplines': 12, 'quizzes': 10, 'questions': 40, 'answers': 4, 'users': 20000, 'attempted': 0.25},
+}
+DATAGEN_PASSWORD = 'datagen-password'  # Every generated user's password, so benchmarks can log in
+
+DISCIPLINE_NAMES = [
+    'Drept civil', 'Drept penal', 'Drept constituțional', 'Drept administrativ', 'Drept procesual civil',
+    'Drept procesual penal', 'Dreptul muncii', 'Drept comercial', 'Drept internațional public',
+    'Dreptul familiei', 'Drept fiscal', 'Dreptul Uniunii Europene',
+]
+TIMEZONES = ['Europe/Chisinau', 'Europe/Chisinau', 'Europe/Bucharest', 'UTC']
+BATCH_SIZE = 2000
+
+
+def _discipline_name(index):
+    name = DISCIPLINE_NAMES[index % len(DISCIPLINE_NAMES)]
+    return name if index < len(DISCIPLINE_NAMES) else f'{name} {index // len(DISCIPLINE_NAMES) + 1}'
+
+
+def generate_dataset(size='small', seed=0, alias='default', **overrides):
+    """
+    Bulk-insert a synthetic catalogue with users, profiles, marks and streaks.
+
+    Rows go in with bulk_create, so no model signals fire: cohort rollups,
+    outbox events and the catalogue change log are not written, and only
+    the catalogue version is bumped. The same size and seed give the same
+    data (relative to today).
+
+    Returns:
+        dict: rows created per model
+    """
+    sizes = {**DATASET_SIZES[size], **overrides}
+    rng = random.Random(seed)
+    today = timezone.localdate()
+
+    with transaction.atomic(using=alias):
+        disciplines = Discipline.objects.using(alias).bulk_create([
+            Discipline(name=_discipline_name(index), slug=f'disciplina-{index + 1}')
+            for index in range(sizes['disciplines'])
+        ])
+        quizzes = Quiz.objects.using(alias).bulk_create([
+            Quiz(
+                title=f'{discipline.name} - Test {index + 1}', discipline=discipline,
+                slug=f'{discipline.slug}-test-{index + 1}',
+                time_limit_minutes=rng.choice([None, None, 20, 30, 45]),
+            )
+            for discipline in disciplines
+            for index in range(sizes['quizzes'])
+        ], batch_size=BATCH_SIZE)
+        questions = Question.objects.using(alias).bulk_create([
+            Question(content=f'{quiz.title}: întrebarea {index + 1}?', quiz=quiz)
+            for quiz in quizzes
+            for index in range(sizes['questions'])
+        ], batch_size=BATCH_SIZE)
+        answers = []
+        for question in questions:
+            correct = rng.randrange(sizes['answers'])
+            answers.extend(
+                Answer(content=f'Varianta {chr(ord("a") + choice)}', correct=(choice == correct), question=question)
+                for choice in range(sizes['answers'])
+            )
+        Answer.objects.using(alias).bulk_create(answers, batch_size=BATCH_SIZE)
+
+        password = make_password(DATAGEN_PASSWORD)
+        users = User.objects.using(alias).bulk_create([
+            User(username=f'student{index + 1:06d}', email=f'student{index + 1}@example.com', password=password)
+            for index in range(sizes['users'])
+        ], batch_size=BATCH_SIZE)
+        UserProfile.objects.using(alias).bulk_create([
+            UserProfile(user=user, timezone=rng.choice(TIMEZONES)) for user in users
+        ], batch_size=BATCH_SIZE)
+
+        marks, streaks = [], []
+        for user in users:
+            skill = rng.betavariate(5, 2)  # Chance of answering a question right; mean about 0.7
+            taken = round(len(quizzes) * min(1.0, sizes['attempted'] * rng.uniform(0.2, 1.8)))
+            for quiz in rng.sample(quizzes, taken):
+                correct = sum(rng.random() < skill for _ in range(sizes['questions']))
+                score = correct / sizes['questions'] * 100
+                marks.append(Marks_Of_User(quiz=quiz, user=user, score=score, completed=score >= PASS_THRESHOLD))
+
+            if taken:
+                current = rng.choice([0, 1, 1, 2, 3, 5, 8, 13, 30])
+                idle_days = rng.choice([0, 0, 1, 1, 2]) if current else rng.randint(2, 90)
+                last_active = today - timedelta(days=idle_days)
+                streaks.append(UserStreak(
+                    user=user, current_streak=current, longest_streak=current + rng.choice([0, 0, 2, 5, 10]),
+                    last_active_date=last_active,
+                ))
+            else:
+                streaks.append(UserStreak(user=user))
+        Marks_Of_User.objects.using(alias).bulk_create(marks, batch_size=BATCH_SIZE)
+        UserStreak.objects.using(alias).bulk_create(streaks, batch_size=BATCH_SIZE)
+
+    bump_catalogue_version()
+    return {
+        'disciplines': len(disciplines), 'quizzes': len(quizzes), 'questions': len(questions),
+        'answers': len(answers), 'users': len(users), 'marks': len(marks), 'streaks': len(streaks),
+    }
+
+
+def template_path(size='small', seed=0, alias='default', **overrides):
+    """
+    SQLite template file for a dataset on this database's schema.
+
+    The name hashes the sizes, the seed, today's date (streaks are relative
+    to it) and the applied migrations, so a schema change or a new day
+    builds a fresh template instead of loading a stale one.
+    """
+    applied = sorted(f'{app}.{name}' for app, name in MigrationRecorder(connections[alias]).applied_migrations())
+    key = json.dumps(
+        [{**DATASET_SIZES[size], **overrides}, seed, timezone.localdate().isoformat(), applied, django.__version__],
+        sort_keys=True,
+    )
+    directory = settings.DATAGEN_TEMPLATE_DIR or os.path.join(tempfile.gettempdir(), 'lawquiz-datagen')
+    return os.path.join(directory, f'{size}-{seed}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.sqlite3')
+
+
+def _raw_connection(alias):
+    connection = connections[alias]
+    connection.ensure_connection()
+    if connection.in_atomic_block:
+        raise RuntimeError("Datasets are copied in outside transactions (load before TestCase opens its own)")
+    return connection.connection
+
+
+def save_template(path, alias='default'):
+    """Copy the whole database into a template file (written aside, then renamed into place)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.{os.getpid()}.tmp'
+    target = sqlite3.connect(partial)
+    try:
+        _raw_connection(alias).backup(target)
+    finally:
+        target.close()
+    os.replace(partial, path)
+
+
+def restore_template(path, alias='default'):
+    """Replace the database's contents with a template's, page by page"""
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        source.backup(_raw_connection(alias))
+    finally:
+        source.close()
+    bump_catalogue_version()
+
+
+def load_dataset(size='small', seed=0, alias='default', **overrides):
+    """
+    Fill a freshly migrated database with a dataset.
+
+    On SQLite the dataset is copied from its template (built and saved
+    on first use), replacing everything in the database; other backends
+    generate it in place.
+
+    Returns:
+        str or None: the template used or written (None off SQLite)
+    """
+    if connections[alias].vendor != 'sqlite':
+        generate_dataset(size, seed, alias, **overrides)
+        return None
+    path = template_path(size, seed, alias, **overrides)
+    if os.path.exists(path):
+        restore_template(path, alias)
+    else:
+        generate_dataset(size, seed, alias, **overrides)
+        save_template(path, alias)
+    return path
+
+
+@contextmanager
+def dataset(size='small', seed=0, alias='default', **overrides):
+    """
+    Load a dataset for the duration of the block, then put the database back as it was.
+
+    On SQLite both steps are page copies (the previous contents are kept
+    in memory meanwhile); elsewhere the generated rows are rolled back.
+    For a TestCase, enter it before super().setUpClass():
+    `cls.enterClassContext(dataset('tiny'))`.
+    """
+    if connections[alias].vendor != 'sqlite':
+        try:
+            with transaction.atomic(using=alias):
+                generate_dataset(size, seed, alias, **overrides)
+                yield None
+                transaction.set_rollback(True, using=alias)
+        finally:
+            bump_catalogue_version()
+        return
+
+    saved = sqlite3.connect(':memory:')
+    try:
+        _raw_connection(alias).backup(saved)
+        yield load_dataset(size, seed, alias, **overrides)
+    finally:
+        saved.backup(_raw_connection(alias))
+        saved.close()
+        bump_catalogue_version()
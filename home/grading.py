@@ -0,0 +1,289 @@
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import get_catalogue_version
+from .models import (
+    CatalogueChange, Question, QuizAttempt, Marks_Of_User, UserProfile, UserStreak, GradingJob, AttemptAnswer,
+    DailyActivity, OutboxEvent, PASS_THRESHOLD,
+)
+from .outbox import emit
+from .timezones import get_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptAlreadyFinalized(Exception):
+    """The expiry sweep or a concurrent submit finalized the attempt first"""
+
+
+class GradingClaimLost(Exception):
+    """The job was requeued (and possibly claimed by another worker) while this worker graded it"""
+
+
+def load_answer_key(quiz_id):
+    """
+    A quiz's questions and answers as plain tuples, ordered by question id.
+
+    Returns:
+        list: (question id, question content, {answer id: (content, correct)}, correct answer id)
+    """
+    # Two queries for the whole quiz instead of two per question
+    questions = Question.objects.filter(quiz_id=quiz_id).prefetch_related('answer_set').order_by('id')
+    key = []
+    for question in questions:
+        answers = {answer.id: (answer.content, answer.correct) for answer in question.answer_set.all()}
+        correct_id = next((answer_id for answer_id, (_, correct) in answers.items() if correct), None)
+        key.append((question.id, question.content, answers, correct_id))
+    return key
+
+
+def get_answer_key(quiz_id):
+    """load_answer_key() through the shared cache; catalogue edits start a new version"""
+    return cache.get_or_set(
+        f'answer_key:{quiz_id}:{get_catalogue_version()}', lambda: load_answer_key(quiz_id), 60 * 60
+    )
+
+
+class AnswerKeyCache:
+    """
+    Per-process answer keys for grading workers, loaded straight from the database.
+
+    The catalogue version in the default cache is per process with LocMemCache,
+    so a worker would never see an admin's edit. The version here is the
+    newest CatalogueChange id instead, re-read once per batch by refresh().
+    """
+
+    def __init__(self):
+        self.version = None
+        self.keys = {}
+
+    def refresh(self):
+        version = CatalogueChange.objects.aggregate(latest=Max('id'))['latest']
+        if version != self.version:
+            self.version = version
+            self.keys = {}
+
+    def get(self, quiz_id):
+        if quiz_id not in self.keys:
+            self.keys[quiz_id] = load_answer_key(quiz_id)
+        return self.keys[quiz_id]
+
+
+def grade_answers(answer_key, answers_data):
+    """
+    Grade a submission against an answer key from load_answer_key().
+
+    Args:
+        answer_key: list returned by load_answer_key() / get_answer_key()
+        answers_data: Dictionary with question_id (as string) as key and answer_id as value
+
+    Returns:
+        tuple: (correct answers count, total questions, per-question results list)
+    """
+    correct_answers = 0
+    results = []
+
+    for question_id, question_content, answers, correct_id in answer_key:
+        correct_content = answers[correct_id][0] if correct_id is not None else None
+        user_answer_id = answers_data.get(str(question_id))
+
+        if user_answer_id:
+            user_answer = answers.get(user_answer_id)
+            if user_answer is None:
+                results.append({
+                    'question_id': question_id,
+                    'question': question_content,
+                    'user_answer_id': user_answer_id,
+                    'user_answer': 'Invalid answer',
+                    'is_correct': False,
+                    'error': 'Invalid answer selected'
+                })
+                continue
+
+            is_correct = user_answer[1]
+            if is_correct:
+                correct_answers += 1
+
+            results.append({
+                'question_id': question_id,
+                'question': question_content,
+                'user_answer_id': user_answer_id,
+                'user_answer': user_answer[0],
+                'correct_answer_id': correct_id,
+                'correct_answer': correct_content,
+                'is_correct': is_correct
+            })
+        else:
+            # Question not answered
+            results.append({
+                'question_id': question_id,
+                'question': question_content,
+                'user_answer_id': None,
+                'user_answer': 'Not answered',
+                'correct_answer_id': correct_id,
+                'correct_answer': correct_content,
+                'is_correct': False
+            })
+
+    return correct_answers, len(answer_key), results
+
+
+def grade_submission(quiz, answers_data):
+    """Grade a quiz submission against the current answer key (see grade_answers)"""
+    return grade_answers(get_answer_key(quiz.id), answers_data)
+
+
+def record_submission(quiz, user, score_percentage, finished_at, results, attempt=None, late=False,
+                      user_timezone_str=None):
+    """
+    Persist a graded submission: finalize the attempt, save the mark and picks, count the day's activity
+    and update the streak.
+
+    Raises:
+        AttemptAlreadyFinalized: the attempt was no longer in progress
+
+    Returns:
+        tuple: (UserStreak, bool streak updated)
+    """
+    with transaction.atomic():
+        if attempt is not None:
+            finalized = QuizAttempt.objects.filter(
+                id=attempt.id, status=QuizAttempt.STATUS_IN_PROGRESS
+            ).update(
+                status=QuizAttempt.STATUS_SUBMITTED,
+                finished_at=finished_at,
+                score=score_percentage,
+                late=late
+            )
+            if not finalized:
+                raise AttemptAlreadyFinalized
+
+        Marks_Of_User.objects.update_or_create(
+            quiz=quiz,
+            user=user,
+            defaults={'score': score_percentage}
+        )
+        AttemptAnswer.replace(user.id, quiz.id, results)
+
+        # Streak and daily activity use the user's timezone (X-User-Timezone, else the profile)
+        user_timezone = None
+        profile = UserProfile.get_or_create_for_user(user)
+        if user_timezone_str:
+            try:
+                user_timezone = get_timezone(user_timezone_str)
+                # Also update user profile if different
+                if profile.timezone != user_timezone_str:
+                    profile.timezone = user_timezone_str
+                    profile.save()
+            except Exception:
+                user_timezone = None
+        if user_timezone is None:
+            user_timezone = profile.get_user_timezone()
+
+        DailyActivity.record(
+            user.id,
+            finished_at.astimezone(user_timezone).date(),
+            sum(1 for result in results if result['is_correct']),
+        )
+        streak, streak_updated = UserStreak.update_streak_for_user(user, user_timezone)
+
+        # Pushed to the user's open progress streams (home.stream) once this commits
+        emit(OutboxEvent.TYPE_PROGRESS_UPDATED, {
+            'user_id': user.id,
+            'quiz_id': quiz.id,
+            'attempt_id': attempt.id if attempt is not None else None,
+            'score': score_percentage,
+            'completed': score_percentage >= PASS_THRESHOLD,
+            'streak': {
+                'current_streak': streak.current_streak,
+                'longest_streak': streak.longest_streak,
+                'last_active_date': streak.last_active_date.isoformat() if streak.last_active_date else None,
+                'streak_updated': streak_updated,
+            },
+        })
+        return streak, streak_updated
+
+
+def submission_response(correct_answers, total_questions, results, attempt_id, late, streak, streak_updated):
+    """Body returned for a graded submission, inline or by a grading job"""
+    score_percentage = (correct_answers / total_questions) * 100
+    return {
+        'score': score_percentage,
+        'correct_answers': correct_answers,
+        'total_questions': total_questions,
+        'results': results,
+        'passed': score_percentage >= PASS_THRESHOLD,
+        'attempt_id': attempt_id,
+        'late': late,
+        'streak_info': {
+            'current_streak': streak.current_streak,
+            'longest_streak': streak.longest_streak,
+            'streak_updated': streak_updated,
+            'last_active_date': streak.last_active_date.isoformat() if streak.last_active_date else None
+        }
+    }
+
+
+def process_grading_jobs(worker, batch_size, answer_keys):
+    """
+    Claim one batch of queued jobs for worker and grade them.
+
+    Each job's mark, attempt, streak and result are committed together, and
+    only while worker still holds the claim: the job row is locked first, and
+    if requeue_stale() took the job away in the meantime (the worker was slow,
+    not dead) the whole transaction rolls back and the job is left to whoever
+    claims it next. A job is therefore recorded once.
+
+    Returns:
+        int: number of jobs claimed
+    """
+    jobs = GradingJob.claim(worker, batch_size)
+    if jobs:
+        answer_keys.refresh()
+    for job in jobs:
+        claimed = GradingJob.objects.filter(id=job.id, claimed_by=worker, status=GradingJob.STATUS_RUNNING)
+        error = ''
+        try:
+            correct_answers, total_questions, results = grade_answers(answer_keys.get(job.quiz_id), job.answers)
+            if total_questions == 0:
+                error = 'Quiz has no questions'
+            else:
+                with transaction.atomic():
+                    # Blocks requeue_stale() on this row until commit (PostgreSQL; SQLite locks the database)
+                    if not list(claimed.select_for_update().values_list('id', flat=True)):
+                        raise GradingClaimLost
+                    streak, streak_updated = record_submission(
+                        job.quiz,
+                        job.user,
+                        (correct_answers / total_questions) * 100,
+                        job.submitted_at,
+                        results,
+                        attempt=job.attempt,
+                        late=job.late,
+                        user_timezone_str=job.user_timezone or None,
+                    )
+                    finished = claimed.update(
+                        status=GradingJob.STATUS_DONE,
+                        result=submission_response(
+                            correct_answers, total_questions, results,
+                            job.attempt_id, job.late, streak, streak_updated,
+                        ),
+                        finished_at=timezone.now(),
+                    )
+                    if not finished:
+                        raise GradingClaimLost
+        except GradingClaimLost:
+            logger.warning("Grading job %s was requeued while %s graded it", job.id, worker, extra={'job_id': job.id})
+            continue
+        except AttemptAlreadyFinalized:
+            error = 'Attempt is already finalized'
+        except Exception:
+            logger.exception("Grading job %s failed", job.id, extra={'job_id': job.id})
+            error = 'Grading failed'
+        if error:
+            claimed.update(status=GradingJob.STATUS_FAILED, error=error, finished_at=timezone.now())
+    return len(jobs)
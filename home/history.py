@@ -0,0 +1,73 @@
+import time
+
+from django.db import transaction
+from django.db.models import F, Value
+
+from .models import ArchivedQuizAttempt, GradingJob, QuizAttempt
+
+ARCHIVED_FIELDS = ['id', 'quiz_id', 'user_id', 'status', 'started_at', 'deadline', 'finished_at', 'score', 'late']
+HISTORY_FIELDS = ['id', 'quiz_id', 'status', 'started_at', 'deadline', 'finished_at', 'score', 'late']
+FINISHED = [QuizAttempt.STATUS_SUBMITTED, QuizAttempt.STATUS_EXPIRED]
+
+
+def archive_attempts(cutoff, batch_size=1000, sleep=0.0):
+    """
+    Move attempts finished before cutoff into ArchivedQuizAttempt, one transaction per batch.
+
+    Batches are range reads on attempt_finished_at_idx. Summary tables
+    (marks, streaks, daily activity, cohort rollups) are left as they are.
+
+    Returns:
+        int: attempts archived
+    """
+    finished = QuizAttempt.objects.filter(status__in=FINISHED, finished_at__lt=cutoff).order_by('finished_at')
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(finished.values(*ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                return archived
+            ArchivedQuizAttempt.objects.bulk_create(
+                [ArchivedQuizAttempt(**row) for row in rows], ignore_conflicts=True
+            )
+            # Grading jobs that pointed at these attempts are unlinked (SET_NULL); their result keeps the score
+            QuizAttempt.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        if sleep:
+            time.sleep(sleep)
+
+
+def purge_grading_jobs(cutoff, batch_size=1000, sleep=0.0):
+    """Delete done and failed grading jobs finished before cutoff; clients have long since read the result"""
+    finished = GradingJob.objects.filter(
+        status__in=[GradingJob.STATUS_DONE, GradingJob.STATUS_FAILED], finished_at__lt=cutoff,
+    ).order_by('id')
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += GradingJob.objects.filter(id__in=ids).delete()[0]
+        if sleep:
+            time.sleep(sleep)
+
+
+def _history_rows(model, user_id, archived, quiz_id=None, before=None):
+    rows = model.objects.filter(user_id=user_id)
+    if quiz_id is not None:
+        rows = rows.filter(quiz_id=quiz_id)
+    if before is not None:
+        rows = rows.filter(id__lt=before)
+    return rows.order_by().values(*HISTORY_FIELDS, quiz_title=F('quiz__title'), archived=Value(archived))
+
+
+def attempt_history(user_id, quiz_id=None, before=None):
+    """
+    A user's live and archived attempts as one queryset of dicts, newest (highest id) first.
+
+    Archived rows keep their attempt id, so `before` (an id) pages across
+    both tables with one UNION ALL query.
+    """
+    live = _history_rows(QuizAttempt, user_id, False, quiz_id, before)
+    archived = _history_rows(ArchivedQuizAttempt, user_id, True, quiz_id, before)
+    return live.union(archived, all=True).order_by('-id')
@@ -0,0 +1,136 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var = ContextVar('request_id', default=None)
+route_var = ContextVar('route', default=None)
+debug_sampled_var = ContextVar('debug_sampled', default=None)
+
+# LogRecord attributes that aren't `extra=` context
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id and route (None outside requests)"""
+
+    def filter(self, record):
+        # django.request logs 4xx/5xx after the middleware chain has returned; it passes the request along
+        record.request_id = request_id_var.get() or getattr(getattr(record, 'request', None), 'request_id', None)
+        record.route = route_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep every INFO+ record and a sample of DEBUG ones.
+
+    Sampling is decided once per request (see RequestContextMiddleware), so a
+    sampled request keeps its whole debug trail; outside requests each
+    record is sampled on its own.
+    """
+
+    def __init__(self, rate=0.01):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        sampled = debug_sampled_var.get()
+        if sampled is None:
+            sampled = random.random() < self.rate
+        return sampled
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request context and `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'route': getattr(record, 'route', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class AsyncJSONHandler(QueueHandler):
+    """
+    Hand records to a background thread that formats and writes them as JSON lines.
+
+    The request thread only runs the filters and a non-blocking put on a
+    bounded queue; when the queue is full records are dropped (and counted)
+    rather than slowing requests down. The listener thread is restarted in
+    forked children, so it works with gunicorn's preload_app.
+    """
+
+    def __init__(self, filename=None, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.filename = filename
+        self.stream = stream
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._target = None
+        self.listener = None
+        self._start_listener()
+        atexit.register(self._stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start_listener(self):
+        if self._target is None:
+            if self.filename:
+                self._target = logging.FileHandler(self.filename, encoding='utf-8')
+            else:
+                self._target = logging.StreamHandler(self.stream)
+            self._target.setFormatter(JSONFormatter())
+        self.listener = QueueListener(self.queue, self._target)
+        self.listener.start()
+
+    def _stop_listener(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._stop_listener()
+        self._target.close()
+        super().close()
+
+    def _restart_after_fork(self):
+        # Only the forking thread survives fork(): the parent's listener thread is gone
+        self.queue = queue.Queue(self.maxsize)
+        self.lock = threading.RLock()
+        self._start_listener()
+
+    def prepare(self, record):
+        # Same process, so no pickling: resolve args and traceback now, format later
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
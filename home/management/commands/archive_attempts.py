@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home.history import archive_attempts, purge_grading_jobs
+
+
+class Command(BaseCommand):
+    help = "Move finished attempts older than the archive horizon to the archive table and purge old grading jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help='Archive attempts finished more than this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches so request writes get the database lock',
+        )
+
+    def handle(self, *args, **options):
+        # Fixed cutoff: attempts crossing the horizon while we run wait for the next pass
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        jobs = purge_grading_jobs(cutoff, options['batch_size'], options['sleep'])
+        attempts = archive_attempts(cutoff, options['batch_size'], options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {attempts} attempt(s) and deleted {jobs} grading job(s) finished before {cutoff:%Y-%m-%d}"
+        ))
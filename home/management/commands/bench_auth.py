@@ -0,0 +1,72 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from home.api_views import discipline_roadmap, user_streak
+from home.benchmarks import scratch_database, summarize
+from home.models import Discipline, Quiz, Marks_Of_User, UserProfile, UserStreak
+from home.serializers import ClaimsTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare DB-backed and claims-based JWT authentication on /api/roadmap/ and /api/streak/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            user, discipline = self._seed()
+            token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+            endpoints = [
+                ('roadmap', discipline_roadmap, f'/api/roadmap/{discipline.id}/'),
+                ('streak', user_streak, '/api/streak/'),
+            ]
+            for name, view, url in endpoints:
+                with mock.patch.object(
+                    view.cls, 'authentication_classes', [JWTAuthentication, SessionAuthentication]
+                ):
+                    db_backed = self._measure(client, url, options['requests'])
+                claims = self._measure(client, url, options['requests'])
+
+                self.stdout.write(f"{name} DB-backed: {db_backed}")
+                self.stdout.write(f"{name} claims:    {claims}")
+                self.stdout.write(
+                    f"{name}: {db_backed['queries'] - claims['queries']} queries saved per request, "
+                    f"p50 {db_backed['p50_ms'] - claims['p50_ms']:.3f} ms faster"
+                )
+
+    def _measure(self, client, url, requests):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200, response.content
+        # Read the count now: the next request's request_started signal resets the query log
+        query_count = len(queries)
+
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(url)
+            samples.append(time.perf_counter() - started)
+        return {'queries': query_count, **summarize(samples)}
+
+    def _seed(self):
+        user = User.objects.create(username='bench-auth')
+        UserProfile.objects.create(user=user, timezone='Europe/Chisinau')
+        UserStreak.objects.create(user=user, current_streak=3, longest_streak=5)
+        discipline = Discipline.objects.create(name='Drept civil', slug='drept-civil')
+        for index in range(10):
+            quiz = Quiz.objects.create(title=f'Quiz {index}', discipline=discipline, slug=f'quiz-{index}')
+            if index % 2:
+                Marks_Of_User.objects.create(quiz=quiz, user=user, score=80.0)
+        return user, discipline
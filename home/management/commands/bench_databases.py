@@ -0,0 +1,45 @@
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+DEFAULT_BENCHMARKS = [
+    'bench_grading',
+    'bench_quiz_flow',
+    'bench_regrade --rows 200000',
+    'loadtest_exam_starts',
+]
+
+
+class Command(BaseCommand):
+    help = "Run benchmark commands once per database backend (DATABASE_ENGINE) and print the reports together"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmarks', nargs='+', default=DEFAULT_BENCHMARKS,
+            help='Commands to run, each with its options as one quoted string',
+        )
+        parser.add_argument('--backends', nargs='+', default=['sqlite', 'postgresql'])
+
+    def handle(self, *args, **options):
+        manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+        for backend in options['backends']:
+            env = {**os.environ, 'DATABASE_ENGINE': backend}
+            # `check --database` opens a connection: skip a backend that isn't configured or reachable
+            probe = subprocess.run(manage + ['check', '--database', 'default'], env=env, capture_output=True, text=True)
+            if probe.returncode:
+                reason = (probe.stderr.strip().splitlines() or ['unknown error'])[-1]
+                self.stdout.write(self.style.WARNING(f"== {backend}: skipped ({reason})"))
+                continue
+
+            for benchmark in options['benchmarks']:
+                started = time.perf_counter()
+                run = subprocess.run(manage + shlex.split(benchmark), env=env, capture_output=True, text=True)
+                self.stdout.write(f"== {backend}: {benchmark} ({time.perf_counter() - started:.1f}s)")
+                self.stdout.write(run.stdout.rstrip())
+                if run.returncode:
+                    self.stdout.write(self.style.ERROR(run.stderr.strip()))
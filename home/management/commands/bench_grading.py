@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from home.benchmarks import quiet_access_log, scratch_database, summarize
+from home.models import Discipline, Quiz, Question, Answer, GradingJob, Marks_Of_User
+
+
+class Command(BaseCommand):
+    help = "Burst of exam submissions graded inline vs queued for grading_worker (runs on a scratch database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--processes', type=int, default=4, help='grading_worker processes')
+
+    def handle(self, *args, **options):
+        with scratch_database(), quiet_access_log():
+            quiz, users, payload = self._seed(options['submissions'], options['questions'])
+            url = f'/api/quizzes/{quiz.id}/submit/'
+
+            for mode in ('inline', 'queued'):
+                Marks_Of_User.objects.all().delete()
+                caches['throttle'].clear()
+                with override_settings(GRADING_MODE=mode):
+                    wall, latencies, failures = self._burst(url, users, payload, options['concurrency'])
+                self.stdout.write(
+                    f"{mode:<7} requests: {len(latencies) / wall:.0f}/s, latency {summarize(latencies)}, "
+                    f"failures {failures}"
+                )
+
+                if mode == 'queued':
+                    started = time.perf_counter()
+                    call_command('grading_worker', processes=options['processes'], once=True, stdout=self.stdout)
+                    drain = time.perf_counter() - started
+                    done = GradingJob.objects.filter(status=GradingJob.STATUS_DONE).count()
+                    self.stdout.write(
+                        f"queued  graded {done} job(s) with {options['processes']} process(es) in {drain:.2f}s "
+                        f"({done / drain:.0f}/s); burst to last result {wall + drain:.2f}s"
+                    )
+
+    def _burst(self, url, users, payload, concurrency):
+        def submit(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            # One address per candidate, as in an exam hall behind separate connections
+            address = f'10.{user.id >> 16 & 255}.{user.id >> 8 & 255}.{user.id & 255}'
+            started = time.perf_counter()
+            try:
+                response = client.post(url, payload, format='json', REMOTE_ADDR=address)
+                return response.status_code, time.perf_counter() - started
+            finally:
+                close_old_connections()
+
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(submit, users))
+        wall = time.perf_counter() - wall_started
+        failures = sum(1 for code, _ in outcomes if code not in (200, 202))
+        return wall, [elapsed for _, elapsed in outcomes], failures
+
+    def _seed(self, user_count, question_count):
+        discipline = Discipline.objects.create(name='Examen de licență', slug='examen-licenta')
+        quiz = Quiz.objects.create(title='Simulare examen', discipline=discipline, slug='simulare-examen')
+        questions = Question.objects.bulk_create([
+            Question(content=f'Întrebarea {index}?', quiz=quiz) for index in range(question_count)
+        ])
+        Answer.objects.bulk_create([
+            Answer(content=f'Varianta {choice}', correct=(choice == 0), question=question)
+            for question in questions
+            for choice in range(4)
+        ])
+        User.objects.bulk_create([
+            User(username=f'candidate{index}', password='!') for index in range(user_count)
+        ], batch_size=500)
+        users = list(User.objects.filter(username__startswith='candidate').order_by('id'))
+
+        # Everyone picks the first answer of each question
+        first_answers = {}
+        for question_id, answer_id in Answer.objects.order_by('id').values_list('question_id', 'id'):
+            first_answers.setdefault(str(question_id), answer_id)
+        return quiz, users, {'answers': first_answers}
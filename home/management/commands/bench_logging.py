@@ -0,0 +1,91 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started
+from rest_framework.test import APIClient
+
+from home.benchmarks import quiet_access_log, scratch_database, summarize
+from home.log import AsyncJSONHandler, JSONFormatter, RequestContextFilter
+from home.models import Discipline, Quiz, Question, Answer
+
+
+class SlowSink:
+    """Write target that sleeps per write, standing in for a slow disk or log shipper"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Show request latency against log volume for the async JSON handler and a synchronous one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--lines', type=int, nargs='+', default=[0, 50, 500], help="Log lines per request")
+        parser.add_argument('--slow-io-ms', type=float, default=0.05, help="Simulated cost of each write")
+
+    def handle(self, *args, **options):
+        sink = SlowSink(options['slow_io_ms'] / 1000)
+        logger = logging.getLogger('home.bench_logging')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        with scratch_database(), quiet_access_log():
+            self._seed()
+            client = APIClient()
+            client.get('/api/sync/')  # Warm up URL resolution, serializers and the connection
+
+            for handler_name in ('async', 'sync'):
+                for lines in options['lines']:
+                    handler = self._make_handler(handler_name, sink)
+                    logger.addHandler(handler)
+
+                    def emit(sender, **kwargs):
+                        for index in range(lines):
+                            logger.info('bench line %s', index, extra={'lines': lines})
+
+                    request_started.connect(emit, dispatch_uid='bench_logging')
+                    samples = []
+                    try:
+                        for _ in range(options['requests']):
+                            started = time.perf_counter()
+                            client.get('/api/sync/')
+                            samples.append(time.perf_counter() - started)
+                    finally:
+                        request_started.disconnect(dispatch_uid='bench_logging')
+                        logger.removeHandler(handler)
+                        handler.close()
+
+                    summary = summarize(samples)
+                    dropped = f" dropped={handler.dropped}" if handler_name == 'async' else ''
+                    self.stdout.write(
+                        f"{handler_name:<6} lines={lines:<5} p50={summary['p50_ms']}ms "
+                        f"p95={summary['p95_ms']}ms{dropped}"
+                    )
+
+    def _make_handler(self, name, sink):
+        if name == 'async':
+            handler = AsyncJSONHandler(stream=sink)
+        else:
+            handler = logging.StreamHandler(sink)
+            handler.setFormatter(JSONFormatter())
+        handler.addFilter(RequestContextFilter())
+        return handler
+
+    def _seed(self):
+        discipline = Discipline.objects.create(name='Drept civil', slug='drept-civil')
+        quiz = Quiz.objects.create(title='Contracte', discipline=discipline, slug='contracte')
+        for index in range(20):
+            question = Question.objects.create(content=f'Întrebarea {index}?', quiz=quiz)
+            Answer.objects.bulk_create([
+                Answer(content=f'Răspuns {choice}', correct=(choice == 0), question=question)
+                for choice in range(4)
+            ])
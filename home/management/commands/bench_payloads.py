@@ -0,0 +1,86 @@
+import gzip
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from home.benchmarks import scratch_database
+from home.models import Discipline, Quiz, Question, Answer, Marks_Of_User
+from home.renderers import ORJSONRenderer, MessagePackRenderer, orjson, msgpack
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = "Compare payload size and encode time of JSON, orjson and MessagePack (plus gzip/brotli)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--quizzes', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', ORJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        with scratch_database():
+            user, discipline, quiz = self._seed(options['questions'], options['quizzes'])
+            client = APIClient()
+            client.force_authenticate(user)
+            endpoints = {
+                'take': f'/api/quizzes/{quiz.id}/take/',
+                'roadmap': f'/api/roadmap/{discipline.id}/',
+                'user-progress': '/api/user-progress/',
+                'my_scores': '/api/quizzes/my_scores/',
+            }
+
+            self.stdout.write(
+                f"{'endpoint':<14}{'format':<9}{'bytes':>9}{'gzip':>9}{'brotli':>9}{'encode ms':>11}"
+            )
+            for name, url in endpoints.items():
+                data = client.get(url).data
+                for format_name, renderer in renderers:
+                    body = renderer.render(data)
+                    started = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        renderer.render(data)
+                    encode_ms = (time.perf_counter() - started) / options['repeat'] * 1000
+                    brotli_size = len(brotli.compress(body, quality=5)) if brotli else '-'
+                    self.stdout.write(
+                        f"{name:<14}{format_name:<9}{len(body):>9}{len(gzip.compress(body, 6)):>9}"
+                        f"{brotli_size:>9}{encode_ms:>11.3f}"
+                    )
+
+    def _seed(self, question_count, quiz_count):
+        user = User.objects.create(username='bench-payloads')
+        discipline = Discipline.objects.create(name='Drept penal', slug='drept-penal')
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(title=f'Tema {index}: infracțiuni și pedepse', discipline=discipline, slug=f'tema-{index}')
+            for index in range(quiz_count)
+        ])
+        quiz = quizzes[0]
+        questions = Question.objects.bulk_create([
+            Question(content=f'Întrebarea {index} despre răspunderea penală?', quiz=quiz)
+            for index in range(question_count)
+        ])
+        # Answer.content is up to 600 characters; use realistic, near-maximal text
+        text = ('Răspunderea penală intervine numai pentru faptele prevăzute de legea penală în vigoare '
+                'la data săvârșirii lor. ') * 6
+        Answer.objects.bulk_create([
+            Answer(content=f'{choice}. {text}'[:600], correct=(choice == 0), question=question)
+            for question in questions
+            for choice in range(4)
+        ])
+        Marks_Of_User.objects.bulk_create([
+            Marks_Of_User(quiz=other, user=user, score=50.0 + index % 50, completed=index % 50 >= 20)
+            for index, other in enumerate(quizzes)
+        ])
+        return user, discipline, quiz
@@ -0,0 +1,96 @@
+import re
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from home.benchmarks import quiet_access_log, scratch_database, summarize
+from home.models import Discipline, Quiz, Question, Answer
+
+PASSWORD = 'bench-quiz-flow'
+ANSWER_INPUT = re.compile(rb'name="selected_answer_id" value="(\d+)"')
+
+CONFIGURATIONS = {
+    'db sessions': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'QUIZ_STATE_STORE': 'home.quiz_state.SessionQuizStateStore',
+    },
+    'cached_db sessions': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'QUIZ_STATE_STORE': 'home.quiz_state.SessionQuizStateStore',
+    },
+    'signed cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'QUIZ_STATE_STORE': 'home.quiz_state.SessionQuizStateStore',
+    },
+    'cache state store': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'QUIZ_STATE_STORE': 'home.quiz_state.CacheQuizStateStore',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Measure HTML quiz-step throughput (answer POST + next question GET) per session/state backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database(), quiet_access_log():
+            quiz, users = self._seed(options['users'], options['questions'])
+            self.stdout.write(f"{'configuration':<20}{'steps/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'queries/step':>14}")
+            for name, overrides in CONFIGURATIONS.items():
+                with override_settings(**overrides):
+                    for alias in ('default', 'quiz_state'):
+                        caches[alias].clear()
+                    samples, queries = self._run(quiz, users, options['questions'])
+                summary = summarize(samples)
+                self.stdout.write(
+                    f"{name:<20}{len(samples) / sum(samples):>9.0f}{summary['p50_ms']:>9}"
+                    f"{summary['p95_ms']:>9}{queries / len(samples):>14.1f}"
+                )
+
+    def _run(self, quiz, users, question_count):
+        samples = []
+        queries = 0
+        for user in users:
+            client = Client()
+            client.login(username=user.username, password=PASSWORD)
+            url = f'/quiz/{quiz.id}/'
+            page = client.get(url)
+            for _ in range(question_count):
+                answer_id = ANSWER_INPUT.search(page.content).group(1).decode()
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.post(url, {'selected_answer_id': answer_id})
+                    if response.url.endswith('/results/'):
+                        client.get(response.url)
+                    else:
+                        page = client.get(url)
+                samples.append(time.perf_counter() - started)
+                queries += len(captured)
+        return samples, queries
+
+    def _seed(self, user_count, question_count):
+        discipline = Discipline.objects.create(name='Drept procesual', slug='drept-procesual')
+        quiz = Quiz.objects.create(title='Competența instanțelor', discipline=discipline, slug='competenta')
+        questions = Question.objects.bulk_create([
+            Question(content=f'Întrebarea {index} despre competență?', quiz=quiz)
+            for index in range(question_count)
+        ])
+        Answer.objects.bulk_create([
+            Answer(content=f'Varianta {choice}', correct=(choice == 0), question=question)
+            for question in questions
+            for choice in range(4)
+        ])
+        users = [
+            User.objects.create_user(f'bench-quiz-{index}', password=PASSWORD)
+            for index in range(user_count)
+        ]
+        return quiz, users
@@ -0,0 +1,82 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from home import regrading
+from home.benchmarks import scratch_database
+from home.models import Discipline, Quiz, Question, Answer, AttemptAnswer, Marks_Of_User
+
+
+class Command(BaseCommand):
+    help = "Time re-grading a quiz with many stored picks, vectorized (numpy) and with the array fallback"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Stored picks (users x questions)')
+        parser.add_argument('--questions', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            started = time.perf_counter()
+            quiz, questions = self._seed(options['rows'], options['questions'])
+            self.stdout.write(f"Seeded {AttemptAnswer.objects.count()} picks in {time.perf_counter() - started:.1f}s")
+
+            paths = [('numpy', None)] if regrading._numpy() is not None else []
+            paths.append(('array fallback', mock.patch.object(regrading, '_numpy', return_value=None)))
+            for flip, (name, patch) in enumerate(paths):
+                # Move the first question's correct flag so every user's score changes
+                answers = list(Answer.objects.filter(question=questions[0]).order_by('id'))
+                Answer.objects.filter(question=questions[0]).update(correct=False)
+                Answer.objects.filter(id=answers[1 - flip].id).update(correct=True)
+
+                started = time.perf_counter()
+                if patch is None:
+                    stats = regrading.regrade_quiz(quiz.id)
+                else:
+                    with patch:
+                        stats = regrading.regrade_quiz(quiz.id)
+                self.stdout.write(
+                    f"{name:<15} {stats['picks']} picks, {stats['users']} users, {stats['changed']} changed "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+
+    def _seed(self, rows, question_count):
+        discipline = Discipline.objects.create(name='Drept constituțional', slug='drept-constitutional')
+        quiz = Quiz.objects.create(title='Examen final', discipline=discipline, slug='examen-final')
+        questions = Question.objects.bulk_create([
+            Question(content=f'Întrebarea {index}?', quiz=quiz) for index in range(question_count)
+        ])
+        Answer.objects.bulk_create([
+            Answer(content=f'Varianta {choice}', correct=(choice == 0), question=question)
+            for question in questions
+            for choice in range(4)
+        ])
+        answer_ids = {}
+        for question_id, answer_id in Answer.objects.order_by('id').values_list('question_id', 'id'):
+            answer_ids.setdefault(question_id, []).append(answer_id)
+
+        user_count = max(rows // question_count, 1)
+        User.objects.bulk_create([
+            User(username=f'regrade{index}', password='!') for index in range(user_count)
+        ], batch_size=1000)
+        user_ids = list(User.objects.filter(username__startswith='regrade').values_list('id', flat=True))
+        Marks_Of_User.objects.bulk_create([
+            Marks_Of_User(quiz=quiz, user_id=user_id, score=100.0, completed=True) for user_id in user_ids
+        ], batch_size=1000)
+
+        # Raw executemany: building a million model instances would dominate the run
+        table = AttemptAnswer._meta.db_table
+        sql = f'INSERT INTO {table} (user_id, quiz_id, question_id, answer_id) VALUES (%s, %s, %s, %s)'
+        with transaction.atomic(), connection.cursor() as cursor:
+            batch = []
+            for user_id in user_ids:
+                for question in questions:
+                    batch.append((user_id, quiz.id, question.id, answer_ids[question.id][0]))
+                if len(batch) >= 50000:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+        return quiz, questions
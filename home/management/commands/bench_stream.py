@@ -0,0 +1,90 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from home.benchmarks import scratch_database, summarize
+from home.models import OutboxEvent
+from home.outbox import emit
+from home.stream import ProgressStream
+
+
+class Command(BaseCommand):
+    help = "Open many idle progress streams in one process and time event pushes and event-loop lag"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--poll-interval', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            User.objects.bulk_create([
+                User(username=f'listener{index}', password='!') for index in range(options['connections'])
+            ], batch_size=1000)
+            user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+            report = async_to_sync(self._run)(user_ids, options['events'], options['poll_interval'])
+        for line in report:
+            self.stdout.write(line)
+
+    async def _run(self, user_ids, event_count, poll_interval):
+        stream = ProgressStream(poll_interval=poll_interval, heartbeat=30)
+        pushed = {}
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        def sender(user_id):
+            async def send(message):
+                if b'event: ' in message.get('body', b''):
+                    pushed[user_id] = time.perf_counter()
+            return send
+
+        started = time.perf_counter()
+        connections = [
+            asyncio.ensure_future(stream(
+                {'type': 'http', 'path': '/api/stream/', 'headers': [],
+                 'query_string': f'token={AccessToken.for_user(User(id=user_id))}'.encode()},
+                receive, sender(user_id),
+            ))
+            for user_id in user_ids
+        ]
+        await asyncio.sleep(poll_interval * 4)
+        opened = time.perf_counter() - started
+
+        # Event-loop lag: how late a 10ms sleep wakes up while streams are open
+        lags = []
+        ticking = True
+
+        async def ticker():
+            while ticking:
+                before = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - before - 0.01)
+        tick_task = asyncio.ensure_future(ticker())
+
+        latencies = []
+        for user_id in random.sample(user_ids, min(event_count, len(user_ids))):
+            pushed.pop(user_id, None)
+            emitted = time.perf_counter()
+            await sync_to_async(emit)(OutboxEvent.TYPE_PROGRESS_UPDATED, {'user_id': user_id, 'score': 80.0})
+            while user_id not in pushed:
+                await asyncio.sleep(0.001)
+            latencies.append(pushed[user_id] - emitted)
+
+        ticking = False
+        await tick_task
+        disconnected.set()
+        await asyncio.gather(*connections)
+        await stream.poller.stop()
+        return [
+            f"{len(user_ids)} streams opened in {opened:.2f}s",
+            f"emit -> push latency: {summarize(latencies)}",
+            f"event loop lag: {summarize(lags)}",
+        ]
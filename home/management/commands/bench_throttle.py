@@ -0,0 +1,80 @@
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from home.benchmarks import scratch_database, summarize
+from home.models import Discipline, Quiz, Question, Answer
+from home.throttling import SlidingWindowCounter
+
+
+class Command(BaseCommand):
+    help = "Benchmark the sliding-window throttle store and check throttled requests skip the ORM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        with tempfile.TemporaryDirectory() as location:
+            backends = {
+                'locmem': LocMemCache('bench-throttle', {}),
+                'filebased': FileBasedCache(location, {}),
+            }
+            for name, cache in backends.items():
+                count = iterations if name == 'locmem' else max(iterations // 20, 100)
+                self.stdout.write(f"{name}: {self._bench_counter(cache, count)}")
+
+        with scratch_database():
+            self._check_throttled_request()
+
+    def _bench_counter(self, cache, iterations):
+        counter = SlidingWindowCounter(cache)
+        samples = []
+        for index in range(iterations):
+            # Spread hits over many keys like real traffic, staying under the limit
+            key = f'bench:{index % 1000}'
+            started = time.perf_counter()
+            counter.hit(key, limit=10 ** 9, window=60)
+            samples.append(time.perf_counter() - started)
+        return summarize(samples)
+
+    def _check_throttled_request(self):
+        discipline = Discipline.objects.create(name='Bench', slug='bench')
+        quiz = Quiz.objects.create(title='Bench', discipline=discipline, slug='bench')
+        question = Question.objects.create(content='Q', quiz=quiz)
+        answer = Answer.objects.create(content='A', correct=True, question=question)
+        user = User.objects.create(username='bench-throttle')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        url = f'/api/quizzes/{quiz.id}/submit/'
+        payload = {'answers': {str(question.id): answer.id}}
+
+        allowed, throttled = [], []
+        throttled_queries = None
+        for _ in range(200):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.post(url, payload, format='json')
+                elapsed = time.perf_counter() - started
+            if response.status_code == 429:
+                throttled.append(elapsed)
+                throttled_queries = len(queries)
+            else:
+                allowed.append(elapsed)
+
+        self.stdout.write(f"Accepted submits: {summarize(allowed)}")
+        self.stdout.write(f"Throttled submits: {summarize(throttled)}")
+        if throttled_queries:
+            self.stderr.write(self.style.ERROR(f"Throttled request ran {throttled_queries} queries"))
+        elif throttled:
+            self.stdout.write(self.style.SUCCESS("Throttled requests ran 0 queries"))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.bundles import build_bundles, get_bundle_root
+
+
+class Command(BaseCommand):
+    help = "Pre-generate per-discipline, precompressed quiz bundles and their manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root',
+            default=None,
+            help='Output directory (default: QUIZ_BUNDLE_ROOT)',
+        )
+        parser.add_argument(
+            '--brotli-quality',
+            type=int,
+            default=getattr(settings, 'QUIZ_BUNDLE_BROTLI_QUALITY', 11),
+            help='Brotli level for the .br files (built once, so the slowest level is fine)',
+        )
+
+    def handle(self, *args, **options):
+        root = options['root'] or get_bundle_root()
+        manifest, written, unchanged = build_bundles(root, brotli_quality=options['brotli_quality'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(manifest['bundles'])} bundle(s) in {root}: {written} written, {unchanged} unchanged"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from home.models import CatalogueChange
+
+
+class Command(BaseCommand):
+    help = "Delete catalogue change log entries superseded by a newer entry for the same object"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of entries deleted per DELETE',
+        )
+
+    def handle(self, *args, **options):
+        # Sync only reads the newest entry per object, so older ones never change a client's result
+        newer = CatalogueChange.objects.filter(
+            model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id')
+        )
+        superseded = CatalogueChange.objects.filter(Exists(newer)).order_by('id')
+
+        deleted = 0
+        while True:
+            ids = list(superseded.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += CatalogueChange.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} superseded change(s)"))
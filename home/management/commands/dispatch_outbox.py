@@ -0,0 +1,37 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from home.outbox import dispatch_endpoint
+
+
+class Command(BaseCommand):
+    help = "Deliver outbox events to OUTBOX_ENDPOINTS in batches, retrying failed endpoints with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OUTBOX_PAGE_SIZE', 100))
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is left to deliver right now')
+
+    def handle(self, *args, **options):
+        endpoints = getattr(settings, 'OUTBOX_ENDPOINTS', [])
+        if not endpoints:
+            raise CommandError("OUTBOX_ENDPOINTS is empty")
+        safety_lag = getattr(settings, 'OUTBOX_SAFETY_LAG', 2)
+
+        # Run a single dispatcher: two would deliver the same batches twice
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        delivered = 0
+        while not stop.is_set():
+            sent = sum(dispatch_endpoint(endpoint, options['batch_size'], safety_lag) for endpoint in endpoints)
+            delivered += sent
+            close_old_connections()
+            if not sent:
+                if options['once']:
+                    break
+                stop.wait(options['poll_interval'])
+        self.stdout.write(f"Delivered {delivered} event(s)")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home.models import QuizAttempt
+
+
+class Command(BaseCommand):
+    help = "Finalize timed quiz attempts whose deadline (plus grace period) has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'EXAM_SWEEP_BATCH_SIZE', 500),
+            help='Number of attempts finalized per UPDATE',
+        )
+
+    def handle(self, *args, **options):
+        # Leave the grace window to the submit endpoint so in-flight submissions still land
+        grace_seconds = getattr(settings, 'EXAM_SUBMISSION_GRACE_SECONDS', 30)
+        cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+
+        expired = QuizAttempt.expire_overdue(cutoff=cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} attempt(s)"))
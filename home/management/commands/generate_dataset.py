@@ -0,0 +1,55 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from home.benchmarks import scratch_database
+from home.datagen import DATASET_SIZES, generate_dataset, load_dataset, restore_template, template_path
+from home.models import Discipline
+
+
+class Command(BaseCommand):
+    help = "Build the SQLite template of a synthetic dataset, or generate one into the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(DATASET_SIZES), default='small')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--rebuild', action='store_true', help='Regenerate the template even if it exists')
+        parser.add_argument(
+            '--into-database',
+            action='store_true',
+            help='Bulk-insert demo data into the configured database instead (it must have no disciplines)',
+        )
+
+    def handle(self, *args, **options):
+        size, seed = options['size'], options['seed']
+        if options['into_database']:
+            if Discipline.objects.exists():
+                raise CommandError("The database already has a catalogue; generate into an empty one")
+            started = time.perf_counter()
+            counts = generate_dataset(size, seed)
+            rows = ', '.join(f'{count} {name}' for name, count in counts.items())
+            self.stdout.write(self.style.SUCCESS(f"Generated {rows} in {time.perf_counter() - started:.1f}s"))
+            return
+
+        with scratch_database():
+            if connection.vendor != 'sqlite':
+                raise CommandError("Templates are SQLite files; use --into-database on other backends")
+            path = template_path(size, seed)
+            if options['rebuild'] and os.path.exists(path):
+                os.remove(path)
+            built = not os.path.exists(path)
+            started = time.perf_counter()
+            load_dataset(size, seed)
+            elapsed = time.perf_counter() - started
+            if built:
+                self.stdout.write(f"Generated and saved the {size} dataset in {elapsed:.1f}s")
+
+            started = time.perf_counter()
+            restore_template(path)
+            self.stdout.write(
+                f"Loading it from the template takes {(time.perf_counter() - started) * 1000:.0f}ms "
+                f"({os.path.getsize(path) / 1024 / 1024:.1f} MB)"
+            )
+        self.stdout.write(self.style.SUCCESS(path))
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import signal
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from home.grading import AnswerKeyCache, process_grading_jobs
+from home.models import GradingJob
+
+
+def work(batch_size, poll_interval, once, stop):
+    """One worker process: claim and grade batches until stopped (or, with once, until the queue is empty)"""
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    answer_keys = AnswerKeyCache()
+    while not stop.is_set():
+        claimed = process_grading_jobs(worker, batch_size, answer_keys)
+        close_old_connections()
+        if not claimed:
+            if once:
+                return
+            stop.wait(poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Grade queued submissions (GRADING_MODE = 'queued') with a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=getattr(settings, 'GRADING_WORKER_PROCESSES', os.cpu_count() or 1),
+        )
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per round trip')
+        parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds to sleep on an empty queue')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        stale_after = getattr(settings, 'GRADING_JOB_TIMEOUT', 300)
+        requeued = GradingJob.requeue_stale(timezone.now() - timedelta(seconds=stale_after))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        stop = multiprocessing.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        worker_args = (options['batch_size'], options['poll_interval'], options['once'], stop)
+
+        if options['processes'] <= 1:
+            work(*worker_args)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=work, args=worker_args, name=f'grading-worker-{index}')
+            for index in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Grading workers stopped"))
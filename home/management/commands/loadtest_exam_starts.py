@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from home.benchmarks import scratch_database, summarize
+from home.models import Discipline, Quiz, Question, Answer, QuizAttempt
+
+
+class Command(BaseCommand):
+    help = "Load test: many users starting the same timed exam at once (runs on a scratch database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--time-limit', type=int, default=90, help='Exam length in minutes')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            quiz, users = self._seed(options['users'], options['time_limit'])
+            url = f'/api/quizzes/{quiz.id}/start/'
+
+            # Query budget of a single start, measured outside the burst
+            client = APIClient()
+            client.force_authenticate(users[0])
+            with CaptureQueriesContext(connection) as queries:
+                client.post(url)
+            self.stdout.write(f"Queries per start: {len(queries)}")
+
+            def start_exam(user):
+                client = APIClient()
+                client.force_authenticate(user)
+                started = time.perf_counter()
+                try:
+                    response = client.post(url)
+                    return response.status_code, time.perf_counter() - started
+                finally:
+                    close_old_connections()
+
+            wall_started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                outcomes = list(pool.map(start_exam, users[1:]))
+            wall = time.perf_counter() - wall_started
+
+            failures = [code for code, _ in outcomes if code not in (200, 201)]
+            open_attempts = QuizAttempt.objects.filter(
+                quiz=quiz, status=QuizAttempt.STATUS_IN_PROGRESS
+            ).count()
+
+            self.stdout.write(f"Starts: {len(outcomes)} in {wall:.2f}s ({len(outcomes) / wall:.0f}/s)")
+            self.stdout.write(f"Latency: {summarize([elapsed for _, elapsed in outcomes])}")
+            self.stdout.write(f"Open attempts: {open_attempts}, failures: {len(failures)}")
+            if failures or open_attempts != len(users):
+                self.stderr.write(self.style.ERROR("Load test failed"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Load test passed"))
+
+    def _seed(self, user_count, time_limit):
+        discipline = Discipline.objects.create(name='Load test', slug='load-test')
+        quiz = Quiz.objects.create(
+            title='Mock bar exam', discipline=discipline, slug='mock-bar-exam',
+            time_limit_minutes=time_limit
+        )
+        for index in range(10):
+            question = Question.objects.create(content=f'Question {index}', quiz=quiz)
+            Answer.objects.bulk_create([
+                Answer(content=f'Answer {choice}', correct=(choice == 0), question=question)
+                for choice in range(4)
+            ])
+
+        User.objects.bulk_create([
+            User(username=f'examinee{index}', password='!') for index in range(user_count)
+        ], batch_size=500)
+        return quiz, list(User.objects.filter(username__startswith='examinee').order_by('id'))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from home.outbox import FEED_EVENT_TYPES, STREAM_ONLY_EVENT_TYPES, prune_events
+
+
+class Command(BaseCommand):
+    help = "Delete outbox events past their retention (undelivered events of configured endpoints are kept)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.OUTBOX_RETENTION_DAYS,
+            help='Keep feed events (pull API, dispatch_outbox) this many days',
+        )
+        parser.add_argument(
+            '--stream-hours',
+            type=int,
+            default=settings.OUTBOX_STREAM_RETENTION_HOURS,
+            help='Keep stream-only events (progress.updated) this many hours',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Events deleted per statement')
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches so request writes get the database lock',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        feed = prune_events(
+            now - timedelta(days=options['days']), FEED_EVENT_TYPES, options['batch_size'], options['sleep']
+        )
+        stream = prune_events(
+            now - timedelta(hours=options['stream_hours']), STREAM_ONLY_EVENT_TYPES,
+            options['batch_size'], options['sleep'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {feed} feed event(s) and {stream} stream event(s)"))
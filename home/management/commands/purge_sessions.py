@@ -0,0 +1,50 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+DB_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches (unlike clearsessions' single DELETE)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of sessions deleted per DELETE',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches so request writes get the database lock',
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in DB_ENGINES:
+            # Cookie sessions need no cleanup; cache/file backends expire on their own terms
+            engine = import_module(settings.SESSION_ENGINE)
+            try:
+                engine.SessionStore.clear_expired()
+            except NotImplementedError:
+                pass
+            self.stdout.write(self.style.SUCCESS(f"{settings.SESSION_ENGINE} needs no batched cleanup"))
+            return
+
+        # Fixed cutoff: sessions expiring while we run are left for the next pass
+        expired = Session.objects.filter(expire_date__lt=timezone.now()).order_by('expire_date')
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired session(s)"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.cohorts import rebuild_cohort_rollups
+from home.models import Cohort
+
+
+class Command(BaseCommand):
+    help = "Recompute cohort dashboard rollups from marks and streaks (after direct membership writes or drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('cohort_ids', nargs='*', type=int, help='Cohorts to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        cohort_ids = options['cohort_ids'] or list(Cohort.objects.order_by('id').values_list('id', flat=True))
+        for cohort_id in cohort_ids:
+            started = time.perf_counter()
+            rebuild_cohort_rollups(cohort_id)
+            self.stdout.write(f"Cohort {cohort_id}: rebuilt in {time.perf_counter() - started:.2f}s")
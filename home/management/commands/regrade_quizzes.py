@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.models import Quiz
+from home.regrading import regrade_quiz
+
+
+class Command(BaseCommand):
+    help = "Recompute stored marks against the current answer keys (after fixing a wrong correct flag)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int)
+        parser.add_argument('--all', action='store_true', help='Re-grade every quiz')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of marks written per bulk UPDATE',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            quiz_ids = list(Quiz.objects.order_by('id').values_list('id', flat=True))
+        elif options['quiz_ids']:
+            quiz_ids = options['quiz_ids']
+        else:
+            raise CommandError("Pass quiz ids or --all")
+
+        for quiz_id in quiz_ids:
+            started = time.perf_counter()
+            stats = regrade_quiz(quiz_id, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+            self.stdout.write(
+                f"Quiz {quiz_id}: {stats['picks']} pick(s), {stats['users']} user(s), "
+                f"{stats['changed']} mark(s) changed in {time.perf_counter() - started:.2f}s"
+            )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written"))
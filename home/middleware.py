@@ -0,0 +1,158 @@
+import logging
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import empty
+
+from .log import debug_sampled_var, request_id_var, route_var
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+request_logger = logging.getLogger('home.request')
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def _accepted_encodings(header):
+    """Content codings from an Accept-Encoding header, ignoring those with q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Brotli or gzip response compression negotiated from Accept-Encoding.
+
+    Brotli is used for non-HTML bodies when the `brotli` package is installed
+    and the client accepts `br`; everything else goes through Django's
+    GZipMiddleware, which also keeps its BREACH mitigation for HTML pages
+    carrying CSRF tokens.
+    """
+
+    def process_response(self, request, response):
+        if (
+            brotli is None
+            or response.streaming
+            or len(response.content) < 200
+            or response.has_header('Content-Encoding')
+            or response.get('Content-Type', '').startswith('text/html')
+            or 'br' not in _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(
+            response.content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        )
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request on demand.
+
+    Triggered by a signed token (see home.profiling.make_token) in the
+    X-Profile header or the `_profile` query parameter; `X-Profile-Mode:
+    sample` (or `_profile_mode=sample`) picks the sampling profiler over
+    cProfile. Untriggered requests pay one header and one substring check;
+    with PROFILING_ENABLED off the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if 'HTTP_X_PROFILE' not in request.META and '_profile=' not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+
+        from .profiling import check_token, profile_request
+
+        token = request.META.get('HTTP_X_PROFILE') or request.GET.get('_profile', '')
+        user_id = check_token(token)
+        if user_id is None:
+            return self.get_response(request)
+
+        mode = request.META.get('HTTP_X_PROFILE_MODE') or request.GET.get('_profile_mode') or 'cprofile'
+        response, name = profile_request(request, self.get_response, mode, user_id)
+        response['X-Profile-Id'] = name
+        return response
+
+
+class RequestContextMiddleware:
+    """
+    Request id, route and debug-sampling context for log records, plus one access log line per request.
+
+    A well-formed incoming X-Request-ID (e.g. from the load balancer) is
+    reused, otherwise a new one is generated; either way it is echoed in the
+    response. Belongs first in MIDDLEWARE so every other layer logs with it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'LOG_DEBUG_SAMPLE_RATE', 0.01)
+
+    def __call__(self, request):
+        request_id = request.META.get('HTTP_X_REQUEST_ID', '')
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        tokens = (
+            request_id_var.set(request_id),
+            route_var.set(None),
+            debug_sampled_var.set(random.random() < self.sample_rate),
+        )
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response['X-Request-ID'] = request_id
+            request_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    'user_id': self._user_id(request),
+                },
+            )
+            return response
+        finally:
+            for var, token in zip((request_id_var, route_var, debug_sampled_var), tokens):
+                var.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route_var.set(request.resolver_match.route or request.resolver_match.view_name)
+
+    @staticmethod
+    def _user_id(request):
+        # Only if something already resolved the user: the access log must not cost a query
+        user = request.__dict__.get('user')
+        if user is None or getattr(user, '_wrapped', None) is empty:
+            return None
+        return user.id
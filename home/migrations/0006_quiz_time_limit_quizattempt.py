@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_userprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='time_limit_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave empty for an untimed quiz', null=True, verbose_name='Timp limită (minute)'),
+        ),
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_progress', 'In progress'), ('submitted', 'Submitted'), ('expired', 'Expired')], default='in_progress', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('deadline', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('late', models.BooleanField(default=False)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='home.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Quiz Attempt',
+                'verbose_name_plural': 'Quiz Attempts',
+                'indexes': [models.Index(fields=['status', 'deadline'], name='attempt_status_deadline_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'in_progress')), fields=('user', 'quiz'), name='unique_open_attempt_per_quiz')],
+            },
+        ),
+    ]
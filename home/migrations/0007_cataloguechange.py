@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_quiz_time_limit_quizattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('discipline', 'Discipline'), ('quiz', 'Quiz'), ('question', 'Question'), ('answer', 'Answer')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Catalogue Change',
+                'verbose_name_plural': 'Catalogue Changes',
+                'indexes': [models.Index(fields=['model', 'object_id'], name='catalogue_change_object_idx')],
+            },
+        ),
+    ]
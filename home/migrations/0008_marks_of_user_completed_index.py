@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_cataloguechange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marks_of_user',
+            index=models.Index(fields=['completed', '-completed_at'], name='marks_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_marks_of_user_completed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answers', models.JSONField()),
+                ('late', models.BooleanField(default=False)),
+                ('user_timezone', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('claimed_by', models.CharField(blank=True, max_length=64)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('attempt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='home.quizattempt')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grading_jobs', to='home.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grading_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Grading Job',
+                'verbose_name_plural': 'Grading Jobs',
+                'indexes': [models.Index(fields=['status', 'id'], name='grading_job_status_idx')],
+            },
+        ),
+    ]
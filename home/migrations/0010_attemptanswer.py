@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-19 16:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_gradingjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.PositiveIntegerField()),
+                ('answer_id', models.PositiveIntegerField()),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Attempt Answer',
+                'verbose_name_plural': 'Attempt Answers',
+                'indexes': [models.Index(fields=['quiz', 'user'], name='attempt_answer_quiz_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_attemptanswer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('instructors', models.ManyToManyField(blank=True, related_name='taught_cohorts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cohort',
+                'verbose_name_plural': 'Cohorts',
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='home.cohort')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cohort Membership',
+                'verbose_name_plural': 'Cohort Memberships',
+                'unique_together': {('cohort', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortQuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempted', models.IntegerField(default=0)),
+                ('passed', models.IntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_stats', to='home.cohort')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.quiz')),
+            ],
+            options={
+                'verbose_name': 'Cohort Quiz Stats',
+                'verbose_name_plural': 'Cohort Quiz Stats',
+                'unique_together': {('cohort', 'quiz')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='home.cohort')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.quiz')),
+            ],
+            options={
+                'verbose_name': 'Cohort Score Bucket',
+                'verbose_name_plural': 'Cohort Score Buckets',
+                'unique_together': {('cohort', 'quiz', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortStreakDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('members', models.IntegerField(default=0)),
+                ('streak_sum', models.IntegerField(default=0)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='streak_days', to='home.cohort')),
+            ],
+            options={
+                'verbose_name': 'Cohort Streak Day',
+                'verbose_name_plural': 'Cohort Streak Days',
+                'unique_together': {('cohort', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_cohorts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveUserCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('start', models.DateField()),
+                ('users', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Active User Count',
+                'verbose_name_plural': 'Active User Counts',
+                'unique_together': {('period', 'start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct_answers', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Activity',
+                'verbose_name_plural': 'Daily Activity',
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
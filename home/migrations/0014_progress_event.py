@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0013_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='event_type',
+            field=models.CharField(choices=[('quiz.passed', 'Quiz passed'), ('streak.broken', 'Streak broken'), ('progress.updated', 'Progress updated')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_progress_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedQuizAttempt',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('in_progress', 'In progress'), ('submitted', 'Submitted'), ('expired', 'Expired')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('deadline', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('late', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Quiz Attempt',
+                'verbose_name_plural': 'Archived Quiz Attempts',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='marks_of_user',
+            options={'verbose_name': 'User Progress', 'verbose_name_plural': 'User Progress'},
+        ),
+        migrations.AddIndex(
+            model_name='marks_of_user',
+            index=models.Index(fields=['user', '-completed_at'], name='marks_user_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['finished_at'], name='attempt_finished_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedquizattempt',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.quiz'),
+        ),
+        migrations.AddField(
+            model_name='archivedquizattempt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedquizattempt',
+            index=models.Index(fields=['user', '-id'], name='archived_attempt_user_idx'),
+        ),
+    ]
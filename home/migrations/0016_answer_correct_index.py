@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_attempt_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['correct', '-id'], name='answer_correct_idx'),
+        ),
+    ]
@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
-import pytz
 from datetime import datetime, timedelta
 
+from .timezones import get_timezone_or_utc
+
 class Discipline(models.Model):
     name = models.CharField(max_length=50, verbose_name="Denumirea disciplinei")
     slug = models.SlugField(unique=True, blank=True)
@@ -19,6 +21,12 @@ class Quiz(models.Model):
     title = models.CharField(max_length=100)
     discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE)
     slug = models.SlugField(unique=True, max_length=100, blank=True)
+    time_limit_minutes = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Timp limită (minute)",
+        help_text="Leave empty for an untimed quiz"
+    )
 
     def __str__(self):
         return self.title
@@ -52,7 +60,14 @@ class Answer(models.Model):
     class Meta:
         verbose_name = 'Răspuns'
         verbose_name_plural = 'Răspunsuri'
+        indexes = [
+            # Admin changelist: filtered by correct, ordered by -pk
+            models.Index(fields=['correct', '-id'], name='answer_correct_idx'),
+        ]
     
+PASS_THRESHOLD = 70.0  # Percent score at which a quiz counts as passed
+
+
 class Marks_Of_User(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -63,8 +78,16 @@ class Marks_Of_User(models.Model):
     
     def save(self, *args, **kwargs):
         # Automatically set completed status based on score (70% threshold)
-        self.completed = self.score >= 70.0
+        self.completed = self.score >= PASS_THRESHOLD
         super().save(*args, **kwargs)
+        self._loaded_score = self.score
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Score before this write, so cohort rollups can apply just the change (home.cohorts)
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
     
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} - {self.score}%"
@@ -73,7 +96,13 @@ class Marks_Of_User(models.Model):
         verbose_name = 'User Progress'
         verbose_name_plural = 'User Progress'
         unique_together = ['quiz', 'user']
-        ordering = ['-completed_at']
+        # No default ordering: it made every unqualified query sort the table. Order explicitly.
+        indexes = [
+            # Admin changelist: filtered by completed, ordered by completed_at
+            models.Index(fields=['completed', '-completed_at'], name='marks_completed_idx'),
+            # A user's marks, newest first (my_scores, user-progress)
+            models.Index(fields=['user', '-completed_at'], name='marks_user_completed_idx'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -92,10 +121,7 @@ class UserProfile(models.Model):
     
     def get_user_timezone(self):
         """Get timezone object for this user"""
-        try:
-            return pytz.timezone(self.timezone)
-        except pytz.UnknownTimeZoneError:
-            return pytz.UTC
+        return get_timezone_or_utc(self.timezone)
     
     def get_user_today(self):
         """Get today's date in user's timezone"""
@@ -126,6 +152,17 @@ class UserStreak(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - Current: {self.current_streak} days"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_activity = (self.last_active_date, self.current_streak)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Streak before this write, for the cohort streak rollups (home.cohorts)
+        instance._loaded_activity = (instance.__dict__.get('last_active_date'), instance.__dict__.get('current_streak'))
+        return instance
     
     def update_streak(self, user_timezone=None):
         """
@@ -199,3 +236,458 @@ class UserStreak(models.Model):
     class Meta:
         verbose_name = 'User Streak'
         verbose_name_plural = 'User Streaks'
+
+
+class QuizAttempt(models.Model):
+    """A single timed (or untimed) run through a quiz with a server-side deadline"""
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_SUBMITTED, 'Submitted'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    started_at = models.DateTimeField(auto_now_add=True)
+    deadline = models.DateTimeField(null=True, blank=True)  # None for untimed quizzes
+    finished_at = models.DateTimeField(null=True, blank=True)
+    score = models.FloatField(null=True, blank=True)
+    late = models.BooleanField(default=False)  # Graded after the deadline (grace policy)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title} - {self.status}"
+
+    def is_past_deadline(self, now=None, grace_seconds=0):
+        """Check whether the attempt deadline (plus an optional grace period) has passed"""
+        if self.deadline is None:
+            return False
+        now = now or timezone.now()
+        return now > self.deadline + timedelta(seconds=grace_seconds)
+
+    @classmethod
+    def expire_overdue(cls, cutoff=None, batch_size=500):
+        """
+        Finalize in-progress attempts whose deadline is before cutoff, in batches
+
+        Uses the (status, deadline) index so each batch is a range read plus one UPDATE.
+
+        Returns:
+            int: number of attempts expired
+        """
+        now = timezone.now()
+        cutoff = cutoff or now
+        expired = 0
+        while True:
+            ids = list(
+                cls.objects
+                .filter(status=cls.STATUS_IN_PROGRESS, deadline__lt=cutoff)
+                .order_by('deadline')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return expired
+            expired += cls.objects.filter(
+                id__in=ids, status=cls.STATUS_IN_PROGRESS
+            ).update(status=cls.STATUS_EXPIRED, finished_at=now, score=0.0)
+
+    class Meta:
+        verbose_name = 'Quiz Attempt'
+        verbose_name_plural = 'Quiz Attempts'
+        indexes = [
+            models.Index(fields=['status', 'deadline'], name='attempt_status_deadline_idx'),
+            # Archiving range-reads finished attempts by age (home.history)
+            models.Index(fields=['finished_at'], name='attempt_finished_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'quiz'],
+                condition=models.Q(status='in_progress'),
+                name='unique_open_attempt_per_quiz',
+            ),
+        ]
+
+
+class ArchivedQuizAttempt(models.Model):
+    """
+    A finished QuizAttempt moved out of the hot table by `manage.py archive_attempts`.
+
+    Keeps the attempt's id and columns; home.history reads both tables as
+    one history. Marks, streaks, daily activity and cohort rollups live in
+    their own tables and are not touched by archiving.
+    """
+    id = models.BigIntegerField(primary_key=True)  # The QuizAttempt id
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=QuizAttempt.STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    deadline = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    score = models.FloatField(null=True, blank=True)
+    late = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.quiz_id} - {self.status} (archived)"
+
+    class Meta:
+        verbose_name = 'Archived Quiz Attempt'
+        verbose_name_plural = 'Archived Quiz Attempts'
+        indexes = [
+            models.Index(fields=['user', '-id'], name='archived_attempt_user_idx'),
+        ]
+
+
+class AttemptAnswer(models.Model):
+    """
+    Answer picked for one question in a user's latest graded submission of a quiz.
+
+    Kept so scores can be re-graded when an answer key is fixed
+    (home.regrading). Question and answer are plain ids: rows stay compact
+    and outlive catalogue edits. Invalid picks aren't stored.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='+')
+    question_id = models.PositiveIntegerField()
+    answer_id = models.PositiveIntegerField()
+
+    @classmethod
+    def replace(cls, user_id, quiz_id, results):
+        """Store a graded submission's picks (grade_answers() results), dropping the previous submission's"""
+        cls.objects.filter(quiz_id=quiz_id, user_id=user_id).delete()
+        cls.objects.bulk_create([
+            cls(user_id=user_id, quiz_id=quiz_id, question_id=result['question_id'], answer_id=result['user_answer_id'])
+            for result in results
+            if result['user_answer_id'] and 'error' not in result
+        ])
+
+    class Meta:
+        verbose_name = 'Attempt Answer'
+        verbose_name_plural = 'Attempt Answers'
+        indexes = [
+            models.Index(fields=['quiz', 'user'], name='attempt_answer_quiz_user_idx'),
+        ]
+
+
+class CatalogueChange(models.Model):
+    """
+    Append-only change log of catalogue content, used as the delta-sync cursor.
+
+    The auto-increment id is the sync token; deletions are kept as tombstones.
+    """
+    MODEL_CHOICES = [
+        ('discipline', 'Discipline'),
+        ('quiz', 'Quiz'),
+        ('question', 'Question'),
+        ('answer', 'Answer'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"#{self.id} {self.model} {self.object_id} {action}"
+
+    @classmethod
+    def record(cls, model, object_ids, deleted=False):
+        """Log changes for many objects of one catalogue model (for bulk writes that skip signals)"""
+        name = model._meta.model_name
+        cls.objects.bulk_create([
+            cls(model=name, object_id=object_id, deleted=deleted) for object_id in object_ids
+        ])
+
+    class Meta:
+        verbose_name = 'Catalogue Change'
+        verbose_name_plural = 'Catalogue Changes'
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='catalogue_change_object_idx'),
+        ]
+
+
+class GradingJob(models.Model):
+    """
+    A submission queued for the grading workers (GRADING_MODE = 'queued').
+
+    The request only validates and inserts; `manage.py grading_worker` grades,
+    records the mark and stores the same body the inline submit would return.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='grading_jobs')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='grading_jobs')
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.SET_NULL, null=True, blank=True)
+    answers = models.JSONField()
+    late = models.BooleanField(default=False)
+    user_timezone = models.CharField(max_length=50, blank=True)  # X-User-Timezone at submit time
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.CharField(max_length=200, blank=True)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.user_id} - {self.quiz_id} - {self.status}"
+
+    @classmethod
+    def claim(cls, worker, batch_size):
+        """
+        Mark up to batch_size queued jobs as running for worker and return them, oldest first.
+
+        The status check in the UPDATE makes concurrent workers skip jobs
+        another worker claimed between the read and the write. Where the
+        backend supports SKIP LOCKED (PostgreSQL), workers also lock the
+        rows they read, so concurrent claims take disjoint batches.
+        """
+        queued = cls.objects.filter(status=cls.STATUS_QUEUED).order_by('id')
+        with transaction.atomic():
+            if connections[queued.db].features.has_select_for_update_skip_locked:
+                queued = queued.select_for_update(skip_locked=True)
+            ids = list(queued.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return []
+            cls.objects.filter(id__in=ids, status=cls.STATUS_QUEUED).update(
+                status=cls.STATUS_RUNNING, claimed_by=worker, started_at=timezone.now()
+            )
+        return list(
+            cls.objects.filter(id__in=ids, status=cls.STATUS_RUNNING, claimed_by=worker)
+            .select_related('quiz', 'user', 'attempt')
+            .order_by('id')
+        )
+
+    @classmethod
+    def requeue_stale(cls, cutoff):
+        """Put back jobs claimed before cutoff by a worker that died mid-batch"""
+        return cls.objects.filter(status=cls.STATUS_RUNNING, started_at__lt=cutoff).update(
+            status=cls.STATUS_QUEUED, claimed_by='', started_at=None
+        )
+
+    class Meta:
+        verbose_name = 'Grading Job'
+        verbose_name_plural = 'Grading Jobs'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='grading_job_status_idx'),
+        ]
+
+
+class Cohort(models.Model):
+    """A class group followed by its instructors on the cohort dashboard (home.cohorts)"""
+    name = models.CharField(max_length=200)
+    instructors = models.ManyToManyField(User, related_name='taught_cohorts', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Cohort'
+        verbose_name_plural = 'Cohorts'
+
+
+class CohortMembership(models.Model):
+    """
+    A student in a cohort.
+
+    Add and remove members with home.cohorts.add_members()/remove_members(),
+    which rebuild the cohort's rollups; other writes need
+    `manage.py rebuild_cohort_rollups`.
+    """
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cohort_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.cohort_id} - {self.user_id}"
+
+    class Meta:
+        verbose_name = 'Cohort Membership'
+        verbose_name_plural = 'Cohort Memberships'
+        unique_together = ['cohort', 'user']
+
+
+class CohortQuizStats(models.Model):
+    """Rollup of a cohort's marks on one quiz, kept current on every mark write"""
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='quiz_stats')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='+')
+    attempted = models.IntegerField(default=0)
+    passed = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+
+    class Meta:
+        verbose_name = 'Cohort Quiz Stats'
+        verbose_name_plural = 'Cohort Quiz Stats'
+        unique_together = ['cohort', 'quiz']
+
+
+class CohortScoreBucket(models.Model):
+    """Members of a cohort whose mark on a quiz falls in one 10-point score band (bucket 0-9)"""
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='score_buckets')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='+')
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Cohort Score Bucket'
+        verbose_name_plural = 'Cohort Score Buckets'
+        unique_together = ['cohort', 'quiz', 'bucket']
+
+
+class CohortStreakDay(models.Model):
+    """
+    Members of a cohort whose streak was last extended on `date`, and the sum of their current streaks.
+
+    Streaks lapse with the calendar rather than with a write, so the
+    dashboard derives active/at-risk counts from these rows at read time.
+    """
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='streak_days')
+    date = models.DateField()
+    members = models.IntegerField(default=0)
+    streak_sum = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Cohort Streak Day'
+        verbose_name_plural = 'Cohort Streak Days'
+        unique_together = ['cohort', 'date']
+
+
+class DailyActivity(models.Model):
+    """
+    Graded submissions and correct answers per user per local day (the user's timezone at submit time).
+
+    Feeds the activity calendar; the unique (user, date) index serves a
+    year of days in one range read.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    attempts = models.PositiveIntegerField(default=0)
+    correct_answers = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date}: {self.attempts}"
+
+    @classmethod
+    def record(cls, user_id, date, correct_answers):
+        """
+        Count one submission on the user's local date.
+
+        An UPDATE in the common case; the first submission of the day inserts
+        the row and counts the user in the daily and weekly active-user rollups.
+        """
+        counters = {'attempts': F('attempts') + 1, 'correct_answers': F('correct_answers') + correct_answers}
+        if cls.objects.filter(user_id=user_id, date=date).update(**counters):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, date=date, attempts=1, correct_answers=correct_answers)
+        except IntegrityError:
+            # A concurrent submission created the row first
+            cls.objects.filter(user_id=user_id, date=date).update(**counters)
+            return
+
+        periods = [(ActiveUserCount.PERIOD_DAY, date)]
+        week_start = date - timedelta(days=date.weekday())
+        if not cls.objects.filter(
+            user_id=user_id, date__range=(week_start, week_start + timedelta(days=6))
+        ).exclude(date=date).exists():
+            periods.append((ActiveUserCount.PERIOD_WEEK, week_start))
+        ActiveUserCount.increment(periods)
+
+    class Meta:
+        verbose_name = 'Daily Activity'
+        verbose_name_plural = 'Daily Activity'
+        unique_together = ['user', 'date']
+
+
+class ActiveUserCount(models.Model):
+    """Distinct active users per local day, or per week starting Monday (kept by DailyActivity.record)"""
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, 'Day'),
+        (PERIOD_WEEK, 'Week'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    users = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.period} {self.start}: {self.users}"
+
+    @classmethod
+    def increment(cls, periods):
+        """Count one more active user in each (period, start)"""
+        cls.objects.bulk_create([cls(period=period, start=start) for period, start in periods], ignore_conflicts=True)
+        matches = models.Q()
+        for period, start in periods:
+            matches |= models.Q(period=period, start=start)
+        cls.objects.filter(matches).update(users=F('users') + 1)
+
+    class Meta:
+        verbose_name = 'Active User Count'
+        verbose_name_plural = 'Active User Counts'
+        unique_together = ['period', 'start']
+
+
+class OutboxEvent(models.Model):
+    """
+    Domain event written in the same transaction as the change it describes (home.outbox).
+
+    The auto-increment id is the consumers' cursor; downstream services read
+    these rows (pull API or dispatch_outbox), never the primary tables.
+    """
+    TYPE_QUIZ_PASSED = 'quiz.passed'
+    TYPE_STREAK_BROKEN = 'streak.broken'
+    TYPE_PROGRESS_UPDATED = 'progress.updated'
+    TYPE_CHOICES = [
+        (TYPE_QUIZ_PASSED, 'Quiz passed'),
+        (TYPE_STREAK_BROKEN, 'Streak broken'),
+        (TYPE_PROGRESS_UPDATED, 'Progress updated'),
+    ]
+
+    event_type = models.CharField(max_length=50, choices=TYPE_CHOICES)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type}"
+
+    class Meta:
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        indexes = [
+            models.Index(fields=['event_type', 'id'], name='outbox_event_type_idx'),
+        ]
+
+
+class OutboxCursor(models.Model):
+    """Delivery position and retry state of one OUTBOX_ENDPOINTS entry"""
+    endpoint = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)  # Consecutive failed deliveries
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=500, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.endpoint} @ {self.last_event_id}"
+
+    class Meta:
+        verbose_name = 'Outbox Cursor'
+        verbose_name_plural = 'Outbox Cursors'
@@ -0,0 +1,146 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import OutboxEvent, OutboxCursor
+
+logger = logging.getLogger(__name__)
+
+# Served by the pull API and dispatch_outbox. progress.updated is written for
+# the progress stream (home.stream) only and never leaves through the feed.
+FEED_EVENT_TYPES = [OutboxEvent.TYPE_QUIZ_PASSED, OutboxEvent.TYPE_STREAK_BROKEN]
+STREAM_ONLY_EVENT_TYPES = [OutboxEvent.TYPE_PROGRESS_UPDATED]
+
+
+def emit(event_type, payload):
+    """Write an event to the outbox; call inside the transaction that makes the change"""
+    return OutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+
+def read_events(after, limit, safety_lag, event_types=None):
+    """
+    Feed events with an id above the `after` cursor, oldest first.
+
+    Like the catalogue sync token, the returned cursor never passes an event
+    younger than safety_lag seconds: a transaction holding a lower id may not
+    have committed yet, and consumers would skip it for good. event_types
+    narrows FEED_EVENT_TYPES; other types are never returned.
+
+    Returns:
+        tuple: (list of event dicts, next cursor, has_more)
+    """
+    cutoff = timezone.now() - timedelta(seconds=safety_lag)
+    event_types = [name for name in event_types or FEED_EVENT_TYPES if name in FEED_EVENT_TYPES]
+    events = OutboxEvent.objects.filter(id__gt=after, event_type__in=event_types)
+    rows = list(events.order_by('id').values_list('id', 'event_type', 'payload', 'created_at')[:limit + 1])
+    has_more = len(rows) > limit
+
+    settled, cursor = [], after
+    for event_id, event_type, payload, created_at in rows[:limit]:
+        if created_at > cutoff:
+            has_more = False
+            break
+        settled.append({'id': event_id, 'type': event_type, 'created_at': created_at, 'payload': payload})
+        cursor = event_id
+    return settled, cursor, has_more
+
+
+def post_events(endpoint, events):
+    """
+    POST a batch to an endpoint as {"events": [...]}; raises on a network error or non-2xx response.
+
+    With a `secret`, X-Outbox-Signature carries the body's hex HMAC-SHA256.
+    """
+    body = json.dumps({'endpoint': endpoint['name'], 'events': events}, cls=DjangoJSONEncoder).encode()
+    headers = {'Content-Type': 'application/json'}
+    if endpoint.get('secret'):
+        headers['X-Outbox-Signature'] = hmac.new(endpoint['secret'].encode(), body, hashlib.sha256).hexdigest()
+    request = urllib.request.Request(endpoint['url'], data=body, headers=headers, method='POST')
+    timeout = getattr(settings, 'OUTBOX_DELIVERY_TIMEOUT', 10)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+
+
+def backoff_delay(failures):
+    """Seconds to wait after `failures` consecutive failures: doubling, capped, with jitter"""
+    base = getattr(settings, 'OUTBOX_BACKOFF_BASE', 5)
+    delay = min(base * 2 ** (failures - 1), getattr(settings, 'OUTBOX_BACKOFF_MAX', 600))
+    return delay * random.uniform(0.8, 1.0)
+
+
+def dispatch_endpoint(endpoint, batch_size, safety_lag):
+    """
+    Deliver the next batch of events to one endpoint, at least once.
+
+    The cursor only advances after a 2xx response; a failure schedules the
+    retry with backoff_delay(). Consumers dedupe on the event id.
+
+    Returns:
+        int: events delivered
+    """
+    cursor, _ = OutboxCursor.objects.get_or_create(endpoint=endpoint['name'])
+    now = timezone.now()
+    if cursor.next_attempt_at and cursor.next_attempt_at > now:
+        return 0
+
+    events, next_cursor, _ = read_events(cursor.last_event_id, batch_size, safety_lag, endpoint.get('event_types'))
+    if not events:
+        return 0
+    try:
+        post_events(endpoint, events)
+    except (OSError, ValueError) as exc:  # URLError/HTTPError are OSErrors; ValueError for a bad URL
+        cursor.failures += 1
+        cursor.next_attempt_at = now + timedelta(seconds=backoff_delay(cursor.failures))
+        cursor.last_error = str(exc)[:500]
+        cursor.save(update_fields=['failures', 'next_attempt_at', 'last_error', 'updated_at'])
+        logger.warning(
+            "Outbox delivery to %s failed (%s in a row)", endpoint['name'], cursor.failures,
+            extra={'endpoint': endpoint['name'], 'error': cursor.last_error},
+        )
+        return 0
+
+    cursor.last_event_id = next_cursor
+    cursor.failures = 0
+    cursor.next_attempt_at = None
+    cursor.last_error = ''
+    cursor.save(update_fields=['last_event_id', 'failures', 'next_attempt_at', 'last_error', 'updated_at'])
+    return len(events)
+
+
+def prune_events(cutoff, event_types, batch_size=1000, sleep=0.0):
+    """
+    Delete events of event_types created before cutoff, oldest first, in batches.
+
+    Events an OUTBOX_ENDPOINTS endpoint subscribed to haven't been delivered
+    yet are kept whatever their age; pull consumers have until the cutoff.
+
+    Returns:
+        int: events deleted
+    """
+    events = OutboxEvent.objects.filter(event_type__in=event_types, created_at__lt=cutoff)
+    names = [
+        endpoint['name'] for endpoint in getattr(settings, 'OUTBOX_ENDPOINTS', [])
+        if set(endpoint.get('event_types') or FEED_EVENT_TYPES) & set(event_types) & set(FEED_EVENT_TYPES)
+    ]
+    if names:
+        cursors = dict(OutboxCursor.objects.filter(endpoint__in=names).values_list('endpoint', 'last_event_id'))
+        events = events.filter(id__lte=min(cursors.get(name, 0) for name in names))
+    # Old events are at the low end of the primary key, so each batch is a short scan from the start
+    events = events.order_by('id')
+    deleted = 0
+    while True:
+        ids = list(events.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+        if sleep:
+            time.sleep(sleep)
@@ -0,0 +1,248 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+TOKEN_SALT = 'home.profiling'
+_PROFILE_NAME = re.compile(r'^[0-9]{20}-[0-9a-f]{32}$')
+
+
+def get_profile_root():
+    return getattr(settings, 'PROFILING_ROOT', os.path.join(settings.MEDIA_ROOT, 'profiles'))
+
+
+def make_token(user):
+    """Signed trigger for X-Profile / ?_profile=, issued to staff from the admin profiles page"""
+    return signing.dumps({'user': user.id}, salt=TOKEN_SALT)
+
+
+def check_token(token):
+    """Id of the staff user a valid, unexpired trigger token was issued to, or None"""
+    from django.contrib.auth.models import User
+
+    try:
+        payload = signing.loads(
+            token, salt=TOKEN_SALT, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+        )
+    except signing.BadSignature:
+        return None
+    # Tokens stop working as soon as the user loses staff status
+    if not User.objects.filter(id=payload.get('user'), is_staff=True, is_active=True).exists():
+        return None
+    return payload['user']
+
+
+def _frame_label(code):
+    return f'{code.co_filename}:{code.co_firstlineno}({code.co_name})'
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler for one thread.
+
+    A background thread snapshots the target thread's stack every
+    `interval` seconds; functions are ranked by how many samples they were
+    on the stack (total) or at the top of it (self).
+    """
+
+    def __init__(self, interval=0.005, max_depth=100):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[_frame_label(frame.f_code)] += 1
+            seen = set()
+            depth = 0
+            while frame is not None and depth < self.max_depth:
+                label = _frame_label(frame.f_code)
+                if label not in seen:
+                    seen.add(label)
+                    self.total_counts[label] += 1
+                frame = frame.f_back
+                depth += 1
+
+    def top_functions(self, limit):
+        samples = self.samples or 1
+        return [
+            {
+                'function': label,
+                'samples': count,
+                'self_samples': self.self_counts[label],
+                'share': round(count / samples * 100, 1),
+            }
+            for label, count in self.total_counts.most_common(limit)
+        ]
+
+
+def _cprofile_top_functions(profile, limit):
+    import pstats
+
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class QueryRecorder:
+    """Times every SQL statement through connection.execute_wrapper (works with DEBUG off)"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((context['connection'].alias, sql, time.perf_counter() - started))
+
+    def breakdown(self, limit):
+        grouped = defaultdict(lambda: {'count': 0, 'total_ms': 0.0})
+        for alias, sql, duration in self.queries:
+            entry = grouped[(alias, sql)]
+            entry['count'] += 1
+            entry['total_ms'] += duration * 1000
+        statements = sorted(grouped.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        return {
+            'count': len(self.queries),
+            'total_ms': round(sum(duration for _, _, duration in self.queries) * 1000, 3),
+            'statements': [
+                {'alias': alias, 'sql': sql, 'count': entry['count'], 'total_ms': round(entry['total_ms'], 3)}
+                for (alias, sql), entry in statements[:limit]
+            ],
+        }
+
+
+def profile_request(request, get_response, mode, user_id):
+    """
+    Run the rest of the middleware chain under a profiler and store the result.
+
+    Returns:
+        tuple: (response, profile name)
+    """
+    # Imported here: profiling is rare and these aren't needed at worker startup
+    import cProfile
+
+    limit = getattr(settings, 'PROFILING_TOP_FUNCTIONS', 40)
+    recorder = QueryRecorder()
+    profiler = (
+        SamplingProfiler(getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005))
+        if mode == 'sample' else cProfile.Profile()
+    )
+
+    started_at = timezone.now()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        if mode == 'sample':
+            profiler.start()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.stop()
+        else:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+    duration = time.perf_counter() - started
+
+    record = {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user_id': user_id,
+        'mode': mode,
+        'started_at': started_at.isoformat(),
+        'duration_ms': round(duration * 1000, 3),
+        'sql': recorder.breakdown(limit),
+        'functions': (
+            profiler.top_functions(limit) if mode == 'sample' else _cprofile_top_functions(profiler, limit)
+        ),
+    }
+    name = save_profile(record, profiler if mode != 'sample' else None)
+    return response, name
+
+
+def save_profile(record, profile=None):
+    """Write a profile (JSON summary plus the raw cProfile dump) and trim the ring to PROFILING_MAX_FILES"""
+    root = get_profile_root()
+    os.makedirs(root, exist_ok=True)
+    name = f"{timezone.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex}"
+    record['name'] = name
+    with open(os.path.join(root, f'{name}.json'), 'w') as handle:
+        json.dump(record, handle)
+    if profile is not None:
+        profile.dump_stats(os.path.join(root, f'{name}.prof'))
+
+    for old in list_profiles()[getattr(settings, 'PROFILING_MAX_FILES', 50):]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(root, f'{old}{extension}'))
+            except FileNotFoundError:
+                pass
+    return name
+
+
+def list_profiles():
+    """Stored profile names, newest first"""
+    try:
+        names = os.listdir(get_profile_root())
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-5] for name in names if name.endswith('.json')), reverse=True)
+
+
+def profile_path(name, extension='.json'):
+    """Path of a stored profile, or None for names that aren't ours (no path traversal)"""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(get_profile_root(), f'{name}{extension}')
+    return path if os.path.exists(path) else None
+
+
+def load_profile(name):
+    path = profile_path(name)
+    if path is None:
+        return None
+    with open(path) as handle:
+        return json.load(handle)
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+
+from .caching import get_progress_version
+from .models import Marks_Of_User
+
+
+class ProgressIndex:
+    """
+    One user's marks as lookups: score per quiz id and the set of passed quiz ids.
+
+    Built from a single query and cached per user under their progress
+    version, so any write to their marks starts a new entry.
+    """
+
+    def __init__(self, rows):
+        self.scores = {}
+        self.completed = set()
+        for quiz_id, score, completed in rows:
+            self.scores[quiz_id] = score
+            if completed:
+                self.completed.add(quiz_id)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def score(self, quiz_id):
+        return self.scores.get(quiz_id)
+
+    def is_passed(self, quiz_id):
+        return quiz_id in self.completed
+
+    def status(self, quiz_id):
+        """'passed', 'failed' (attempted below PASS_THRESHOLD) or None (not attempted)"""
+        if quiz_id in self.completed:
+            return 'passed'
+        return 'failed' if quiz_id in self.scores else None
+
+
+def get_progress_index(user_id):
+    key = f'progress:index:{user_id}:{get_progress_version(user_id)}'
+    index = cache.get(key)
+    if index is None:
+        index = ProgressIndex(
+            Marks_Of_User.objects.filter(user_id=user_id).order_by().values_list('quiz_id', 'score', 'completed')
+        )
+        cache.set(key, index, 24 * 60 * 60)
+    return index
+
+
+def get_request_progress(request):
+    """The requesting user's ProgressIndex, loaded once per request; None for anonymous users"""
+    if not (request and request.user.is_authenticated):
+        return None
+    # Serializers ask once per row: keep it on the underlying HttpRequest, not the cache
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, '_progress_index'):
+        http_request._progress_index = get_progress_index(request.user.id)
+    return http_request._progress_index
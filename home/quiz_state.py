@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+def new_quiz_state():
+    return {'question_number': 1, 'user_answers': [], 'score': 0}
+
+
+class SessionQuizStateStore:
+    """
+    Quiz progress in the user's session, one key per quiz.
+
+    Every answer rewrites the whole session through SESSION_ENGINE (a
+    database row with the default engine).
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+
+    @staticmethod
+    def key(quiz_id):
+        return f'quiz_state:{quiz_id}'
+
+    def get(self, quiz_id):
+        return self.session.get(self.key(quiz_id))
+
+    def set(self, quiz_id, state):
+        self.session[self.key(quiz_id)] = state
+
+    def delete(self, quiz_id):
+        self.session.pop(self.key(quiz_id), None)
+
+
+class CacheQuizStateStore:
+    """
+    Quiz progress in the `quiz_state` cache, keyed by user and quiz.
+
+    One cache write per answer and no session write at all. Needs a cache
+    shared by all workers (Redis/Memcached) once there is more than one.
+    """
+
+    def __init__(self, request):
+        self.cache = caches['quiz_state']
+        self.user_id = request.user.id
+        self.timeout = getattr(settings, 'QUIZ_STATE_TIMEOUT', 6 * 60 * 60)
+
+    def key(self, quiz_id):
+        return f'quiz_state:{self.user_id}:{quiz_id}'
+
+    def get(self, quiz_id):
+        return self.cache.get(self.key(quiz_id))
+
+    def set(self, quiz_id, state):
+        self.cache.set(self.key(quiz_id), state, self.timeout)
+
+    def delete(self, quiz_id):
+        self.cache.delete(self.key(quiz_id))
+
+
+def get_quiz_state_store(request):
+    """The QUIZ_STATE_STORE configured for the HTML quiz flow"""
+    store_class = import_string(getattr(settings, 'QUIZ_STATE_STORE', 'home.quiz_state.SessionQuizStateStore'))
+    return store_class(request)
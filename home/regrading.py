@@ -0,0 +1,124 @@
+from array import array
+
+from django.db import connections, transaction
+
+from .caching import bump_progress_versions
+from .cohorts import rebuild_cohort_rollups
+from .grading import load_answer_key
+from .models import AttemptAnswer, CohortMembership, Marks_Of_User, OutboxEvent, PASS_THRESHOLD
+
+
+def _numpy():
+    # Imported on first use: optional, and not needed at worker startup
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return numpy
+
+
+def load_picks(quiz_id, fetch_size=50000):
+    """
+    Stored picks of a quiz as two parallel array('q'): (user ids, answer ids).
+
+    Read with a raw cursor in fetchmany() chunks; no model instances are built.
+    On PostgreSQL the cursor is server-side, so only one chunk is held at a time.
+    """
+    queryset = AttemptAnswer.objects.filter(quiz_id=quiz_id).order_by().values_list('user_id', 'answer_id')
+    sql, params = queryset.query.sql_with_params()
+    user_ids, answer_ids = array('q'), array('q')
+    with connections[queryset.db].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for user_id, answer_id in rows:
+                user_ids.append(user_id)
+                answer_ids.append(answer_id)
+    return user_ids, answer_ids
+
+
+def compute_scores(user_ids, answer_ids, correct_ids, total_questions):
+    """
+    Percentage score per user against an answer key.
+
+    Returns:
+        dict: {user id: score}, for every user with at least one stored pick
+    """
+    np = _numpy()
+    if np is not None:
+        users = np.frombuffer(user_ids, dtype=np.int64)
+        answers = np.frombuffer(answer_ids, dtype=np.int64)
+        unique_users, user_index = np.unique(users, return_inverse=True)
+        correct = np.isin(answers, np.fromiter(correct_ids, dtype=np.int64, count=len(correct_ids)))
+        counts = np.bincount(user_index, weights=correct, minlength=len(unique_users))
+        scores = counts / total_questions * 100
+        return dict(zip(unique_users.tolist(), scores.tolist()))
+
+    correct_counts = {}
+    for user_id, answer_id in zip(user_ids, answer_ids):
+        correct_counts[user_id] = correct_counts.get(user_id, 0) + (answer_id in correct_ids)
+    return {user_id: count / total_questions * 100 for user_id, count in correct_counts.items()}
+
+
+def regrade_quiz(quiz_id, chunk_size=1000, dry_run=False):
+    """
+    Recompute every stored mark of a quiz against its current answer key.
+
+    Only marks backed by stored picks are touched (marks recorded before
+    picks were kept can't be re-graded). Changed marks are written with
+    bulk_update in chunks of chunk_size, each in its own transaction with
+    the quiz.passed events of marks that now pass.
+
+    Returns:
+        dict: picks read, users re-graded and marks changed
+    """
+    answer_key = load_answer_key(quiz_id)
+    if not answer_key:
+        return {'quiz_id': quiz_id, 'picks': 0, 'users': 0, 'changed': 0}
+    correct_ids = {
+        answer_id for _, _, answers, _ in answer_key for answer_id, (_, correct) in answers.items() if correct
+    }
+
+    user_ids, answer_ids = load_picks(quiz_id)
+    scores = compute_scores(user_ids, answer_ids, correct_ids, len(answer_key))
+
+    changed, previous_scores = [], {}
+    for mark_id, user_id, old_score in (
+        Marks_Of_User.objects.filter(quiz_id=quiz_id).order_by().values_list('id', 'user_id', 'score')
+        .iterator(chunk_size=2000)
+    ):
+        score = scores.get(user_id)
+        if score is not None and abs(score - old_score) > 1e-9:
+            # bulk_update skips save(), so keep `completed` in step by hand
+            changed.append(Marks_Of_User(id=mark_id, user_id=user_id, score=score, completed=score >= PASS_THRESHOLD))
+            previous_scores[mark_id] = old_score
+
+    if not dry_run:
+        for start in range(0, len(changed), chunk_size):
+            chunk = changed[start:start + chunk_size]
+            with transaction.atomic():
+                Marks_Of_User.objects.bulk_update(chunk, ['score', 'completed'])
+                # ...and write the quiz.passed events mark_saved_outbox would have, with the marks
+                OutboxEvent.objects.bulk_create([
+                    OutboxEvent(event_type=OutboxEvent.TYPE_QUIZ_PASSED, payload={
+                        'user_id': mark.user_id,
+                        'quiz_id': quiz_id,
+                        'score': mark.score,
+                        'previous_score': previous_scores[mark.id],
+                    })
+                    for mark in chunk
+                    if mark.completed and previous_scores[mark.id] < PASS_THRESHOLD
+                ])
+        bump_progress_versions({mark.user_id for mark in changed})
+        if changed:
+            # bulk_update skips the signals that keep cohort rollups current
+            cohort_ids = (
+                CohortMembership.objects.filter(user__marks_of_user__quiz_id=quiz_id)
+                .order_by().values_list('cohort_id', flat=True).distinct()
+            )
+            for cohort_id in list(cohort_ids):
+                rebuild_cohort_rollups(cohort_id)
+
+    return {'quiz_id': quiz_id, 'picks': len(answer_ids), 'users': len(scores), 'changed': len(changed)}
@@ -0,0 +1,64 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+# Fallback for types the fast encoders don't handle (datetimes, Decimal, lazy strings, ...),
+# producing exactly what DRF's JSON encoder would so all formats carry the same values
+_encode_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson when it is installed.
+
+    Falls back to DRF's stdlib encoder for browsable/indented output and when
+    orjson is missing, so it can always be the default JSON renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson handles datetimes natively but formats UTC as +00:00; route them through DRF instead
+        return orjson.dumps(
+            data,
+            default=_encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary responses for clients sending `Accept: application/msgpack`"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    """Accept `Content-Type: application/msgpack` request bodies (e.g. quiz submissions)"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -1,6 +1,26 @@
 from rest_framework import serializers
-from .models import Discipline, Quiz, Question, Answer, Marks_Of_User, UserStreak, UserProfile
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import (
+    Discipline, Quiz, Question, Answer, Marks_Of_User, UserStreak, UserProfile, QuizAttempt, GradingJob, Cohort,
+)
 from django.contrib.auth.models import User
+from .progress import get_progress_index, get_request_progress
+
+
+def _count(obj, annotation, related_name):
+    """Use the view's COUNT annotation when present (one query per list instead of one per row)"""
+    value = getattr(obj, annotation, None)
+    if value is not None:
+        return value
+    return getattr(obj, related_name).count()
+
+
+def _user_score(obj, request):
+    """The requesting user's score on a quiz from their progress index (None if not attempted)"""
+    progress = get_request_progress(request)
+    return progress.score(obj.id) if progress is not None else None
 
 
 class AnswerSerializer(serializers.ModelSerializer):
@@ -42,7 +62,7 @@ class QuizSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'discipline', 'slug', 'questions', 'question_count']
     
     def get_question_count(self, obj):
-        return obj.question_set.count()
+        return _count(obj, 'question_count', 'question_set')
 
 
 class QuizListSerializer(serializers.ModelSerializer):
@@ -55,17 +75,10 @@ class QuizListSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'discipline', 'slug', 'question_count', 'user_score']
     
     def get_question_count(self, obj):
-        return obj.question_set.count()
+        return _count(obj, 'question_count', 'question_set')
     
     def get_user_score(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                mark = Marks_Of_User.objects.get(quiz=obj, user=request.user)
-                return mark.score
-            except Marks_Of_User.DoesNotExist:
-                return None
-        return None
+        return _user_score(obj, self.context.get('request'))
 
 
 class QuizTakeSerializer(serializers.ModelSerializer):
@@ -75,10 +88,10 @@ class QuizTakeSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'questions', 'question_count']
+        fields = ['id', 'title', 'time_limit_minutes', 'questions', 'question_count']
     
     def get_question_count(self, obj):
-        return obj.question_set.count()
+        return _count(obj, 'question_count', 'question_set')
 
 
 class DisciplineSerializer(serializers.ModelSerializer):
@@ -90,7 +103,7 @@ class DisciplineSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'quizzes', 'quiz_count']
     
     def get_quiz_count(self, obj):
-        return obj.quiz_set.count()
+        return _count(obj, 'quiz_count', 'quiz_set')
 
 
 class DisciplineListSerializer(serializers.ModelSerializer):
@@ -102,7 +115,7 @@ class DisciplineListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'quiz_count']
     
     def get_quiz_count(self, obj):
-        return obj.quiz_set.count()
+        return _count(obj, 'quiz_count', 'quiz_set')
 
 
 class QuizSubmissionSerializer(serializers.Serializer):
@@ -111,6 +124,63 @@ class QuizSubmissionSerializer(serializers.Serializer):
         child=serializers.IntegerField(),
         help_text="Dictionary with question_id as key and answer_id as value"
     )
+    attempt_id = serializers.IntegerField(
+        required=False,
+        help_text="Attempt returned by the start endpoint (required for timed quizzes)"
+    )
+
+
+class GradingJobSerializer(serializers.ModelSerializer):
+    """Status of a queued submission; `result` is the inline submit body once done"""
+    job_id = serializers.IntegerField(source='id', read_only=True)
+
+    class Meta:
+        model = GradingJob
+        fields = ['job_id', 'quiz_id', 'attempt_id', 'status', 'result', 'error', 'submitted_at', 'finished_at']
+        read_only_fields = fields
+
+
+class CohortSerializer(serializers.ModelSerializer):
+    member_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Cohort
+        fields = ['id', 'name', 'member_count', 'created_at']
+        read_only_fields = fields
+
+
+class AuthoringAnswerSerializer(serializers.Serializer):
+    content = serializers.CharField(max_length=600)
+    correct = serializers.BooleanField(default=False)
+
+
+class QuestionAuthoringSerializer(serializers.Serializer):
+    """A new question with its answers (batched authoring endpoint)"""
+    quiz_id = serializers.IntegerField()
+    content = serializers.CharField(max_length=200)
+    answers = AuthoringAnswerSerializer(many=True)
+
+    def validate_answers(self, value):
+        if len(value) < 2:
+            raise serializers.ValidationError("A question needs at least two answers")
+        if sum(answer['correct'] for answer in value) != 1:
+            raise serializers.ValidationError("Exactly one answer must be correct")
+        return value
+
+
+class QuizAttemptSerializer(serializers.ModelSerializer):
+    """Serializer for timed quiz attempts"""
+    attempt_id = serializers.IntegerField(source='id', read_only=True)
+    quiz_id = serializers.IntegerField(source='quiz.id', read_only=True)
+    time_limit_minutes = serializers.IntegerField(source='quiz.time_limit_minutes', read_only=True)
+
+    class Meta:
+        model = QuizAttempt
+        fields = [
+            'attempt_id', 'quiz_id', 'status', 'started_at', 'deadline',
+            'time_limit_minutes', 'finished_at', 'score', 'late'
+        ]
+        read_only_fields = fields
 
 
 class UserScoreSerializer(serializers.ModelSerializer):
@@ -125,10 +195,10 @@ class UserScoreSerializer(serializers.ModelSerializer):
 class UserProgressSerializer(serializers.ModelSerializer):
     """Serializer for user progress tracking"""
     quiz_title = serializers.CharField(source='quiz.title', read_only=True)
-    quiz_id = serializers.IntegerField(source='quiz.id', read_only=True)
-    discipline_id = serializers.IntegerField(source='quiz.discipline.id', read_only=True)
+    quiz_id = serializers.IntegerField(read_only=True)
+    discipline_id = serializers.IntegerField(source='quiz.discipline_id', read_only=True)
     discipline_name = serializers.CharField(source='quiz.discipline.name', read_only=True)
-    user_id = serializers.IntegerField(source='user.id', read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Marks_Of_User
@@ -215,10 +285,10 @@ class UserDetailSerializer(serializers.ModelSerializer):
                  'date_joined', 'streak', 'profile', 'total_quizzes_completed', 'average_score']
     
     def get_total_quizzes_completed(self, obj):
-        return Marks_Of_User.objects.filter(user=obj).count()
+        return len(get_progress_index(obj.id))
     
     def get_average_score(self, obj):
-        scores = Marks_Of_User.objects.filter(user=obj).values_list('score', flat=True)
+        scores = get_progress_index(obj.id).scores.values()
         if scores:
             return round(sum(scores) / len(scores), 2)
         return 0
@@ -233,30 +303,64 @@ class RoadmapQuizSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'is_completed', 'score']
     
     def get_is_completed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Marks_Of_User.objects.filter(quiz=obj, user=request.user).exists()
-        return False
+        return _user_score(obj, self.context.get('request')) is not None
     
     def get_score(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                mark = Marks_Of_User.objects.get(quiz=obj, user=request.user)
-                return mark.score
-            except Marks_Of_User.DoesNotExist:
-                return None
-        return None
+        return _user_score(obj, self.context.get('request'))
 
 
 class DisciplineRoadmapSerializer(serializers.ModelSerializer):
+    discipline_id = serializers.IntegerField(source='id', read_only=True)
     quizzes = RoadmapQuizSerializer(source='quiz_set', many=True, read_only=True)
     
     class Meta:
         model = Discipline
         fields = ['discipline_id', 'name', 'quizzes']
-        
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['discipline_id'] = instance.id
-        return representation
\ No newline at end of file
+
+
+def add_user_claims(token, user):
+    """Set the claims ClaimsJWTAuthentication reads from the user's current rows"""
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['timezone'] = (
+        UserProfile.objects.filter(user=user).values_list('timezone', flat=True).first() or 'UTC'
+    )
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the claims ClaimsJWTAuthentication needs for read-only requests"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that re-issues the claims from the database.
+
+    Rotated refresh tokens would otherwise carry the login's is_staff and
+    timezone forever; users deactivated or deleted since can't refresh.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}).first()
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed('No active account found for the given token.', code='no_active_account')
+        add_user_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # rest_framework_simplejwt.token_blacklist isn't installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -0,0 +1,139 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import bump_catalogue_version, bump_progress_version
+from .cohorts import (
+    apply_mark_change, apply_streak_change, get_user_cohort_ids, invalidate_user_cohorts, rebuild_cohort_rollups,
+)
+from .models import (
+    Discipline, Quiz, Question, Answer, Marks_Of_User, UserStreak, CatalogueChange, CohortMembership, OutboxEvent,
+    PASS_THRESHOLD,
+)
+from .outbox import emit
+
+CATALOGUE_MODELS = (Discipline, Quiz, Question, Answer)
+
+
+def catalogue_changed(model, object_ids, deleted=False):
+    """
+    Record catalogue writes in the sync change log and invalidate cached catalogue responses.
+
+    Called by the signal receivers below, and directly by bulk writes
+    (bulk_create, queryset.update) that don't send model signals. The
+    version is bumped once the write commits: bumped earlier, a concurrent
+    read could cache pre-edit data under the new version.
+    """
+    CatalogueChange.record(model, object_ids, deleted=deleted)
+    transaction.on_commit(bump_catalogue_version)
+
+
+def catalogue_saved(sender, instance, raw=False, **kwargs):
+    """Any admin change to catalogue content is logged and invalidates the cached catalogue"""
+    if not raw:
+        catalogue_changed(sender, [instance.pk])
+
+
+def catalogue_deleted(sender, instance, **kwargs):
+    catalogue_changed(sender, [instance.pk], deleted=True)
+
+
+# Connected per model: a global post_delete receiver would force every other
+# model's deletes off Django's fast path (SELECT the rows, then DELETE)
+for model in CATALOGUE_MODELS:
+    post_save.connect(catalogue_saved, sender=model, dispatch_uid=f'catalogue_saved_{model.__name__}')
+    post_delete.connect(catalogue_deleted, sender=model, dispatch_uid=f'catalogue_deleted_{model.__name__}')
+
+
+@receiver(post_save, sender=Marks_Of_User)
+@receiver(post_delete, sender=Marks_Of_User)
+def invalidate_user_progress(sender, instance, **kwargs):
+    """
+    A user's own progress change must be visible immediately, so it changes their cache keys.
+
+    Bumped on commit, like the catalogue version, so a read racing the
+    write can't cache the old progress under the new version.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_progress_version(user_id))
+
+
+def _rebuild_user_cohorts(user_id):
+    # Saved without being loaded first (e.g. Model(id=...).save()): the previous values are unknown
+    for cohort_id in get_user_cohort_ids(user_id):
+        rebuild_cohort_rollups(cohort_id)
+
+
+@receiver(post_save, sender=Marks_Of_User)
+def mark_saved_rollups(sender, instance, created, raw=False, **kwargs):
+    """Keep cohort rollups current; the score before the write comes from Marks_Of_User.from_db()"""
+    if raw:
+        return
+    if created:
+        apply_mark_change(instance.user_id, instance.quiz_id, None, instance.score)
+    elif hasattr(instance, '_loaded_score'):
+        apply_mark_change(instance.user_id, instance.quiz_id, instance._loaded_score, instance.score)
+    else:
+        _rebuild_user_cohorts(instance.user_id)
+
+
+@receiver(post_delete, sender=Marks_Of_User)
+def mark_deleted_rollups(sender, instance, **kwargs):
+    apply_mark_change(instance.user_id, instance.quiz_id, instance.score, None)
+
+
+@receiver(post_save, sender=UserStreak)
+def streak_saved_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    activity = (instance.last_active_date, instance.current_streak)
+    if created:
+        apply_streak_change(instance.user_id, (None, 0), activity)
+    elif hasattr(instance, '_loaded_activity'):
+        apply_streak_change(instance.user_id, instance._loaded_activity, activity)
+    else:
+        _rebuild_user_cohorts(instance.user_id)
+
+
+@receiver(post_save, sender=CohortMembership)
+@receiver(post_delete, sender=CohortMembership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_user_cohorts([instance.user_id])
+
+
+@receiver(post_save, sender=Marks_Of_User)
+def mark_saved_outbox(sender, instance, created, raw=False, **kwargs):
+    """quiz.passed when a mark reaches PASS_THRESHOLD, in the transaction of the write"""
+    if raw or not instance.completed:
+        return
+    previous = None if created else getattr(instance, '_loaded_score', None)
+    if previous is not None and previous >= PASS_THRESHOLD:
+        return
+    emit(OutboxEvent.TYPE_QUIZ_PASSED, {
+        'user_id': instance.user_id,
+        'quiz_id': instance.quiz_id,
+        'score': instance.score,
+        'previous_score': previous,
+    })
+
+
+@receiver(post_save, sender=UserStreak)
+def streak_saved_outbox(sender, instance, created, raw=False, **kwargs):
+    """
+    streak.broken when activity resumes after a missed day.
+
+    A lapse is only seen once the user is active again, so the event is
+    written then, carrying the length of the streak that was lost.
+    """
+    if raw or created or not hasattr(instance, '_loaded_activity'):
+        return
+    last_active_date, previous_streak = instance._loaded_activity
+    if last_active_date is None or instance.last_active_date is None:
+        return
+    if (instance.last_active_date - last_active_date).days > 1 and previous_streak:
+        emit(OutboxEvent.TYPE_STREAK_BROKEN, {
+            'user_id': instance.user_id,
+            'previous_streak': previous_streak,
+            'last_active_date': last_active_date.isoformat(),
+            'resumed_on': instance.last_active_date.isoformat(),
+        })
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+STREAM_EVENT_TYPES = [
+    OutboxEvent.TYPE_PROGRESS_UPDATED,
+    OutboxEvent.TYPE_QUIZ_PASSED,
+    OutboxEvent.TYPE_STREAK_BROKEN,
+]
+
+
+def _stream_user_id(scope):
+    """User id from an access token in ?token= (EventSource can't send headers) or Authorization: Bearer"""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if token is None:
+        for name, value in scope.get('headers', []):
+            if name == b'authorization' and value.startswith(b'Bearer '):
+                token = value[7:].decode()
+    if not token:
+        return None
+    try:
+        return AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+class OutboxPoller:
+    """
+    One reader of the outbox per process, fanning new events out to per-user queues.
+
+    The database is queried once per interval however many streams are open,
+    and not at all while none are. Queries run on the default executor, not
+    the single thread sync views share under ASGI, so polls never queue up
+    behind (or hold up) request handling.
+    Events are pushed as soon as they are seen; the resume point only moves
+    past events older than OUTBOX_SAFETY_LAG (a lower id may still be
+    committing) and ids pushed above it are remembered so none is sent twice.
+    """
+
+    def __init__(self, interval, queue_size=100, batch_size=1000):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.subscribers = {}
+        self.settled = None
+        self.pushed = set()
+        self.task = None
+
+    def subscribe(self, user_id):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        if self.settled is None:
+            self.settled = await self._query(self._latest_id)
+        while self.subscribers:
+            try:
+                events = await self._query(self._read)
+            except Exception:
+                logger.exception("Outbox poll failed")
+                events = []
+            for event in events:
+                self._publish(event)
+            await asyncio.sleep(self.interval)
+        # Nobody is listening: stop polling; the next subscribe starts again from the newest event
+        self.task = None
+        self.settled = None
+        self.pushed = set()
+
+    async def _query(self, method):
+        return await sync_to_async(self._run_query, thread_sensitive=False)(method)
+
+    @staticmethod
+    def _run_query(method):
+        try:
+            return method()
+        finally:
+            # Executor threads never see request_finished, so nothing else would close their connection
+            close_old_connections()
+
+    def _latest_id(self):
+        return OutboxEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def _read(self):
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'OUTBOX_SAFETY_LAG', 2))
+        rows = list(
+            OutboxEvent.objects.filter(id__gt=self.settled, event_type__in=STREAM_EVENT_TYPES)
+            .order_by('id').values_list('id', 'event_type', 'payload', 'created_at')[:self.batch_size]
+        )
+        events = []
+        settling = True
+        for event_id, event_type, payload, created_at in rows:
+            if event_id not in self.pushed:
+                self.pushed.add(event_id)
+                events.append({'id': event_id, 'type': event_type, 'payload': payload})
+            if settling and created_at <= cutoff:
+                self.settled = event_id
+            else:
+                settling = False
+        self.pushed = {event_id for event_id in self.pushed if event_id > self.settled}
+        return events
+
+    def _publish(self, event):
+        for queue in self.subscribers.get(event['payload'].get('user_id'), ()):
+            if queue.full():
+                # A stalled client loses its oldest delta rather than holding up the others
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+class ProgressStream:
+    """
+    ASGI app streaming a user's progress, streak and completion events as Server-Sent Events.
+
+    Served by lawquiz/asgi.py at STREAM_PATH. Each connection is a coroutine
+    waiting on its queue, so idle connections cost memory only.
+    """
+
+    def __init__(self, poll_interval=None, heartbeat=None):
+        self.poller = OutboxPoller(
+            poll_interval if poll_interval is not None else getattr(settings, 'STREAM_POLL_INTERVAL', 0.5)
+        )
+        self.heartbeat = heartbeat if heartbeat is not None else getattr(settings, 'STREAM_HEARTBEAT', 15)
+
+    async def __call__(self, scope, receive, send):
+        user_id = _stream_user_id(scope)
+        if user_id is None:
+            await send({
+                'type': 'http.response.start', 'status': 401,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({'type': 'http.response.body', 'body': b'{"detail": "Valid access token required"}'})
+            return
+
+        queue = self.poller.subscribe(user_id)
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, queue))
+        try:
+            await send({
+                'type': 'http.response.start', 'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),  # nginx: don't buffer the stream
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                    continue
+                if event is None:
+                    break
+                data = json.dumps(event['payload'], cls=DjangoJSONEncoder)
+                message = f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+                await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+        except OSError:
+            pass  # Client went away mid-write
+        finally:
+            watcher.cancel()
+            self.poller.unsubscribe(user_id, queue)
+
+    async def _watch_disconnect(self, receive, queue):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
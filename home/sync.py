@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Discipline, Quiz, Question, Answer, CatalogueChange
+
+# Sync payload key, model and the columns sent to clients (answers never include `correct`)
+SYNC_MODELS = [
+    ('disciplines', Discipline, ('id', 'name', 'slug')),
+    ('quizzes', Quiz, ('id', 'title', 'discipline_id', 'slug', 'time_limit_minutes')),
+    ('questions', Question, ('id', 'content', 'quiz_id')),
+    ('answers', Answer, ('id', 'content', 'question_id')),
+]
+
+
+def untimed(quiz_path=''):
+    """Q for rows whose quiz (reached through quiz_path, e.g. 'quiz__') has no time limit"""
+    return Q(**{f'{quiz_path}time_limit_minutes__isnull': True}) | Q(**{f'{quiz_path}time_limit_minutes': 0})
+
+
+# Timed quizzes' questions are only served inside a started attempt (QuizViewSet.take), never synced
+SYNC_VISIBLE = {
+    'questions': untimed('quiz__'),
+    'answers': untimed('question__quiz__'),
+}
+
+
+def _empty_payload(token, reset, has_more):
+    payload = {'token': token, 'reset': reset, 'has_more': has_more}
+    for key, model, fields in SYNC_MODELS:
+        payload[key] = []
+    payload['deleted'] = {key: [] for key, model, fields in SYNC_MODELS}
+    return payload
+
+
+def _settled_token(cutoff):
+    """Id of the newest change old enough that no earlier id can still be uncommitted"""
+    settled = CatalogueChange.objects.filter(created_at__lte=cutoff).aggregate(last=Max('id'))['last']
+    return settled or 0
+
+
+def build_sync_payload(since, limit, safety_lag):
+    """
+    Catalogue objects created, changed or deleted after the `since` token.
+
+    A missing/zero token, or one ahead of the change log (e.g. a restored
+    database), returns a full snapshot with `reset` set. Otherwise changes are
+    read in id order, at most `limit` entries per page, and reported with
+    the objects' current values; objects that no longer exist are returned
+    as tombstones in `deleted`. Questions and answers of timed quizzes are
+    never sent: snapshots leave them out and deltas report them as deleted.
+    A changed quiz re-sends (or withdraws) its questions and answers, since
+    its time limit may have been set or cleared. The returned token never
+    advances past a change younger than `safety_lag` seconds, since a
+    transaction that took a lower id may not have committed yet; those
+    changes are sent again on the next sync, which is harmless as clients
+    upsert.
+
+    Returns:
+        dict: token, reset, has_more, one list per model and a `deleted` dict of id lists
+    """
+    cutoff = timezone.now() - timedelta(seconds=safety_lag)
+    latest = CatalogueChange.objects.aggregate(last=Max('id'))['last'] or 0
+
+    if not since or since > latest:
+        payload = _empty_payload(_settled_token(cutoff), reset=True, has_more=False)
+        for key, model, fields in SYNC_MODELS:
+            payload[key] = list(model.objects.filter(SYNC_VISIBLE.get(key, Q())).order_by('id').values(*fields))
+        return payload
+
+    changes = list(
+        CatalogueChange.objects.filter(id__gt=since).order_by('id')
+        .values_list('id', 'model', 'object_id', 'created_at')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    token = since
+    for change_id, _, _, created_at in changes:
+        if created_at > cutoff:
+            has_more = False
+            break
+        token = change_id
+
+    payload = _empty_payload(token, reset=False, has_more=has_more)
+    changed_ids = {}
+    for _, model_name, object_id, _ in changes:
+        changed_ids.setdefault(model_name, set()).add(object_id)
+    quiz_ids = changed_ids.get('quiz')
+    if quiz_ids:
+        changed_ids.setdefault('question', set()).update(
+            Question.objects.filter(quiz_id__in=quiz_ids).values_list('id', flat=True)
+        )
+        changed_ids.setdefault('answer', set()).update(
+            Answer.objects.filter(question__quiz_id__in=quiz_ids).values_list('id', flat=True)
+        )
+
+    for key, model, fields in SYNC_MODELS:
+        ids = changed_ids.get(model._meta.model_name)
+        if not ids:
+            continue
+        # Current state wins over the logged action, so re-created or re-saved objects are upserts
+        rows = model.objects.filter(SYNC_VISIBLE.get(key, Q()), id__in=ids)
+        payload[key] = list(rows.order_by('id').values(*fields))
+        existing = {row['id'] for row in payload[key]}
+        payload['deleted'][key] = sorted(ids - existing)
+    return payload
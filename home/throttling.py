@@ -0,0 +1,164 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class SlidingWindowCounter:
+    """
+    Sliding-window rate counter kept in a Django cache.
+
+    Each key holds one integer per fixed window; the request rate is estimated
+    by weighting the previous window's count by how much of it still overlaps
+    the sliding window. A hit increments the current window first and decides
+    from the value the increment returns, so concurrent hits sharing a key
+    cannot both pass on the same stale count; a rejected hit is taken back
+    out. That is one add, one atomic increment and one read per allowed hit,
+    instead of the timestamp list DRF's SimpleRateThrottle rewrites.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def hit(self, key, limit, window, now=None):
+        """
+        Count one request against key if it fits under limit.
+
+        Returns:
+            tuple: (bool allowed, float seconds to wait before retrying)
+        """
+        now = time.time() if now is None else now
+        bucket = int(now // window)
+        current_key = f'{key}:{bucket}'
+        timeout = int(window * 2) + 1
+
+        # add() is a no-op once the window's key exists, so only incr() decides the count
+        self.cache.add(current_key, 0, timeout=timeout)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.add(current_key, 1, timeout=timeout)
+            current = 1
+        previous = self.cache.get(f'{key}:{bucket - 1}', 0)
+        elapsed = (now % window) / window
+        # Hits allowed before this one
+        before = current - 1
+
+        if previous * (1 - elapsed) + before < limit:
+            return True, 0.0
+
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        if before >= limit or not previous:
+            wait = window * (1 - elapsed)
+        else:
+            # Wait until enough of the previous window has slid out
+            wait = ((1 - (limit - before) / previous) - elapsed) * window
+        return False, max(wait, 0.0)
+
+
+def get_token_user_id(request):
+    """Read the user id from a Bearer access token without touching the database"""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    parts = header.split()
+    if len(parts) != 2 or parts[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(parts[1]).get(jwt_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle backed by SlidingWindowCounter on the `throttle` cache"""
+    cache_alias = 'throttle'
+
+    def __init__(self):
+        super().__init__()
+        self.counter = SlidingWindowCounter(caches[self.cache_alias])
+        self._wait = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self._wait = self.counter.hit(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """
+    Limit a client by user id from its JWT, or by session cookie.
+
+    Identity is resolved from the raw request so throttling never loads the
+    User row; clients without credentials are limited by IP.
+    """
+
+    def get_cache_key(self, request, view):
+        user_id = get_token_user_id(request)
+        if user_id is not None:
+            ident = f'user:{user_id}'
+        else:
+            session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            ident = f'session:{session_key}' if session_key else f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """Limit a client by IP address (honours NUM_PROXIES like DRF's throttles)"""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class SubmitUserThrottle(UserSlidingWindowThrottle):
+    scope = 'submit_user'
+
+
+class SubmitIPThrottle(IPSlidingWindowThrottle):
+    scope = 'submit_ip'
+
+
+class StreakUserThrottle(UserSlidingWindowThrottle):
+    scope = 'streak_user'
+
+
+class StreakIPThrottle(IPSlidingWindowThrottle):
+    scope = 'streak_ip'
+
+
+class TokenIPThrottle(IPSlidingWindowThrottle):
+    scope = 'token_ip'
+
+
+class ThrottleFirstMixin:
+    """
+    Check throttles before authentication and permissions.
+
+    APIView.initial() authenticates first, which costs a User query with
+    JWTAuthentication; throttled requests are rejected before that happens.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.check_throttles(request)
+        self._throttles_checked = True
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        if getattr(self, '_throttles_checked', False):
+            return
+        super().check_throttles(request)
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """
+    Parsed pytz timezone for name, memoized per process.
+
+    Raises:
+        pytz.UnknownTimeZoneError: for names that aren't IANA timezones
+    """
+    # Imported on first use (warm_up() parses WARMUP_TIMEZONES before forking), not at worker startup
+    import pytz
+
+    return pytz.timezone(name)
+
+
+def get_timezone_or_utc(name):
+    import pytz
+
+    try:
+        return get_timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return pytz.UTC
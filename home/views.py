@@ -1,10 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
-from .models import Discipline, Quiz, Question, Answer, Marks_Of_User
+from .models import Discipline, Quiz, Question
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse
+from django.utils.html import format_html_join
+from .authoring import create_questions, get_quiz_choices
+from .caching import cache_anonymous_page
+from .progress import get_progress_index
+from .quiz_state import get_quiz_state_store, new_quiz_state
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 def is_admin(user):
     return user.is_superuser
@@ -39,13 +47,15 @@ def add_question(request):
         # Получаем объект квиза
         quiz = get_object_or_404(Quiz, id=quiz_id)
         
-        # Создаём вопрос
-        question = Question.objects.create(content=question_text, quiz=quiz)
-
-        # Добавляем ответы и устанавливаем правильный
-        for index, answer_text in enumerate(answers):
-            is_correct = (index == correct_index)
-            Answer.objects.create(content=answer_text, correct=is_correct, question=question)
+        # Создаём вопрос и ответы одним пакетом
+        create_questions([{
+            'quiz_id': quiz.id,
+            'content': question_text,
+            'answers': [
+                {'content': answer_text, 'correct': index == correct_index}
+                for index, answer_text in enumerate(answers)
+            ],
+        }])
 
         return JsonResponse({"success": "Întrebarea a fost adăugată cu succes!"})
 
@@ -54,18 +64,23 @@ def add_question(request):
 @login_required
 @user_passes_test(is_admin)
 def get_quizzes(request):
-    if request.method == "POST":
+    if request.method == "GET":
+        discipline_id = request.GET.get("discipline_id")
+        if discipline_id and discipline_id.isdigit():
+            return JsonResponse({"quizzes": get_quiz_choices(int(discipline_id))})
+    elif request.method == "POST":
+        # Older clients: POST with JSON body, options as pre-rendered (escaped) HTML
         data = json.loads(request.body)
         discipline_id = data.get("discipline_id")
-        if discipline_id:
-            quizzes = Quiz.objects.filter(discipline_id=discipline_id)
-            quizzes_html = "".join(
-                f'<option value="{quiz.id}">{quiz.title}</option>'
-                for quiz in quizzes
+        if discipline_id and str(discipline_id).isdigit():
+            quizzes = get_quiz_choices(int(discipline_id))
+            quizzes_html = format_html_join(
+                "", '<option value="{}">{}</option>', ((quiz["id"], quiz["title"]) for quiz in quizzes)
             )
-            return JsonResponse({"quizzes_html": quizzes_html})
+            return JsonResponse({"quizzes": quizzes, "quizzes_html": quizzes_html})
     return JsonResponse({"error": "Invalid request"}, status=400)
 
+@cache_anonymous_page
 def home(request):
     disciplines = Discipline.objects.all()
     return render(request, 'home.html', {'disciplines': disciplines})
@@ -74,17 +89,21 @@ def home(request):
 @login_required
 def quizzes_by_discipline(request, discipline_id):
     discipline = get_object_or_404(Discipline, id=discipline_id)
-    quizzes = Quiz.objects.filter(discipline=discipline)
-
-    # Fetch the user's completed quizzes
-    completed_quizzes = Marks_Of_User.objects.filter(user=request.user).values_list('quiz_id', flat=True)
-
-    # Prepare quizzes with status
-    quizzes_with_status = []
-    for quiz in quizzes:
-        status = "Пройден" if quiz.id in completed_quizzes else "Не пройден"
-        quizzes_with_status.append({'quiz': quiz, 'status': status})
-    print(f"Completed quizzes for user {request.user.id}: {completed_quizzes}")
+    quizzes = Quiz.objects.filter(discipline=discipline).order_by('id')
+
+    # Cached per user: one lookup per quiz instead of scanning a queryset for each
+    progress = get_progress_index(request.user.id)
+    statuses = {'passed': "Promovat", 'failed': "Nepromovat", None: "Neînceput"}
+    quizzes_with_status = [
+        {
+            'quiz': quiz,
+            'status': statuses[progress.status(quiz.id)],
+            'score': progress.score(quiz.id),
+            'passed': progress.is_passed(quiz.id),
+        }
+        for quiz in quizzes
+    ]
+    logger.debug("Discipline %s: %s of %s quizzes passed", discipline_id, len(progress.completed), len(quizzes))
 
     context = {
         'discipline': discipline,
@@ -98,13 +117,10 @@ def take_quiz(request, quiz_id):
     questions = Question.objects.filter(quiz=quiz)
     total_questions = questions.count()
 
-    # Initialize session data if it doesn't exist
-    if 'question_number' not in request.session:
-        request.session['question_number'] = 1
-        request.session['user_answers'] = []
-        request.session['score'] = 0
-
-    question_number = request.session['question_number']
+    # Progress lives in the configured store (session or cache); it is only written when an answer is posted
+    store = get_quiz_state_store(request)
+    state = store.get(quiz_id) or new_quiz_state()
+    question_number = state['question_number']
 
     # Handle POST request (answer submission)
     if request.method == 'POST':
@@ -116,23 +132,22 @@ def take_quiz(request, quiz_id):
         correct_answer = current_question.answer_set.filter(correct=True).first()
 
         # Append or update user answers
-        user_answers = request.session['user_answers']
-        user_answers.append({
+        state['user_answers'].append({
             'question_id': current_question.id,
             'selected': int(selected_answer_id) if selected_answer_id else None,
             'correct': correct_answer.id
         })
-        request.session['user_answers'] = user_answers
 
         # Update score
         if selected_answer_id and int(selected_answer_id) == correct_answer.id:
-            request.session['score'] += 1
+            state['score'] += 1
 
         # Increment question number
-        request.session['question_number'] += 1
+        state['question_number'] += 1
+        store.set(quiz_id, state)
 
         # Redirect to results page if quiz is completed
-        if request.session['question_number'] > total_questions:
+        if state['question_number'] > total_questions:
             return redirect('quiz_results', quiz_id=quiz_id)
 
         return redirect('take_quiz', quiz_id=quiz_id)
@@ -143,8 +158,7 @@ def take_quiz(request, quiz_id):
 
     current_question = questions[question_number - 1]
 
-    # Debugging: Print session state
-    print(f"Session Data during quiz: {dict(request.session.items())}")
+    logger.debug("Quiz %s: question %s of %s", quiz_id, question_number, total_questions)
 
     context = {
         'quiz': quiz,
@@ -160,25 +174,25 @@ def take_quiz(request, quiz_id):
 def quiz_results(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id)
 
-    # Check for session data
-    user_answers = request.session.get('user_answers', [])
-    score = request.session.get('score', 0)
-    question_number = request.session.get('question_number', 0)
+    # Check for stored quiz state
+    store = get_quiz_state_store(request)
+    state = store.get(quiz_id) or {}
+    user_answers = state.get('user_answers', [])
+    score = state.get('score', 0)
+    question_number = state.get('question_number', 0)
 
     if question_number <= 0 or not user_answers:
-        return redirect('take_quiz', quiz_id=quiz_id)  # Redirect if session data is incomplete
+        return redirect('take_quiz', quiz_id=quiz_id)  # Redirect if quiz state is incomplete
 
     total_questions = len(user_answers)
     percentage = (score / total_questions) * 100 if total_questions > 0 else 0
 
     # Get all questions related to the quiz
     question_ids = [ans['question_id'] for ans in user_answers]
-    questions = Question.objects.filter(id__in=question_ids)
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related('answer_set')
 
-    # Clear session data after completion
-    request.session.pop('question_number', None)
-    request.session.pop('user_answers', None)
-    request.session.pop('score', None)
+    # Clear quiz state after completion
+    store.delete(quiz_id)
 
     context = {
         'quiz': quiz,
@@ -0,0 +1,53 @@
+import gc
+import inspect
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+from rest_framework import serializers as drf_serializers
+
+from . import serializers
+from .timezones import get_timezone
+
+WARMUP_TEMPLATES = [
+    'home.html', 'quizzes_by_discipline.html', 'take_quiz.html', 'quiz_results.html',
+    'add_questions.html', 'authentication/login.html', 'authentication/register.html',
+]
+
+
+def warm_up():
+    """
+    Populate per-process caches a worker would otherwise fill on its first requests.
+
+    Safe to call in the gunicorn master before forking (`preload_app`): it
+    touches no database rows and closes any connection it opened, so
+    workers inherit the caches, not sockets.
+    """
+    # URL resolver: compiled patterns and the reverse() lookup tables
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+
+    for name in getattr(settings, 'WARMUP_TIMEZONES', ['UTC']):
+        get_timezone(name)
+
+    # Serializer field maps (model _meta field caches, related fields, validators)
+    for _, serializer_class in inspect.getmembers(serializers, inspect.isclass):
+        if (
+            issubclass(serializer_class, drf_serializers.Serializer)
+            and serializer_class.__module__ == serializers.__name__
+        ):
+            serializer_class().fields
+
+    # Compiled templates (cached loader, DEBUG off)
+    for name in WARMUP_TEMPLATES:
+        get_template(name)
+
+    connections.close_all()
+
+
+def freeze_heap():
+    """Move everything allocated so far out of the GC's reach, so forked workers keep sharing those pages"""
+    gc.collect()
+    gc.freeze()
@@ -1,7 +1,26 @@
+"""
+ASGI entry point for any ASGI server (e.g. `uvicorn lawquiz.asgi:application`).
+
+STREAM_PATH is served by home.stream.ProgressStream (Server-Sent Events,
+thousands of idle connections per process); everything else goes to Django.
+"""
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lawquiz.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: the stream app reads models and settings
+from django.conf import settings  # noqa: E402
+from home.stream import ProgressStream  # noqa: E402
+
+progress_stream = ProgressStream()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == getattr(settings, 'STREAM_PATH', '/api/stream/'):
+        await progress_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
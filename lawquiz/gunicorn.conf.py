@@ -0,0 +1,50 @@
+"""
+gunicorn settings: `gunicorn -c lawquiz/gunicorn.conf.py lawquiz.wsgi`
+
+With GUNICORN_PRELOAD=True (the default) the app is imported and warmed
+once in the master and workers fork from it, so a new worker serves its
+first request without importing or parsing anything.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Throttle counters and cache versions only hold across workers in a shared cache (home.checks)
+os.environ.setdefault('REQUIRE_SHARED_CACHES', 'True' if workers > 1 else 'False')
+
+
+def on_starting(server):
+    # System checks don't run under gunicorn; refuse to start on per-process caches
+    import django
+    from django.apps import apps
+    from django.core.checks import Tags, run_checks
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lawquiz.settings')
+    if not apps.ready:
+        django.setup()
+    errors = [message for message in run_checks(tags=[Tags.caches]) if message.is_serious()]
+    if errors:
+        raise SystemExit('\n'.join(str(error) for error in errors))
+
+
+def when_ready(server):
+    # Runs in the master before workers are forked; with preload the app is already imported
+    if preload_app:
+        from home.warmup import warm_up, freeze_heap
+
+        warm_up()
+        freeze_heap()
+
+
+def post_worker_init(worker):
+    # Without preload each worker imports the app itself; warm it before it accepts requests
+    if not preload_app:
+        from home.warmup import warm_up
+
+        warm_up()
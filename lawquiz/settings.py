@@ -1,4 +1,6 @@
+import json
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,7 +42,10 @@ SOCIALACCOUNT_PROVIDER = {
 }
 
 MIDDLEWARE = [
+    'home.middleware.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'home.middleware.CompressionMiddleware',
+    'home.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -71,13 +76,46 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'lawquiz.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-        
+# Database: SQLite by default; DATABASE_ENGINE=postgresql switches to PostgreSQL (psycopg 3,
+# see requirements-postgres.txt) configured from the POSTGRES_* variables.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'lawquiz'),
+            'USER': os.environ.get('POSTGRES_USER', 'lawquiz'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Keep each worker's connection open between requests instead of reconnecting per request
+            'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            # Behind PgBouncer in transaction mode, server-side cursors (the chunked
+            # .iterator() reads in exports and rebuilds) must be turned off
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('POSTGRES_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+            'OPTIONS': {},
+            'TEST': {'NAME': os.environ.get('POSTGRES_TEST_DB') or None},
+        }
+    }
+    if os.environ.get('POSTGRES_POOL', 'False') == 'True':
+        # psycopg_pool per process instead of persistent connections (the two are exclusive)
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock at BEGIN so concurrent writers (grading workers, bursts) wait
+            # on the busy timeout instead of failing with "database is locked" on lock upgrade
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        }
     }
-}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -143,11 +181,55 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # JSON (orjson when installed) by default; MessagePack for clients sending Accept: application/msgpack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-    ],
+        'home.renderers.ORJSONRenderer',
+    ] + (['home.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['home.renderers.MessagePackParser'] if find_spec('msgpack') else []),
+    # Sliding-window limits used by home.throttling (requests per user / per IP)
+    'DEFAULT_THROTTLE_RATES': {
+        'submit_user': '20/min',
+        'submit_ip': '120/min',
+        'streak_user': '20/min',
+        'streak_ip': '120/min',
+        'token_ip': '10/min',
+    },
+}
+
+# Caches. Catalogue versions and throttle counters must live in a cache shared by
+# all workers in production (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://127.0.0.1:6379/0); locmem is per-process.
+# With REQUIRE_SHARED_CACHES (gunicorn.conf.py sets it when running more than one
+# worker) the home.E001 system check refuses per-process caches.
+REQUIRE_SHARED_CACHES = os.environ.get('REQUIRE_SHARED_CACHES', 'False') == 'True'
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'default'),
+    },
+    'throttle': {
+        'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'throttle'),
+    },
+    # HTML quiz progress with QUIZ_STATE_STORE=home.quiz_state.CacheQuizStateStore; must be shared across workers
+    'quiz_state': {
+        'BACKEND': os.environ.get('QUIZ_STATE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('QUIZ_STATE_CACHE_LOCATION', 'quiz_state'),
+    },
 }
 
+# Sessions: e.g. SESSION_ENGINE=django.contrib.sessions.backends.cached_db to serve reads from the cache.
+# Expired rows are removed by `manage.py purge_sessions` (run it from cron).
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+
+# Where the HTML quiz flow keeps its per-answer progress (home.quiz_state)
+QUIZ_STATE_STORE = os.environ.get('QUIZ_STATE_STORE', 'home.quiz_state.SessionQuizStateStore')
+QUIZ_STATE_TIMEOUT = 6 * 60 * 60  # Seconds an unfinished quiz is kept by the cache store
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -156,6 +238,10 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Adds username, is_staff and timezone claims used by home.authentication.ClaimsJWTAuthentication
+    'TOKEN_OBTAIN_SERIALIZER': 'home.serializers.ClaimsTokenObtainPairSerializer',
+    # Re-reads those claims (and refuses inactive users) on every refresh
+    'TOKEN_REFRESH_SERIALIZER': 'home.serializers.ClaimsTokenRefreshSerializer',
 }
 
 # CORS Configuration for React Native
@@ -184,3 +270,108 @@ CORS_ALLOWED_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+
+# Brotli level for API responses (home.middleware.CompressionMiddleware); 4-6 suits dynamic content
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Anonymous catalogue response cache (home.caching)
+CATALOGUE_CACHE_TIMEOUT = 60 * 60  # Server-side entry lifetime; changes invalidate immediately
+CATALOGUE_CACHE_MAX_AGE = 60       # Cache-Control max-age sent to browsers and CDNs
+CATALOGUE_MAX_STALE = 300          # Serve stale catalogue entries this long after a change
+
+# Stale-while-revalidate for per-user computed endpoints (roadmap, progress summary)
+SWR_TIMEOUT = 60 * 60
+SWR_MAX_STALE = 300      # Older stale entries are recomputed synchronously
+SWR_BACKGROUND = True    # Refresh on the in-worker thread pool (False: refresh inline)
+SWR_MAX_WORKERS = 2      # Refresh threads per worker process
+SWR_MAX_PENDING = 100    # Queued refreshes per worker before stale entries stop triggering more
+
+# Timed exam attempts
+EXAM_LATE_SUBMISSION_POLICY = 'reject'  # 'reject' or 'grade' (graded and flagged as late)
+EXAM_SUBMISSION_GRACE_SECONDS = 30      # Allowance for network latency after the deadline
+EXAM_SWEEP_BATCH_SIZE = 500             # Attempts finalized per UPDATE by `manage.py expire_attempts`
+
+# Catalogue delta sync (/api/sync/)
+CATALOGUE_SYNC_PAGE_SIZE = 500
+CATALOGUE_SYNC_MAX_PAGE_SIZE = 1000
+CATALOGUE_SYNC_SAFETY_LAG = 5  # Seconds; tokens never pass changes younger than this (in-flight commits)
+
+# Offline quiz bundles (`manage.py build_quiz_bundles`), served by the web server from here
+QUIZ_BUNDLE_ROOT = os.path.join(MEDIA_ROOT, 'bundles')
+QUIZ_BUNDLE_URL = f'{MEDIA_URL}bundles/'
+
+# Batched question authoring (/api/authoring/questions/)
+AUTHORING_MAX_QUESTIONS = 500
+
+# On-demand request profiling (home.middleware.ProfilingMiddleware); tokens come from /admin/profiles/
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'True') == 'True'
+PROFILING_ROOT = os.path.join(MEDIA_ROOT, 'profiles')  # Deny /media/profiles/ in the web server
+PROFILING_MAX_FILES = 50          # Oldest profiles are deleted beyond this
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples in `sample` mode
+PROFILING_TOP_FUNCTIONS = 40
+
+# Timezones parsed before workers fork (home.warmup, lawquiz/gunicorn.conf.py)
+WARMUP_TIMEZONES = ['UTC', 'Europe/Chisinau', 'Europe/Bucharest', 'Europe/London', 'America/New_York']
+
+# Structured logging: JSON lines written by a background thread (home.log.AsyncJSONHandler).
+# Every record carries the request id and route; DEBUG records are kept for a sample of requests.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'home.log.RequestContextFilter'},
+        'debug_sampling': {'()': 'home.log.DebugSamplingFilter', 'rate': LOG_DEBUG_SAMPLE_RATE},
+    },
+    'handlers': {
+        'async_json': {
+            '()': 'home.log.AsyncJSONHandler',
+            'filename': os.environ.get('LOG_FILE') or None,  # stderr when unset
+            'maxsize': 10000,  # Records beyond this are dropped instead of blocking requests
+            'filters': ['request_context', 'debug_sampling'],
+        },
+    },
+    'root': {'handlers': ['async_json'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'handlers': ['async_json'], 'level': 'WARNING', 'propagate': False},
+        'home': {'handlers': ['async_json'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+# Submission grading: 'inline' grades in the request; 'queued' stores a GradingJob for
+# `manage.py grading_worker` and clients poll /api/grading-jobs/<id>/?wait=<seconds>
+GRADING_MODE = os.environ.get('GRADING_MODE', 'inline')
+GRADING_WORKER_PROCESSES = int(os.environ.get('GRADING_WORKER_PROCESSES', os.cpu_count() or 1))
+GRADING_JOB_TIMEOUT = 300     # Seconds before a claimed job is considered abandoned and requeued
+GRADING_LONG_POLL_MAX = 2     # Longest ?wait= a poll may hold a (sync) request worker; clients re-poll
+GRADING_POLL_INTERVAL = 0.25  # Seconds between status reads while long-polling
+
+# Attempt archive (home.history): `manage.py archive_attempts` moves attempts finished more than
+# ARCHIVE_AFTER_DAYS ago out of the hot table; /api/history/ reads both
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Synthetic datasets (home.datagen): SQLite templates are cached here (default: <tmp>/lawquiz-datagen)
+DATAGEN_TEMPLATE_DIR = os.environ.get('DATAGEN_TEMPLATE_DIR') or None
+
+# Event outbox (home.outbox): quiz.passed / streak.broken events written with the submit,
+# pulled from /api/events/ or pushed by `manage.py dispatch_outbox` to these endpoints:
+# [{"name": "crm", "url": "https://...", "event_types": ["quiz.passed"], "secret": "..."}]
+OUTBOX_ENDPOINTS = json.loads(os.environ.get('OUTBOX_ENDPOINTS', '[]'))
+OUTBOX_SAFETY_LAG = 2         # Seconds; cursors never pass events younger than this (in-flight commits)
+OUTBOX_PAGE_SIZE = 100        # Events per pull page / per delivery batch
+OUTBOX_MAX_PAGE_SIZE = 1000
+OUTBOX_DELIVERY_TIMEOUT = 10  # Seconds per HTTP delivery
+OUTBOX_BACKOFF_BASE = 5       # Seconds before the first retry; doubles per consecutive failure
+OUTBOX_BACKOFF_MAX = 600
+OUTBOX_RETENTION_DAYS = 30         # `manage.py prune_outbox` deletes feed events older than this...
+OUTBOX_STREAM_RETENTION_HOURS = 1  # ...and progress.updated (stream-only) events older than this
+
+# Progress stream (home.stream, served by lawquiz/asgi.py): SSE of a user's outbox events
+STREAM_PATH = '/api/stream/'
+STREAM_POLL_INTERVAL = 0.5  # Seconds between outbox reads; one query per process, not per connection
+STREAM_HEARTBEAT = 15       # Seconds between keepalive comments on an idle stream
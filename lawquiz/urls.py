@@ -2,8 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from home.admin import profile_list, profile_detail, profile_download
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list), name='profile_list'),
+    path('admin/profiles/<str:name>/', admin.site.admin_view(profile_detail), name='profile_detail'),
+    path('admin/profiles/<str:name>/download/', admin.site.admin_view(profile_download), name='profile_download'),
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path('api/', include('home.api_urls')),